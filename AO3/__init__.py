@@ -1,10 +1,40 @@
-from . import extra, utils
-from .chapters import Chapter
-from .comments import Comment
-from .search import Search
-from .series import Series
-from .session import GuestSession, Session
-from .users import User
-from .works import Work
+import importlib
 
 VERSION = "2.3.0"
+
+# Public names are resolved on first access so that `import AO3` doesn't pull
+# in requests, bs4 and lxml until something actually needs them
+_LAZY_ATTRIBUTES = {
+    "Chapter": ".chapters",
+    "Comment": ".comments",
+    "Search": ".search",
+    "Series": ".series",
+    "GuestSession": ".session",
+    "Session": ".session",
+    "User": ".users",
+    "Work": ".works",
+    "WorkBlurb": ".common",
+}
+
+_LAZY_MODULES = ("extra", "utils")
+
+__all__ = ["VERSION", *_LAZY_MODULES, *_LAZY_ATTRIBUTES]
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        module = importlib.import_module(_LAZY_ATTRIBUTES[name], __name__)
+        value = getattr(module, name)
+    else:
+        # Any submodule (AO3.requester, AO3.works...) can be reached as an attribute
+        try:
+            value = importlib.import_module(f".{name}", __name__)
+        except ModuleNotFoundError as e:
+            if e.name != f"{__name__}.{name}":
+                raise
+            raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,307 @@
+"""Queue of write actions (kudos, bookmarks, subscriptions, collections and comments).
+
+Actions are sent one at a time through the session's rate limiter, so bulk
+actions don't get the session (and its reads) rate limited. Actions that fail
+because of rate limiting or connection errors are retried later with an
+exponential backoff, and pending actions can be saved to a JSON file so they
+survive a crash. Every action has a key, and an action whose key was already
+queued or completed is skipped, so the same work isn't bookmarked twice.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from . import threadable, utils
+
+ACTIONS = ("kudos", "bookmark", "subscribe", "collect", "comment")
+TARGETS = ("work", "series", "user")
+
+PENDING = "pending"
+# Being made by one of the threads running the queue
+RUNNING = "running"
+DONE = "done"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+
+def _key(action, target, target_id, options):
+    key = f"{action}:{target}:{target_id}"
+    if action == "collect":
+        key += ":" + ",".join(sorted(options["collections"]))
+    elif action == "comment":
+        text = f"{options.get('chapter')}:{options['text']}"
+        key += ":" + hashlib.sha1(text.encode("utf-8")).hexdigest()
+    return key
+
+
+class ActionQueue:
+    """Durable queue of write actions made with an authenticated session.
+
+    Actions are plain dicts with 'key', 'action', 'target', 'target_id', 'options',
+    'status', 'attempts' and 'error', so they can be stored as JSON.
+    """
+
+    def __init__(self, session, path=None, retries=5, backoff=60):
+        """Creates a new action queue
+
+        Args:
+            session (AO3.Session): Authenticated session the actions are made with
+            path (str, optional): JSON file where the queue is saved after every change. Pending
+            actions in it are loaded again, so they're resumed after a crash. Defaults to None.
+            retries (int, optional): Maximum number of attempts for actions that fail because of
+            rate limiting, connection errors or an expired token. Defaults to 5.
+            backoff (int, optional): Seconds to wait before the first retry. Doubles after every attempt. Defaults to 60.
+
+        Raises:
+            utils.AuthError: The session isn't authenticated
+        """
+
+        if session is None or not session.is_authed:
+            raise utils.AuthError("Write actions need an authenticated session")
+
+        self.session = session
+        self.path = path
+        self.retries = retries
+        self.backoff = backoff
+        self._pending = []
+        self._completed = set()
+        self._lock = threading.RLock()
+        if path is not None and os.path.exists(path):
+            with open(path, "r") as file:
+                state = json.load(file)
+            self._pending = state["pending"]
+            self._completed = set(state["completed"])
+            # Actions that were being made when the queue was last saved are tried again. If they
+            # were made, AO3 refuses them (kudos, bookmarks, comments) and they're skipped
+            for entry in self._pending:
+                if entry["status"] == RUNNING:
+                    entry["status"] = PENDING
+
+    def __len__(self):
+        return len(self._pending)
+
+    def __repr__(self):
+        return f"<ActionQueue [{len(self)} pending]>"
+
+    @property
+    def pending(self):
+        """Actions that haven't been made yet"""
+
+        with self._lock:
+            return list(self._pending)
+
+    def save(self, path=None):
+        """Saves the pending actions and the keys of the completed ones
+
+        Args:
+            path (str, optional): Output file. Defaults to the queue's path.
+        """
+
+        path = self.path if path is None else path
+        with self._lock:
+            state = {"pending": self._pending, "completed": sorted(self._completed)}
+            # Written to a temporary file first, so a crash doesn't leave half a file
+            with open(f"{path}.tmp", "w") as file:
+                json.dump(state, file)
+            os.replace(f"{path}.tmp", path)
+
+    def _changed(self):
+        if self.path is not None:
+            self.save()
+
+    def add(self, action, target, target_id, **options):
+        """Queues an action
+
+        Args:
+            action (str): "kudos", "bookmark", "subscribe", "collect" or "comment"
+            target (str): "work", "series" or "user"
+            target_id (int/str): Work ID, series ID or username
+            options: Arguments of the action (see the shortcut methods)
+
+        Raises:
+            ValueError: Unknown action or target
+
+        Returns:
+            dict: The queued action, or None if the same action was already queued or made
+        """
+
+        if action not in ACTIONS:
+            raise ValueError(f"Unknown action '{action}'")
+        if target not in TARGETS:
+            raise ValueError(f"Unknown target '{target}'")
+
+        key = _key(action, target, target_id, options)
+        with self._lock:
+            if key in self._completed or any(a["key"] == key for a in self._pending):
+                return None
+            entry = {
+                "key": key,
+                "action": action,
+                "target": target,
+                "target_id": target_id,
+                "options": options,
+                "status": PENDING,
+                "attempts": 0,
+                "not_before": 0,
+                "error": None,
+            }
+            self._pending.append(entry)
+            self._changed()
+        return entry
+
+    def kudos(self, workid):
+        """Queues leaving kudos on a work"""
+        return self.add("kudos", "work", workid)
+
+    def bookmark(self, target_id, target="work", notes="", tags=None, collections=None, private=False, recommend=False, pseud=None):
+        """Queues bookmarking a work (or a series, with target="series"). See Work.bookmark()"""
+        return self.add("bookmark", target, target_id, notes=notes, tags=tags or [], collections=collections or [],
+                        private=private, recommend=recommend, pseud=pseud)
+
+    def subscribe(self, target_id, target="work"):
+        """Queues subscribing to a work, series or user"""
+        return self.add("subscribe", target, target_id)
+
+    def collect(self, workid, collections):
+        """Queues inviting a work to collections"""
+        return self.add("collect", "work", workid, collections=list(collections))
+
+    def comment(self, workid, text, chapter=None, pseud=None):
+        """Queues commenting on a work, or on one of its chapters if chapter (a chapter ID) is given"""
+        return self.add("comment", "work", workid, text=text, chapter=chapter, pseud=pseud)
+
+    def _object(self, entry):
+        from .chapters import Chapter
+        from .series import Series
+        from .users import User
+        from .works import Work
+
+        target, target_id = entry["target"], entry["target_id"]
+        if target == "series":
+            return Series(target_id, self.session, load=False)
+        if target == "user":
+            return User(target_id, self.session, load=False)
+        work = Work(target_id, self.session, load=False)
+        chapter = entry["options"].get("chapter")
+        if entry["action"] == "comment" and chapter is not None:
+            return Chapter(chapter, work, self.session, load=False)
+        return work
+
+    def _perform(self, entry):
+        """Makes an action. Returns False if it had already been made"""
+
+        obj = self._object(entry)
+        options = entry["options"]
+        action = entry["action"]
+        if action == "kudos":
+            return utils.kudos(obj, self.session)
+        if action == "bookmark":
+            try:
+                utils.bookmark(obj, self.session, options["notes"], options["tags"], options["collections"],
+                               options["private"], options["recommend"], options["pseud"])
+            except utils.BookmarkError as e:
+                # AO3 answers "You have already bookmarked that." to a second bookmark
+                if any("already bookmarked" in error.lower() for error in e.errors):
+                    return False
+                raise
+        elif action == "subscribe":
+            utils.subscribe(obj, entry["target"], self.session)
+        elif action == "collect":
+            utils.collect(obj, self.session, options["collections"])
+        elif action == "comment":
+            try:
+                utils.comment(obj, options["text"], self.session, options["chapter"] is None, pseud=options["pseud"])
+            except utils.DuplicateCommentError:
+                return False
+        return True
+
+    def _next(self):
+        """Returns the next action that can be made and how long to wait for it. The action
+        is marked as running, so other threads running the queue don't make it too"""
+
+        with self._lock:
+            waiting = [a for a in self._pending if a["status"] == PENDING]
+            if len(waiting) == 0:
+                return None, 0
+            entry = min(waiting, key=lambda a: a["not_before"])
+            entry["status"] = RUNNING
+            self._changed()
+            return entry, max(entry["not_before"] - time.time(), 0)
+
+    def _finish(self, entry, status, error=None):
+        with self._lock:
+            entry["status"] = status
+            entry["error"] = error
+            self._pending.remove(entry)
+            if status != FAILED:
+                self._completed.add(entry["key"])
+            self._changed()
+
+    def _retry(self, entry, error):
+        """Schedules an action to be tried again. Returns False if it ran out of attempts"""
+
+        with self._lock:
+            if entry["attempts"] >= self.retries:
+                self._finish(entry, FAILED, error)
+                return False
+            entry["status"] = PENDING
+            entry["error"] = error
+            entry["not_before"] = time.time() + self.backoff * 2 ** (entry["attempts"]-1)
+            self._changed()
+        return True
+
+    @threadable.threadable
+    def run(self, max_actions=None, callback=None):
+        """Makes the queued actions until the queue is empty.
+        This function is threadable.
+
+        Actions that fail because of rate limiting or connection errors are retried
+        later, and an expired authenticity token is refreshed before retrying. Other
+        errors (invalid IDs, bookmark errors...) fail the action right away.
+
+        Args:
+            max_actions (int, optional): Stop after this many actions finished. Defaults to None.
+            callback (callable, optional): Called with every finished action. Defaults to None.
+
+        Returns:
+            list: Finished actions. Their status is "done", "skipped" (kudos, bookmark or comment that
+            was already made) or "failed", in which case 'error' has the reason
+        """
+
+        import requests
+
+        finished = []
+        while max_actions is None or len(finished) < max_actions:
+            entry, wait = self._next()
+            if entry is None:
+                break
+            if wait > 0:
+                time.sleep(wait)
+            entry["attempts"] += 1
+            try:
+                made = self._perform(entry)
+            except (utils.HTTPError, requests.ConnectionError, requests.Timeout) as e:
+                if self._retry(entry, str(e)):
+                    continue
+            except utils.AuthError as e:
+                if str(e) == "Invalid session":
+                    self._finish(entry, FAILED, str(e))
+                else:
+                    # Most likely an expired authenticity token
+                    try:
+                        self.session.refresh_auth_token()
+                    except Exception:
+                        pass
+                    if self._retry(entry, str(e)):
+                        continue
+            except Exception as e:
+                self._finish(entry, FAILED, str(e))
+            else:
+                self._finish(entry, DONE if made else SKIPPED)
+            finished.append(entry)
+            if callback is not None:
+                callback(entry)
+        return finished
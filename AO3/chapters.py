@@ -1,10 +1,11 @@
+import itertools
 from functools import cached_property
 
 import bs4
-from bs4 import BeautifulSoup
 
-from . import threadable, utils
+from . import instrumentation, serialization, threadable, utils
 from .comments import Comment
+from .common import comment_page_count, paginate
 from .requester import requester
 from .users import User
 
@@ -33,20 +34,16 @@ class Chapter:
     def __eq__(self, other):
         return isinstance(other, __class__) and other.id == self.id
     
-    def __getstate__(self):
-        d = {}
-        for attr in self.__dict__:
-            if isinstance(self.__dict__[attr], BeautifulSoup):
-                d[attr] = (self.__dict__[attr].encode(), True)
-            else:
-                d[attr] = (self.__dict__[attr], False)
-        return d
-                
+    def __reduce__(self):
+        # Pickled in the compact format of AO3.serialization, so loading doesn't parse any HTML
+        return serialization.reduce(self)
+
     def __setstate__(self, d):
+        # Pickles made by older versions store the page HTML
         for attr in d:
             value, issoup = d[attr]
             if issoup:
-                self.__dict__[attr] = BeautifulSoup(value, "lxml")
+                self.__dict__[attr] = instrumentation.parse(value, "chapters.__setstate__")
             else:
                 self.__dict__[attr] = value
                 
@@ -137,45 +134,36 @@ class Chapter:
             raise utils.UnloadedError("Chapter isn't loaded. Have you tried calling Chapter.reload()?")
             
         url = f"https://archiveofourown.org/chapters/{self.id}?page=%d&show_comments=true&view_adult=true"
-        soup = self.request(url%1)
-        
-        pages = 0
-        div = soup.find("div", {"id": "comments_placeholder"})
-        ol = div.find("ol", {"class": "pagination actions"})
-        if ol is None:
-            pages = 1
-        else:
-            for li in ol.findAll("li"):
-                if li.getText().isdigit():
-                    pages = int(li.getText())   
-        
+        # With a maximum, pages are requested one at a time so none are requested for nothing
+        workers = 4 if maximum is None else 1
+        comments = paginate(lambda page: self.request(url%page), self._parse_comments, None, workers, comment_page_count)
+        return list(itertools.islice(comments, maximum))
+
+    def _parse_comments(self, soup):
+        """Returns the comment threads of a page"""
+
         comments = []
-        for page in range(pages):
-            if page != 0:
-                soup = self.request(url%(page+1))
-            ol = soup.find("ol", {"class": "thread"})
-            for li in ol.findAll("li", {"role": "article"}, recursive=False):
-                if maximum is not None and len(comments) >= maximum:
-                    return comments
-                id_ = int(li.attrs["id"][8:])
-                
-                header = li.find("h4", {"class": ("heading", "byline")})
-                if header is None:
-                    author = None
-                else:
-                    author = User(str(header.a.text), self._session, False)
-                    
-                if li.blockquote is not None:
-                    text = li.blockquote.getText()
-                else:
-                    text = ""                  
+        ol = soup.find("ol", {"class": "thread"})
+        for li in ol.findAll("li", {"role": "article"}, recursive=False):
+            id_ = int(li.attrs["id"][8:])
+            
+            header = li.find("h4", {"class": ("heading", "byline")})
+            if header is None:
+                author = None
+            else:
+                author = User(str(header.a.text), self._session, False)
                 
-                comment = Comment(id_, self, session=self._session, load=False)       
-                setattr(comment, "authenticity_token", self.authenticity_token)
-                setattr(comment, "author", author)
-                setattr(comment, "text", text)
-                comment._thread = None
-                comments.append(comment)
+            if li.blockquote is not None:
+                text = li.blockquote.getText()
+            else:
+                text = ""                  
+            
+            comment = Comment(id_, self, session=self._session, load=False)       
+            setattr(comment, "authenticity_token", self.authenticity_token)
+            setattr(comment, "author", author)
+            setattr(comment, "text", text)
+            comment._thread = None
+            comments.append(comment)
         return comments
         
     def get_images(self):
@@ -216,16 +204,22 @@ class Chapter:
     @cached_property
     def text(self):
         """This chapter's text"""
-        text = ""
         if self.id is not None:
             div = self._soup.find("div", {"role": "article"})
         else:
             div = self._soup
-        for p in div.findAll(("p", "center")):
-            text += p.getText().replace("\n", "") + "\n"
-            if isinstance(p.next_sibling, bs4.element.NavigableString):
-                text += str(p.next_sibling)
-        return text
+        parts = []
+        for p in div.find_all(("p", "center")):
+            # Most paragraphs are a single string, which doesn't need get_text()
+            string = p.string
+            if type(string) is not bs4.element.NavigableString:
+                string = p.get_text()
+            parts.append(string.replace("\n", ""))
+            parts.append("\n")
+            sibling = p.next_sibling
+            if isinstance(sibling, bs4.element.NavigableString):
+                parts.append(str(sibling))
+        return "".join(parts)
 
     @cached_property
     def title(self):
@@ -306,7 +300,7 @@ class Chapter:
         """
 
         req = self.get(url)
-        soup = BeautifulSoup(req.content, "lxml")
+        soup = instrumentation.parse(req.content, "chapters.request")
         return soup
     
     def get(self, *args, **kwargs):
@@ -315,7 +309,7 @@ class Chapter:
         if self._session is None:
             req = requester.request("get", *args, **kwargs)
         else:
-            req = requester.request("get", *args, **kwargs, session=self._session.session)
+            req = self._session.get(*args, **kwargs)
         if req.status_code == 429:
             raise utils.HTTPError("We are being rate-limited. Try again in a while or reduce the number of requests")
         return req
@@ -1,8 +1,6 @@
 from functools import cached_property
 
-from bs4 import BeautifulSoup
-
-from . import threadable, utils
+from . import instrumentation, threadable, utils
 from .requester import requester
 from .users import User
 
@@ -209,7 +207,7 @@ class Comment:
                     delattr(self, attr)
         
         req = self.get(f"https://archiveofourown.org/comments/{self.id}")
-        self.__soup = BeautifulSoup(req.content, features="lxml")
+        self.__soup = instrumentation.parse(req.content, "comments.reload")
         
         token = self.__soup.find("meta", {"name": "csrf-token"})
         self.authenticity_token = token["content"]
@@ -248,7 +246,7 @@ class Comment:
         if self._session is None:
             req = requester.request("get", *args, **kwargs)
         else:
-            req = requester.request("get", *args, **kwargs, session=self._session.session)
+            req = self._session.get(*args, **kwargs)
         if req.status_code == 429:
             raise utils.HTTPError("We are being rate-limited. Try again in a while or reduce the number of requests")
         return req
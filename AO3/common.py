@@ -1,37 +1,50 @@
 import datetime
+import sys
 
-from . import utils
+from .tagdict import intern, intern_all
+from .threadable import bounded_map
 
 
 def __setifnotnone(obj, attr, value):
     if value is not None:
         setattr(obj, attr, value)
 
-def get_work_from_banner(work):
-    #* These imports need to be here to prevent circular imports
-    #* (series.py would requite common.py and vice-versa)
-    from .series import Series
-    from .users import User
-    from .works import Work
+def _intern(value):
+    # str() drops the reference a bs4 NavigableString keeps to the whole page
+    return None if value is None else sys.intern(str(value))
+
+def parse_banner(work):
+    """Extracts the information shown in a work's banner (search results, user
+    works, bookmarks, series...) without creating any objects
+
+    Args:
+        work (bs4.element.Tag): The banner's <li> element
+
+    Returns:
+        dict: Plain values. Authors are usernames, series are (id, name) tuples, and
+        fields missing from the banner are None
+    """
+
+    # utils.py imports url_join from here
+    from . import utils
     
     authors = []
+    workid = workname = None
     try:
         for a in work.h4.find_all("a"):
             if 'rel' in a.attrs.keys():
                 if "author" in a['rel']:
-                    authors.append(User(a.string, load=False))
+                    authors.append(_intern(a.string))
             elif a.attrs["href"].startswith("/works"):
-                workname = a.string
+                workname = None if a.string is None else str(a.string)
                 workid = utils.workid_from_url(a['href'])
     except AttributeError:
         pass
-            
-    new = Work(workid, load=False)
 
     fandoms = []
     try:
         for a in work.find("h5", {"class": "fandoms"}).find_all("a"):
-            fandoms.append(a.string)
+            fandoms.append(intern(a.string))
     except AttributeError:
         pass
 
@@ -42,13 +55,13 @@ def get_work_from_banner(work):
     try:
         for a in work.find(attrs={"class": "tags"}).find_all("li"):
             if "warnings" in a['class']:
-                warnings.append(a.text)
+                warnings.append(intern(a.text))
             elif "relationships" in a['class']:
-                relationships.append(a.text)
+                relationships.append(intern(a.text))
             elif "characters" in a['class']:
-                characters.append(a.text)
+                characters.append(intern(a.text))
             elif "freeforms" in a['class']:
-                freeforms.append(a.text)
+                freeforms.append(intern(a.text))
     except AttributeError:
         pass
 
@@ -56,10 +69,10 @@ def get_work_from_banner(work):
     if reqtags is not None:
         rating = reqtags.find(attrs={"class": "rating"})
         if rating is not None:
-            rating = rating.text
+            rating = intern(rating.text)
         categories = reqtags.find(attrs={"class": "category"})
         if categories is not None:
-            categories = categories.text.split(", ")
+            categories = intern_all(categories.text.split(", "))
     else:
         rating = categories = None
 
@@ -72,16 +85,13 @@ def get_work_from_banner(work):
     if series_list is not None:
         for a in series_list.find_all("a"):
             seriesid = int(a.attrs['href'].split("/")[-1])
-            seriesname = a.text
-            s = Series(seriesid, load=False)
-            setattr(s, "name", seriesname)
-            series.append(s)
+            series.append((seriesid, a.text))
 
     stats = work.find(attrs={"class": "stats"})
     if stats is not None:
         language = stats.find("dd", {"class": "language"})
         if language is not None:
-            language = language.text
+            language = _intern(language.text)
         words = stats.find("dd", {"class": "words"})
         if words is not None:
             words = words.text.replace(",", "")
@@ -131,31 +141,180 @@ def get_work_from_banner(work):
     else:
         date_updated = datetime.datetime.strptime(date.getText(), "%d %b %Y")
 
-    __setifnotnone(new, "authors", authors)
-    __setifnotnone(new, "bookmarks", bookmarks)
-    __setifnotnone(new, "categories", categories)
-    __setifnotnone(new, "nchapters", chapters)
-    __setifnotnone(new, "characters", characters)
-    __setifnotnone(new, "complete", complete)
-    __setifnotnone(new, "date_updated", date_updated)
-    __setifnotnone(new, "expected_chapters", expected_chapters)
-    __setifnotnone(new, "fandoms", fandoms)
-    __setifnotnone(new, "hits", hits)
-    __setifnotnone(new, "comments", comments)
-    __setifnotnone(new, "kudos", kudos)
-    __setifnotnone(new, "language", language)
-    __setifnotnone(new, "rating", rating)
-    __setifnotnone(new, "relationships", relationships)
-    __setifnotnone(new, "restricted", restricted)
-    __setifnotnone(new, "series", series)
-    __setifnotnone(new, "summary", summary)
-    __setifnotnone(new, "tags", freeforms)
-    __setifnotnone(new, "title", workname)
-    __setifnotnone(new, "warnings", warnings)
-    __setifnotnone(new, "words", words)
+    return {
+        "id": workid,
+        "title": workname,
+        "authors": authors,
+        "bookmarks": bookmarks,
+        "categories": categories,
+        "nchapters": chapters,
+        "characters": characters,
+        "complete": complete,
+        "date_updated": date_updated,
+        "expected_chapters": expected_chapters,
+        "fandoms": fandoms,
+        "hits": hits,
+        "comments": comments,
+        "kudos": kudos,
+        "language": language,
+        "rating": rating,
+        "relationships": relationships,
+        "restricted": restricted,
+        "series": series,
+        "summary": summary,
+        "tags": freeforms,
+        "warnings": warnings,
+        "words": words,
+    }
+
+def get_work_from_banner(work):
+    #* These imports need to be here to prevent circular imports
+    #* (series.py would requite common.py and vice-versa,
+    #* and utils.py needs url_join from here)
+    from .series import Series
+    from .users import User
+    from .works import Work
+    
+    info = parse_banner(work)
+    new = Work(info["id"], load=False)
+    for attr, value in info.items():
+        if attr == "id":
+            continue
+        if attr == "authors":
+            value = [User(username, load=False) for username in value]
+        elif attr == "series":
+            series = []
+            for seriesid, seriesname in value:
+                s = Series(seriesid, load=False)
+                setattr(s, "name", seriesname)
+                series.append(s)
+            value = series
+        __setifnotnone(new, attr, value)
     
     return new
 
+class WorkBlurb:
+    """Compact record of a work's banner (search results, user works, bookmarks,
+    series...). It takes a fraction of the memory of a Work object: there's no
+    __dict__, lists are tuples, and tags, fandoms, authors and other repeated
+    strings are shared (see AO3.tagdict), so every work uses the same string objects.
+    Use to_work() to get a Work object out of it.
+    """
+
+    __slots__ = (
+        "id", "title", "authors", "bookmarks", "categories", "nchapters", "characters",
+        "complete", "date_updated", "expected_chapters", "fandoms", "hits", "comments",
+        "kudos", "language", "rating", "relationships", "restricted", "series", "summary",
+        "tags", "warnings", "words",
+    )
+    # Fields made of tag names (see AO3.tagdict)
+    _TAGS = ("categories", "characters", "fandoms", "relationships", "tags", "warnings")
+
+    def __init__(self, **fields):
+        """Creates a new blurb. Missing fields are None
+
+        Args:
+            fields: Values returned by parse_banner()
+        """
+
+        for attr in self.__slots__:
+            setattr(self, attr, fields.get(attr))
+        for attr in self._TAGS:
+            values = getattr(self, attr)
+            if values is not None:
+                setattr(self, attr, tuple(intern_all(values)))
+        if self.authors is not None:
+            self.authors = tuple(map(_intern, self.authors))
+        if self.series is not None:
+            self.series = tuple((seriesid, str(name)) for seriesid, name in self.series)
+        for attr in ("title", "summary"):
+            if getattr(self, attr) is not None:
+                setattr(self, attr, str(getattr(self, attr)))
+        self.language = _intern(self.language)
+        self.rating = intern(self.rating)
+
+    def __repr__(self):
+        return f"<WorkBlurb [{self.title}]>"
+
+    def __eq__(self, other):
+        return isinstance(other, __class__) and other.id == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __getstate__(self):
+        return {attr: getattr(self, attr) for attr in self.__slots__}
+
+    def __setstate__(self, d):
+        for attr in self.__slots__:
+            setattr(self, attr, d.get(attr))
+
+    def to_work(self, session=None):
+        """Creates a (not loaded) Work object with the information in this blurb
+
+        Args:
+            session (AO3.Session, optional): Session used by the work. Defaults to None.
+
+        Returns:
+            AO3.Work: Work object
+        """
+
+        #* These imports need to be here to prevent circular imports
+        from .series import Series
+        from .users import User
+        from .works import Work
+
+        new = Work(self.id, session=session, load=False)
+        for attr in self.__slots__:
+            value = getattr(self, attr)
+            if attr == "id" or value is None:
+                continue
+            if attr == "authors":
+                value = [User(username, load=False) for username in value]
+            elif attr == "series":
+                series = []
+                for seriesid, seriesname in value:
+                    s = Series(seriesid, load=False)
+                    setattr(s, "name", seriesname)
+                    series.append(s)
+                value = series
+            elif isinstance(value, tuple):
+                value = list(value)
+            setattr(new, attr, value)
+        return new
+
+def get_blurb_from_banner(work):
+    """Parses a work's banner into a WorkBlurb
+
+    Args:
+        work (bs4.element.Tag): The banner's <li> element
+
+    Returns:
+        WorkBlurb: Compact record of the work
+    """
+
+    return WorkBlurb(**parse_banner(work))
+
+def get_blurbs(soup):
+    """Parses every work banner of a listing page (search results, user works,
+    bookmarks, series...) into WorkBlurb objects
+
+    Args:
+        soup (bs4.BeautifulSoup): Listing page
+
+    Returns:
+        list: WorkBlurb objects. Banners of deleted works and external bookmarks are skipped
+    """
+
+    blurbs = []
+    for li in soup.find_all("li", {"role": "article"}):
+        if li.h4 is None or "blurb" not in li.get("class", ()):
+            continue
+        blurb = get_blurb_from_banner(li)
+        if blurb.id is not None:
+            blurbs.append(blurb)
+    return blurbs
+
 def url_join(base, *args):
     result = base
     for arg in args:
@@ -165,4 +324,62 @@ def url_join(base, *args):
             result += arg
         else:
             result += arg[1:]
-    return result
\ No newline at end of file
+    return result
+
+
+def page_count(soup, attrs=None):
+    """Returns the number of pages of a listing, read from the pagination links
+    of any of its pages
+
+    Args:
+        soup (bs4.element.Tag): Page (or part of a page) with the pagination links
+        attrs (dict, optional): Attributes of the pagination <ol>. Defaults to None ({"title": "pagination"}).
+
+    Returns:
+        int: Number of pages (1 if there are no pagination links)
+    """
+
+    if attrs is None:
+        attrs = {"title": "pagination"}
+    n = 1
+    pagination = soup.find("ol", attrs) if soup is not None else None
+    if pagination is not None:
+        for li in pagination.find_all("li"):
+            text = li.getText()
+            if text.isdigit():
+                n = max(n, int(text))
+    return n
+
+def paginate(fetch, parse, first=None, workers=4, count=page_count):
+    """Yields the items of every page of a listing, in order. The first page
+    gives both the number of pages and its own items, so it's only requested
+    once, and the remaining pages are fetched with at most `workers` requests
+    at the same time.
+
+    Args:
+        fetch (callable): fetch(page) returns the soup of a page (starting at 1)
+        parse (callable): parse(soup) returns the items of a page
+        first (bs4.BeautifulSoup, optional): First page, if it was already requested. Defaults to None.
+        workers (int, optional): Maximum number of pages requested at the same time. With 1, pages
+        are only requested when the previous one's items have been consumed. Defaults to 4.
+        count (callable, optional): count(soup) returns the number of pages. Defaults to page_count.
+
+    Yields:
+        object: Items of every page
+    """
+
+    if first is None:
+        first = fetch(1)
+    pages = count(first)
+    yield from parse(first)
+    if workers <= 1:
+        for page in range(2, pages+1):
+            yield from parse(fetch(page))
+    else:
+        for items in bounded_map(lambda page: parse(fetch(page)), range(2, pages+1), workers):
+            yield from items
+
+def comment_page_count(soup):
+    """Returns the number of comment pages of a work or chapter page"""
+
+    return page_count(soup.find("div", {"id": "comments_placeholder"}), {"class": "pagination actions"})
@@ -0,0 +1,236 @@
+"""Columnar export of works from search results and other listings.
+
+Works (or the banners they were parsed from) are turned into one array per
+field, with integers for stats and dictionary-encoded categorical fields
+(rating, language, tags, fandoms...), ready to be loaded into Arrow, pandas
+or Parquet. pyarrow is only needed for to_arrow(), to_record_batches()
+and to_parquet().
+"""
+
+import datetime
+
+from . import instrumentation
+from .common import WorkBlurb, parse_banner
+
+INT_COLUMNS = ("id", "words", "nchapters", "expected_chapters", "hits", "kudos", "comments", "bookmarks")
+BOOL_COLUMNS = ("complete", "restricted")
+STRING_COLUMNS = ("title", "summary")
+DATE_COLUMNS = ("date_published", "date_updated")
+# Single value per work, dictionary-encoded
+CATEGORY_COLUMNS = ("rating", "language")
+# List of values per work, dictionary-encoded
+LIST_COLUMNS = ("authors", "fandoms", "relationships", "characters", "tags", "warnings", "categories", "series")
+COLUMNS = ("id", "title", "authors", "rating", "language", "warnings", "categories", "fandoms",
+           "relationships", "characters", "tags", "series", "series_ids", "summary", "words",
+           "nchapters", "expected_chapters", "complete", "restricted", "hits", "kudos",
+           "comments", "bookmarks", "date_published", "date_updated")
+
+
+def _attr(obj, attr):
+    # Properties of unloaded works raise AttributeError when they reach for the soup
+    try:
+        return getattr(obj, attr)
+    except AttributeError:
+        return None
+
+def _work_record(work):
+    record = {}
+    for field in INT_COLUMNS + BOOL_COLUMNS + STRING_COLUMNS + DATE_COLUMNS + CATEGORY_COLUMNS + LIST_COLUMNS:
+        record[field] = _attr(work, field)
+    record["authors"] = [author.username for author in record["authors"] or []]
+    record["series"] = [(s.id, _attr(s, "name")) for s in record["series"] or []]
+    return record
+
+def _record(item):
+    from .works import Work
+
+    if isinstance(item, dict):
+        return item
+    if isinstance(item, Work):
+        return _work_record(item)
+    if isinstance(item, WorkBlurb):
+        # Blurbs hold the same values as parse_banner() returns
+        return {attr: getattr(item, attr) for attr in WorkBlurb.__slots__}
+    return parse_banner(item)
+
+def iter_banners(page):
+    """Parses the work banners from a listing page (search results, user works,
+    bookmarks, series...) without creating any Work objects
+
+    Args:
+        page (str/bytes/bs4.BeautifulSoup): Page HTML or soup
+
+    Yields:
+        dict: Banner information, see common.parse_banner()
+    """
+
+    if isinstance(page, (str, bytes)):
+        page = instrumentation.parse(page, "export.iter_banners")
+    for li in page.find_all("li", {"role": "article"}):
+        if li.h4 is None:
+            continue
+        yield parse_banner(li)
+
+
+class _Dictionary:
+    def __init__(self):
+        self.values = []
+        self._ids = {}
+
+    def encode(self, value):
+        if value is None:
+            return None
+        value = str(value)
+        index = self._ids.get(value)
+        if index is None:
+            index = self._ids[value] = len(self.values)
+            self.values.append(value)
+        return index
+
+
+def to_columns(items):
+    """Converts works to columns
+
+    Args:
+        items (iterable): AO3.Work or AO3.WorkBlurb objects, banner <li> elements or dicts from iter_banners()
+
+    Returns:
+        dict: {column: values}. Plain columns are lists (None for missing values). Category
+        columns are {'dictionary': [...], 'indices': [...]}, and list columns (tags, fandoms...)
+        are {'dictionary': [...], 'offsets': [...], 'indices': [...]}, where the values of row
+        i are indices[offsets[i]:offsets[i+1]]
+    """
+
+    columns = {name: [] for name in INT_COLUMNS + BOOL_COLUMNS + STRING_COLUMNS + DATE_COLUMNS}
+    columns["series_ids"] = {"offsets": [0], "values": []}
+    dictionaries = {name: _Dictionary() for name in CATEGORY_COLUMNS + LIST_COLUMNS}
+    categories = {name: [] for name in CATEGORY_COLUMNS}
+    lists = {name: ([0], []) for name in LIST_COLUMNS}
+
+    for item in items:
+        record = _record(item)
+        for name in INT_COLUMNS + BOOL_COLUMNS:
+            columns[name].append(record.get(name))
+        for name in STRING_COLUMNS:
+            value = record.get(name)
+            columns[name].append(None if value is None else str(value))
+        for name in DATE_COLUMNS:
+            value = record.get(name)
+            if isinstance(value, datetime.date) and not isinstance(value, datetime.datetime):
+                value = datetime.datetime(value.year, value.month, value.day)
+            columns[name].append(value)
+        for name in CATEGORY_COLUMNS:
+            categories[name].append(dictionaries[name].encode(record.get(name)))
+        series = record.get("series") or []
+        for name in LIST_COLUMNS:
+            offsets, indices = lists[name]
+            values = [s[1] for s in series] if name == "series" else record.get(name) or []
+            indices.extend(dictionaries[name].encode(value) for value in values)
+            offsets.append(len(indices))
+        columns["series_ids"]["values"].extend(s[0] for s in series)
+        columns["series_ids"]["offsets"].append(len(columns["series_ids"]["values"]))
+
+    for name in CATEGORY_COLUMNS:
+        columns[name] = {"dictionary": dictionaries[name].values, "indices": categories[name]}
+    for name in LIST_COLUMNS:
+        offsets, indices = lists[name]
+        columns[name] = {"dictionary": dictionaries[name].values, "offsets": offsets, "indices": indices}
+    return {name: columns[name] for name in COLUMNS}
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise ImportError("Arrow and Parquet export require pyarrow (pip install pyarrow)") from e
+    return pyarrow
+
+def _to_record_batch(columns):
+    pa = _require_pyarrow()
+
+    arrays = []
+    for name in COLUMNS:
+        column = columns[name]
+        if name in INT_COLUMNS:
+            arrays.append(pa.array(column, pa.int64()))
+        elif name in BOOL_COLUMNS:
+            arrays.append(pa.array(column, pa.bool_()))
+        elif name in STRING_COLUMNS:
+            arrays.append(pa.array(column, pa.string()))
+        elif name in DATE_COLUMNS:
+            arrays.append(pa.array(column, pa.timestamp("s")))
+        elif name in CATEGORY_COLUMNS:
+            arrays.append(pa.DictionaryArray.from_arrays(
+                pa.array(column["indices"], pa.int32()), pa.array(column["dictionary"], pa.string())))
+        elif name == "series_ids":
+            arrays.append(pa.ListArray.from_arrays(
+                pa.array(column["offsets"], pa.int32()), pa.array(column["values"], pa.int64())))
+        else:
+            values = pa.DictionaryArray.from_arrays(
+                pa.array(column["indices"], pa.int32()), pa.array(column["dictionary"], pa.string()))
+            arrays.append(pa.ListArray.from_arrays(pa.array(column["offsets"], pa.int32()), values))
+    return pa.RecordBatch.from_arrays(arrays, names=list(COLUMNS))
+
+def to_record_batches(items, batch_size=10000):
+    """Converts works to Arrow record batches. Requires pyarrow
+
+    Args:
+        items (iterable): AO3.Work or AO3.WorkBlurb objects, banner <li> elements or dicts from iter_banners()
+        batch_size (int, optional): Maximum number of rows per batch. Defaults to 10000.
+
+    Yields:
+        pyarrow.RecordBatch: Record batch
+    """
+
+    batch = []
+    for item in items:
+        batch.append(_record(item))
+        if len(batch) >= batch_size:
+            yield _to_record_batch(to_columns(batch))
+            batch = []
+    if batch:
+        yield _to_record_batch(to_columns(batch))
+
+def to_arrow(items):
+    """Converts works to an Arrow table. Requires pyarrow
+
+    Args:
+        items (iterable): AO3.Work or AO3.WorkBlurb objects, banner <li> elements or dicts from iter_banners()
+
+    Returns:
+        pyarrow.Table: Table with one row per work
+    """
+
+    pa = _require_pyarrow()
+    # A single batch, so that every dictionary column has a single dictionary
+    return pa.Table.from_batches([_to_record_batch(to_columns(items))])
+
+def to_parquet(items, path, batch_size=10000, compression="zstd"):
+    """Writes works to a Parquet file. Requires pyarrow
+
+    Args:
+        items (iterable): AO3.Work or AO3.WorkBlurb objects, banner <li> elements or dicts from iter_banners()
+        path (str): Output file
+        batch_size (int, optional): Number of rows converted and written at a time. Defaults to 10000.
+        compression (str, optional): Parquet compression codec. Defaults to "zstd".
+
+    Returns:
+        int: Number of rows written
+    """
+
+    pa = _require_pyarrow()
+    import pyarrow.parquet as pq
+
+    rows = 0
+    writer = None
+    try:
+        for batch in to_record_batches(items, batch_size):
+            if writer is None:
+                writer = pq.ParquetWriter(path, batch.schema, compression=compression)
+            writer.write_table(pa.Table.from_batches([batch]))
+            rows += batch.num_rows
+        if writer is None:
+            pq.write_table(to_arrow(()), path, compression=compression)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
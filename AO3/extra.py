@@ -3,9 +3,7 @@ import os
 import pathlib
 import pickle
 
-from bs4 import BeautifulSoup
-
-from . import threadable, utils
+from . import instrumentation, threadable, utils
 from .requester import requester
 
 
@@ -22,7 +20,7 @@ def _download_languages():
         url = "https://archiveofourown.org/languages"
         print(f"Downloading from {url}")
         req = requester.request("get", url)
-        soup = BeautifulSoup(req.content, "lxml")
+        soup = instrumentation.parse(req.content, "extra.download_languages")
         for dt in soup.find("dl", {"class": "language index group"}).findAll("dt"):
             if dt.a is not None: 
                 alias = dt.a.attrs["href"].split("/")[-1]
@@ -48,7 +46,7 @@ def _download_fandom(fandom_key, name):
         url = f"https://archiveofourown.org/media/{fandom_key}/fandoms"
         print(f"Downloading from {url}")
         req = requester.request("get", url)
-        soup = BeautifulSoup(req.content, "lxml")
+        soup = instrumentation.parse(req.content, "extra.download_fandom")
         for fandom in soup.find("ol", {"class": "alphabet fandom index group"}).findAll("a", {"class": "tag"}):
             fandoms.append(fandom.getText())
         with open(f"{os.path.join(fandom_path, name)}.pkl", "wb") as file:
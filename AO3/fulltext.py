@@ -0,0 +1,276 @@
+"""Offline full-text search over downloaded chapter text.
+
+Chapters are split into paragraphs (the lines of Chapter.text) and stored in
+an SQLite FTS5 table, so every hit maps back to (work_id, chapter_number,
+paragraph). A hash of every indexed chapter is kept, and adding a work again
+only rewrites the chapters whose text changed, so a work that gained
+chapters costs one insert per new chapter.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import warnings
+
+from . import utils
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chapters (
+    work_id INTEGER NOT NULL,
+    number INTEGER NOT NULL,
+    title TEXT,
+    hash TEXT NOT NULL,
+    first_row INTEGER NOT NULL,
+    paragraphs INTEGER NOT NULL,
+    PRIMARY KEY (work_id, number)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS paragraphs USING fts5(
+    text,
+    work_id UNINDEXED,
+    chapter UNINDEXED,
+    paragraph UNINDEXED,
+    tokenize = "unicode61 remove_diacritics 2"
+);
+"""
+
+
+def split_paragraphs(text):
+    """Returns the paragraphs of a chapter's text (its non-empty lines).
+    Paragraph numbers in the index are positions in this list, starting at 1"""
+
+    return [line for line in text.split("\n") if line.strip()]
+
+def _hash(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class FullTextIndex:
+    """SQLite FTS5 index of chapter text, one row per paragraph"""
+
+    def __init__(self, path=":memory:"):
+        """Opens (or creates) a full-text index
+
+        Args:
+            path (str, optional): Database file. Defaults to ":memory:".
+
+        Raises:
+            sqlite3.OperationalError: This SQLite build doesn't have FTS5
+        """
+
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        """Number of indexed chapters"""
+
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chapters").fetchone()[0]
+
+    def _delete_chapter(self, workid, number):
+        row = self._conn.execute("SELECT first_row, paragraphs FROM chapters WHERE work_id = ? AND number = ?",
+                                 (workid, number)).fetchone()
+        if row is None:
+            return
+        first, count = row
+        # A chapter's paragraphs have consecutive rowids, so they're deleted without a scan
+        self._conn.execute("DELETE FROM paragraphs WHERE rowid BETWEEN ? AND ?", (first, first+count-1))
+        self._conn.execute("DELETE FROM chapters WHERE work_id = ? AND number = ?", (workid, number))
+
+    def _write_chapter(self, workid, number, title, text):
+        """Indexes a chapter's text unless it's already indexed with the same text.
+        Returns True if it was written"""
+
+        digest = _hash(text)
+        row = self._conn.execute("SELECT hash FROM chapters WHERE work_id = ? AND number = ?",
+                                 (workid, number)).fetchone()
+        if row is not None and row[0] == digest:
+            return False
+        self._delete_chapter(workid, number)
+        paragraphs = split_paragraphs(text)
+        first = self._conn.execute("SELECT COALESCE(MAX(rowid), 0) + 1 FROM paragraphs").fetchone()[0]
+        self._conn.executemany(
+            "INSERT INTO paragraphs (rowid, text, work_id, chapter, paragraph) VALUES (?, ?, ?, ?, ?)",
+            [(first+i, paragraph, workid, number, i+1) for i, paragraph in enumerate(paragraphs)])
+        self._conn.execute(
+            "INSERT INTO chapters (work_id, number, title, hash, first_row, paragraphs) VALUES (?, ?, ?, ?, ?, ?)",
+            (workid, number, title, digest, first, len(paragraphs)))
+        return True
+
+    def add_chapter(self, chapter):
+        """Indexes a loaded chapter, replacing its old text if it changed
+
+        Args:
+            chapter (AO3.Chapter): Loaded chapter
+
+        Raises:
+            utils.UnloadedError: The chapter isn't loaded
+
+        Returns:
+            bool: True if the chapter was (re)indexed, False if it was already indexed with the same text
+        """
+
+        text = self._chapter_text(chapter)
+        if text is None:
+            raise utils.UnloadedError("Chapter isn't loaded. Have you tried calling Chapter.reload()?")
+        with self._lock, self._conn:
+            return self._write_chapter(chapter.work.id, chapter.number, self._chapter_title(chapter), text)
+
+    @staticmethod
+    def _chapter_text(chapter):
+        # Chapters restored by AO3.serialization aren't loaded but have their text cached
+        if not chapter.loaded and "text" not in chapter.__dict__:
+            return None
+        return chapter.text
+
+    @staticmethod
+    def _chapter_title(chapter):
+        try:
+            return chapter.title
+        except AttributeError:
+            return None
+
+    def add_work(self, work):
+        """Indexes the chapters of a work. Chapters whose text didn't change since they
+        were indexed are skipped, and chapters the work no longer has are removed
+
+        Args:
+            work (AO3.Work): Work loaded with its chapters
+
+        Raises:
+            utils.UnloadedError: The work's chapters aren't loaded
+
+        Returns:
+            int: Number of chapters that were (re)indexed
+        """
+
+        chapters = [(chapter, self._chapter_text(chapter)) for chapter in work.chapters]
+        if len(chapters) == 0 or any(text is None for _, text in chapters):
+            raise utils.UnloadedError("Work chapters aren't loaded. Have you tried calling Work.load_chapters()?")
+        written = 0
+        with self._lock, self._conn:
+            numbers = set()
+            for chapter, text in chapters:
+                numbers.add(chapter.number)
+                written += self._write_chapter(work.id, chapter.number, self._chapter_title(chapter), text)
+            for (number,) in self._conn.execute("SELECT number FROM chapters WHERE work_id = ?", (work.id,)).fetchall():
+                if number not in numbers:
+                    self._delete_chapter(work.id, number)
+        return written
+
+    def add_works(self, works, skip_unloaded=True):
+        """Indexes works as they come, e.g. from Work.load_many(..., load_chapters=True) or a
+        generator. Every work is committed on its own, so an interrupted ingest keeps what it indexed
+
+        Args:
+            works (iterable): AO3.Work objects loaded with their chapters
+            skip_unloaded (bool, optional): Skip works without loaded chapters (with a warning
+            listing them) instead of raising. Defaults to True.
+
+        Returns:
+            int: Number of chapters that were (re)indexed
+        """
+
+        written = 0
+        skipped = []
+        for work in works:
+            try:
+                written += self.add_work(work)
+            except utils.UnloadedError:
+                if not skip_unloaded:
+                    raise
+                skipped.append(work.id)
+        if len(skipped) > 0:
+            warnings.warn(f"{len(skipped)} works were skipped because their chapters aren't loaded "
+                          f"(work IDs: {', '.join(map(str, skipped[:10]))}{', ...' if len(skipped) > 10 else ''})")
+        return written
+
+    def remove_work(self, workid):
+        """Removes every chapter of a work from the index
+
+        Args:
+            workid (int): AO3 work ID
+        """
+
+        with self._lock, self._conn:
+            for (number,) in self._conn.execute("SELECT number FROM chapters WHERE work_id = ?", (workid,)).fetchall():
+                self._delete_chapter(workid, number)
+
+    def chapters(self, workid):
+        """Returns the indexed chapters of a work
+
+        Args:
+            workid (int): AO3 work ID
+
+        Returns:
+            list: (chapter_number, title, paragraphs) tuples
+        """
+
+        with self._lock:
+            return self._conn.execute(
+                "SELECT number, title, paragraphs FROM chapters WHERE work_id = ? ORDER BY number",
+                (workid,)).fetchall()
+
+    def search(self, query, workid=None, limit=50, offset=0):
+        """Searches the indexed paragraphs, best matches first
+
+        Args:
+            query (str): FTS5 query (words, "phrases", AND/OR/NOT, prefix*, NEAR(...))
+            workid (int, optional): Only search this work. Defaults to None.
+            limit (int, optional): Maximum number of hits. Defaults to 50.
+            offset (int, optional): Number of hits to skip. Defaults to 0.
+
+        Raises:
+            sqlite3.OperationalError: Invalid query
+
+        Returns:
+            list: (work_id, chapter_number, paragraph, snippet) tuples. The snippet marks
+            the matched words with [ and ]
+        """
+
+        sql = ("SELECT work_id, chapter, paragraph, snippet(paragraphs, 0, '[', ']', '...', 16) "
+               "FROM paragraphs WHERE paragraphs MATCH ?")
+        params = [query]
+        if workid is not None:
+            sql += " AND work_id = ?"
+            params.append(workid)
+        sql += " ORDER BY rank LIMIT ? OFFSET ?"
+        params += [limit, offset]
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def count(self, query):
+        """Returns the number of paragraphs that match a query"""
+
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM paragraphs WHERE paragraphs MATCH ?",
+                                      (query,)).fetchone()[0]
+
+    def get_paragraph(self, workid, chapter, paragraph):
+        """Returns the full text of an indexed paragraph, or None if it isn't indexed
+
+        Args:
+            workid (int): AO3 work ID
+            chapter (int): Chapter number
+            paragraph (int): Paragraph number (starting at 1)
+        """
+
+        with self._lock:
+            row = self._conn.execute("SELECT first_row, paragraphs FROM chapters WHERE work_id = ? AND number = ?",
+                                     (workid, chapter)).fetchone()
+            if row is None or not 1 <= paragraph <= row[1]:
+                return None
+            return self._conn.execute("SELECT text FROM paragraphs WHERE rowid = ?",
+                                      (row[0]+paragraph-1,)).fetchone()[0]
@@ -0,0 +1,332 @@
+"""In-memory inverted index of crawled works.
+
+Every work added to a WorkIndex gets a document number, and every tag (in
+any of the tag fields) gets a postings list: the sorted array of the
+documents that have it. When a tag is queried, its postings are turned into
+a bitmap with one bit per document, stored as a Python int and kept until
+more works are added, so queries are a few big-integer AND/OR/NOT operations
+that take milliseconds even with a million works. Numeric fields (words,
+kudos, hits...) are answered from the works sorted by value, with a bitmap
+saved at regular positions so a range only has to set the bits between two
+of them.
+"""
+
+import bisect
+import pickle
+import sys
+import threading
+from array import array
+
+from .tagdict import dictionary
+
+TAG_FIELDS = ("fandoms", "characters", "relationships", "tags", "warnings", "categories", "rating", "language")
+NUMERIC_FIELDS = ("words", "kudos", "hits", "bookmarks", "comments", "nchapters")
+# Bitmaps saved per numeric field. A range query sets at most 2*N/RANGE_CHECKPOINTS bits by hand
+RANGE_CHECKPOINTS = 64
+
+
+def _field(work, field):
+    try:
+        return getattr(work, field)
+    except AttributeError:
+        return None
+
+def _bitmap(docs, size):
+    """Returns the bitmap with the bits of the given document numbers set"""
+
+    bits = bytearray((size+7) // 8)
+    for doc in docs:
+        bits[doc >> 3] |= 1 << (doc & 7)
+    return int.from_bytes(bits, "little")
+
+
+class _Range:
+    """Documents sorted by the value of a numeric field"""
+
+    def __init__(self, values):
+        docs = sorted((doc for doc, value in enumerate(values) if value is not None), key=values.__getitem__)
+        self.docs = docs
+        self.values = [values[doc] for doc in docs]
+        self.step = max(-(-len(docs) // RANGE_CHECKPOINTS), 1)
+        # checkpoints[i] has the bits of docs[:i*step]
+        self.checkpoints = []
+        bits = bytearray((len(values)+7) // 8)
+        for start in range(0, len(docs)+1, self.step):
+            self.checkpoints.append(int.from_bytes(bits, "little"))
+            for doc in docs[start:start+self.step]:
+                bits[doc >> 3] |= 1 << (doc & 7)
+        self.size = len(values)
+
+    def prefix(self, position):
+        """Returns the bitmap of the first `position` documents"""
+
+        i = position // self.step
+        return self.checkpoints[i] | _bitmap(self.docs[i*self.step:position], self.size)
+
+    def between(self, low=None, high=None):
+        start = 0 if low is None else bisect.bisect_left(self.values, low)
+        end = len(self.values) if high is None else bisect.bisect_right(self.values, high)
+        if end <= start:
+            return 0
+        return self.prefix(end) & ~self.prefix(start)
+
+
+class WorkIndex:
+    """Inverted index of the tags and stats of many works (AO3.Work or AO3.WorkBlurb objects).
+
+    Queries return bitmaps (ints, one bit per document) that can be combined with
+    & and |, and negated with index.invert(). index.ids() turns a bitmap into work IDs.
+    Adding a work that's already indexed replaces it.
+    """
+
+    def __init__(self, tag_dictionary=None):
+        """Creates an empty index
+
+        Args:
+            tag_dictionary (AO3.tagdict.TagDictionary, optional): Dictionary that gives tags their IDs.
+            Defaults to the shared dictionary.
+        """
+
+        self.dictionary = dictionary if tag_dictionary is None else tag_dictionary
+        self._workids = []
+        self._docs = {}
+        self._postings = {field: {} for field in TAG_FIELDS}
+        self._values = {field: [] for field in NUMERIC_FIELDS}
+        # (field, tagid) -> (number of postings it was built from, bitmap)
+        self._bitmaps = {}
+        self._ranges = {}
+        self._deleted = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def __contains__(self, workid):
+        return workid in self._docs
+
+    def __repr__(self):
+        return f"<WorkIndex [{len(self)} works]>"
+
+    def __getstate__(self):
+        d = self.__dict__.copy()
+        del d["_lock"]
+        # Rebuilt when they are queried again
+        d["_bitmaps"] = {}
+        d["_ranges"] = {}
+        return d
+
+    def __setstate__(self, d):
+        self.__dict__.update(d)
+        self._lock = threading.RLock()
+
+    def add(self, work):
+        """Indexes a work, replacing it if it was already indexed
+
+        Args:
+            work (AO3.Work/AO3.WorkBlurb): Loaded work, work parsed from a listing, or blurb
+        """
+
+        with self._lock:
+            if work.id in self._docs:
+                self.remove(work.id)
+            doc = len(self._workids)
+            self._workids.append(work.id)
+            self._docs[work.id] = doc
+            for field, postings in self._postings.items():
+                value = _field(work, field)
+                if value is None:
+                    continue
+                if isinstance(value, str):
+                    value = (value,)
+                for tagid in self.dictionary.get_ids(value):
+                    if tagid not in postings:
+                        postings[tagid] = array("I")
+                    postings[tagid].append(doc)
+            for field, values in self._values.items():
+                values.append(_field(work, field))
+            if self._ranges:
+                self._ranges.clear()
+
+    def add_many(self, works):
+        """Indexes every work in an iterable. See add()"""
+
+        with self._lock:
+            for work in works:
+                self.add(work)
+
+    def remove(self, workid):
+        """Removes a work from the index, if it's in it
+
+        Args:
+            workid (int): AO3 work ID
+        """
+
+        with self._lock:
+            doc = self._docs.pop(workid, None)
+            if doc is not None:
+                # It stays in the postings, but deleted documents are never returned
+                self._deleted |= 1 << doc
+                for values in self._values.values():
+                    values[doc] = None
+                self._ranges.clear()
+
+    @property
+    def all(self):
+        """Bitmap of every indexed work"""
+
+        return ((1 << len(self._workids)) - 1) & ~self._deleted
+
+    def invert(self, bitmap):
+        """Returns the bitmap of the indexed works that aren't in `bitmap`"""
+
+        return self.all & ~bitmap
+
+    def tag(self, name, field=None):
+        """Returns the bitmap of the works with a tag
+
+        Args:
+            name (str): Tag, fandom, character, relationship, warning, category, rating or language
+            field (str, optional): Only look for it in this field (e.g. "fandoms"). Defaults to None (any field).
+
+        Raises:
+            ValueError: Unknown field
+
+        Returns:
+            int: Bitmap
+        """
+
+        if field is not None and field not in self._postings:
+            raise ValueError(f"'{field}' isn't a tag field ({', '.join(TAG_FIELDS)})")
+        tagid = self.dictionary.get_id(name, add=False)
+        if tagid is None:
+            return 0
+        fields = self._postings if field is None else (field,)
+        bitmap = 0
+        for f in fields:
+            bitmap |= self._posting_bitmap(f, tagid)
+        return bitmap & ~self._deleted
+
+    def _posting_bitmap(self, field, tagid):
+        docs = self._postings[field].get(tagid)
+        if docs is None:
+            return 0
+        key = (field, tagid)
+        built = self._bitmaps.get(key)
+        if built is not None and built[0] == len(docs):
+            return built[1]
+        bitmap = _bitmap(docs, len(self._workids))
+        self._bitmaps[key] = (len(docs), bitmap)
+        return bitmap
+
+    def range(self, field, low=None, high=None):
+        """Returns the bitmap of the works whose value for a numeric field is between
+        low and high (both included). Works without a value are left out
+
+        Args:
+            field (str): "words", "kudos", "hits", "bookmarks", "comments" or "nchapters"
+            low (int, optional): Minimum value. Defaults to None (no minimum).
+            high (int, optional): Maximum value. Defaults to None (no maximum).
+
+        Raises:
+            ValueError: Unknown field
+
+        Returns:
+            int: Bitmap
+        """
+
+        if field not in self._values:
+            raise ValueError(f"'{field}' isn't a numeric field ({', '.join(NUMERIC_FIELDS)})")
+        with self._lock:
+            if field not in self._ranges:
+                self._ranges[field] = _Range(self._values[field])
+            r = self._ranges[field]
+        return r.between(low, high)
+
+    def query(self, tags=(), any_of=(), exclude=(), **ranges):
+        """Finds the works that match every condition
+
+        Args:
+            tags (iterable, optional): Tags every work must have. Defaults to ().
+            any_of (iterable, optional): Works must have at least one of these tags (ignored if empty). Defaults to ().
+            exclude (iterable, optional): Tags works can't have. Defaults to ().
+            ranges: (low, high) tuples for numeric fields, e.g. words=(1000, None). None means no limit
+
+        Returns:
+            list: IDs of the matching works, in the order they were indexed
+        """
+
+        return self.ids(self.match(tags, any_of, exclude, **ranges))
+
+    def match(self, tags=(), any_of=(), exclude=(), **ranges):
+        """Same as query(), but returns the bitmap of the matching works"""
+
+        bitmap = self.all
+        for name in tags:
+            bitmap &= self.tag(name)
+        # any_of can be any iterable, so it's only applied once a tag was read from it
+        matches = None
+        for name in any_of:
+            matches = self.tag(name) if matches is None else matches | self.tag(name)
+        if matches is not None:
+            bitmap &= matches
+        for name in exclude:
+            bitmap &= ~self.tag(name)
+        for field, (low, high) in ranges.items():
+            bitmap &= self.range(field, low, high)
+        return bitmap
+
+    def ids(self, bitmap):
+        """Returns the work IDs in a bitmap, in the order they were indexed"""
+
+        bitmap &= ~self._deleted
+        workids = self._workids
+        result = []
+        if bitmap == 0:
+            return result
+        words = array("Q", bitmap.to_bytes(-(-bitmap.bit_length() // 64) * 8, "little"))
+        if sys.byteorder == "big":
+            words.byteswap()
+        # Empty 64-bit words are skipped without looking at their bits
+        for i, word in enumerate(words):
+            while word:
+                low = word & -word
+                result.append(workids[i*64 + low.bit_length() - 1])
+                word ^= low
+        return result
+
+    def count(self, bitmap):
+        """Returns the number of indexed works in a bitmap"""
+
+        # int.bit_count() needs Python 3.10
+        return bin(bitmap & ~self._deleted).count("1")
+
+    def save(self, path):
+        """Saves the index, with its tag dictionary, to a file
+
+        Args:
+            path (str): Output file
+        """
+
+        with self._lock:
+            with open(path, "wb") as file:
+                pickle.dump(self, file, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path):
+        """Loads an index saved with save()
+
+        Args:
+            path (str): Index file
+
+        Raises:
+            TypeError: The file doesn't contain an index
+
+        Returns:
+            WorkIndex: The index. It uses its own copy of the tag dictionary it was saved with
+        """
+
+        with open(path, "rb") as file:
+            index = pickle.load(file)
+        if not isinstance(index, WorkIndex):
+            raise TypeError(f"{path} doesn't contain a WorkIndex")
+        return index
@@ -0,0 +1,266 @@
+import math
+import re
+import threading
+import time
+import warnings
+
+_URL_CLASSES = (
+    ("comment", re.compile(r"^/comments(/|$)")),
+    ("search", re.compile(r"^/works/search")),
+    ("chapter", re.compile(r"^/(works/\d+/)?chapters/\d+")),
+    ("work_bookmarks", re.compile(r"^/works/\d+/bookmarks")),
+    ("work", re.compile(r"^/works/\d+")),
+    ("download", re.compile(r"^/downloads/")),
+    ("series", re.compile(r"^/series/\d+")),
+    ("login", re.compile(r"^/users/(login|logout)")),
+    ("user_works", re.compile(r"^/users/[^/]+/works")),
+    ("user_bookmarks", re.compile(r"^/users/[^/]+/bookmarks")),
+    ("user_subscriptions", re.compile(r"^/users/[^/]+/subscriptions")),
+    ("user_history", re.compile(r"^/users/[^/]+/readings")),
+    ("user_profile", re.compile(r"^/users/[^/]+/profile")),
+    ("user", re.compile(r"^/users/[^/]+")),
+    ("bookmarks", re.compile(r"^/bookmarks")),
+    ("kudos", re.compile(r"^/kudos")),
+    ("resources", re.compile(r"^/(languages|media)")),
+)
+
+
+def classify_url(url):
+    """Returns a short name for the kind of page a URL points to (e.g. 'work', 'search')
+
+    Args:
+        url (str): URL
+
+    Returns:
+        str: URL class, or 'other'
+    """
+
+    path = re.sub(r"^[a-z]+://[^/]+", "", url).split("?")[0]
+    for name, pattern in _URL_CLASSES:
+        if pattern.match(path):
+            return name
+    return "other"
+
+
+class RequestEvent:
+    """Information about a single request sent through a Requester.
+    Durations are in seconds, and are None if the transport didn't provide them"""
+
+    __slots__ = ("method", "url", "url_class", "status", "bytes", "dns", "connect",
+                 "ttfb", "total", "limiter_wait", "retries", "error", "priority", "timestamp")
+
+    def __init__(self, method, url):
+        self.method = method.upper()
+        self.url = url
+        self.url_class = classify_url(url)
+        self.status = None
+        self.bytes = None
+        self.dns = None
+        self.connect = None
+        self.ttfb = None
+        self.total = None
+        self.limiter_wait = 0.0
+        self.retries = 0
+        self.error = None
+        self.priority = None
+        self.timestamp = time.time()
+
+    def __repr__(self):
+        return f"<RequestEvent [{self.method} {self.url_class} {self.status}]>"
+
+
+class ParseEvent:
+    """Information about a single HTML parse"""
+
+    __slots__ = ("site", "bytes", "duration", "timestamp")
+
+    def __init__(self, site, bytes_, duration):
+        self.site = site
+        self.bytes = bytes_
+        self.duration = duration
+        self.timestamp = time.time()
+
+    def __repr__(self):
+        return f"<ParseEvent [{self.site} {self.duration:.4f}s]>"
+
+
+class Histogram:
+    """Log-bucketed histogram. Buckets grow by a factor of 2**(1/4), so
+    percentiles are accurate to about 10%"""
+
+    _BASE = 2 ** 0.25
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+        self._buckets = {}
+
+    def add(self, value):
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        bucket = None if value <= 0 else math.floor(math.log(value, self._BASE))
+        self._buckets[bucket] = self._buckets.get(bucket, 0) + 1
+
+    def percentile(self, p):
+        """Returns an approximation of the p-th percentile (0-100)"""
+
+        if self.count == 0:
+            return None
+        rank = p / 100 * self.count
+        seen = 0
+        for bucket in sorted(self._buckets, key=lambda b: -math.inf if b is None else b):
+            seen += self._buckets[bucket]
+            if seen >= rank:
+                if bucket is None:
+                    return 0.0
+                # Upper bound of the bucket, clamped to what was actually seen
+                return min(self._BASE ** (bucket+1), self.max)
+        return self.max
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else None
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.mean,
+            "min": self.min,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
+
+
+class Instrumentation:
+    """Collects request and parse events, passes them to hooks and aggregates
+    them in histograms"""
+
+    _REQUEST_METRICS = ("total", "ttfb", "dns", "connect", "limiter_wait", "bytes", "retries")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._request_hooks = []
+        self._parse_hooks = []
+        self.aggregate = True
+        self.reset()
+
+    def reset(self):
+        """Clears all aggregated metrics"""
+
+        with self._lock:
+            self._requests = {}
+            self._statuses = {}
+            self._parses = {}
+
+    def add_request_hook(self, hook):
+        """Calls hook(event) with a RequestEvent after every request"""
+        self._request_hooks.append(hook)
+
+    def add_parse_hook(self, hook):
+        """Calls hook(event) with a ParseEvent after every HTML parse"""
+        self._parse_hooks.append(hook)
+
+    def remove_hook(self, hook):
+        """Removes a request or parse hook"""
+
+        if hook in self._request_hooks:
+            self._request_hooks.remove(hook)
+        if hook in self._parse_hooks:
+            self._parse_hooks.remove(hook)
+
+    @staticmethod
+    def _call(hooks, event):
+        for hook in tuple(hooks):
+            try:
+                hook(event)
+            except Exception as e:
+                warnings.warn(f"Instrumentation hook {hook!r} raised {e!r}")
+
+    def record_request(self, event):
+        """Aggregates a RequestEvent and passes it to the request hooks"""
+
+        if self.aggregate:
+            with self._lock:
+                metrics = self._requests.setdefault(event.url_class, {})
+                for name in self._REQUEST_METRICS:
+                    value = getattr(event, name)
+                    if value is not None:
+                        metrics.setdefault(name, Histogram()).add(value)
+                statuses = self._statuses.setdefault(event.url_class, {})
+                status = event.status if event.error is None else "error"
+                statuses[status] = statuses.get(status, 0) + 1
+        self._call(self._request_hooks, event)
+
+    def record_parse(self, event):
+        """Aggregates a ParseEvent and passes it to the parse hooks"""
+
+        if self.aggregate:
+            with self._lock:
+                metrics = self._parses.setdefault(event.site, {})
+                metrics.setdefault("duration", Histogram()).add(event.duration)
+                metrics.setdefault("bytes", Histogram()).add(event.bytes)
+        self._call(self._parse_hooks, event)
+
+    def summary(self):
+        """Returns the aggregated metrics.
+
+        The 'totals' entry adds up the time spent on the network, waiting for
+        the rate limiter and parsing HTML, which shows what a job is bound by.
+
+        Returns:
+            dict: {'requests': {url_class: {metric: stats}}, 'statuses': {url_class: {status: count}},
+            'parses': {site: {metric: stats}}, 'totals': {...}}
+        """
+
+        with self._lock:
+            requests = {cls: {name: h.summary() for name, h in metrics.items()}
+                        for cls, metrics in self._requests.items()}
+            parses = {site: {name: h.summary() for name, h in metrics.items()}
+                      for site, metrics in self._parses.items()}
+            statuses = {cls: dict(counts) for cls, counts in self._statuses.items()}
+
+        def total(group, metric):
+            return sum(metrics[metric]["sum"] for metrics in group.values() if metric in metrics)
+
+        return {
+            "requests": requests,
+            "statuses": statuses,
+            "parses": parses,
+            "totals": {
+                "requests": sum(sum(counts.values()) for counts in statuses.values()),
+                "network_seconds": total(requests, "total"),
+                "limiter_wait_seconds": total(requests, "limiter_wait"),
+                "parse_seconds": total(parses, "duration"),
+                "bytes": total(requests, "bytes"),
+            },
+        }
+
+
+instrumentation = Instrumentation()
+
+
+def parse(content, site, features="lxml"):
+    """Parses HTML with BeautifulSoup and records how long it took
+
+    Args:
+        content (bytes/str): HTML
+        site (str): Name of the call site, used to aggregate parse times (e.g. 'works.reload')
+        features (str, optional): BeautifulSoup parser. Defaults to "lxml".
+
+    Returns:
+        bs4.BeautifulSoup: Parsed document
+    """
+
+    from bs4 import BeautifulSoup
+
+    start = time.perf_counter()
+    soup = BeautifulSoup(content, features)
+    instrumentation.record_parse(ParseEvent(site, len(content), time.perf_counter() - start))
+    return soup
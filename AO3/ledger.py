@@ -0,0 +1,115 @@
+"""Rate limit shared between processes.
+
+A Requester normally only knows about the requests made by its own process,
+so N worker processes make N times as many requests as the limit allows. With
+a ledger, every request is recorded in an SQLite database that all the
+processes on the machine use, and a request is only sent once the shared time
+window has room for it.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+
+class SQLiteLedger:
+    """Record of the requests made by every process that uses the same file"""
+
+    def __init__(self, path, name="ao3", timeout=30):
+        """Creates a new ledger
+
+        Args:
+            path (str): Database file. Created if it doesn't exist.
+            name (str, optional): Name of the limit. Requesters using different names on the
+            same file are limited separately (e.g. one per account). Defaults to "ao3".
+            timeout (int, optional): Seconds to wait for another process to release the database. Defaults to 30.
+        """
+
+        self.path = path
+        self.name = name
+        self.timeout = timeout
+        self._conn = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        d = self.__dict__.copy()
+        d["_conn"] = d["_pid"] = None
+        del d["_lock"]
+        return d
+
+    def __setstate__(self, d):
+        self.__dict__.update(d)
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        # Connections can't be shared with forked processes
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                                         check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS requests (name TEXT NOT NULL, t REAL NOT NULL)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS requests_name_t ON requests(name, t)")
+            self._pid = os.getpid()
+        return self._conn
+
+    def acquire(self, limit, timew):
+        """Records a request if fewer than `limit` were made in the last `timew` seconds
+
+        Args:
+            limit (int): Maximum requests per time window
+            timew (float): Time window (seconds)
+
+        Returns:
+            tuple: (0, slot) if the request was recorded, otherwise (seconds until there's room, None).
+            The slot is passed to release() once the request finished
+        """
+
+        with self._lock:
+            conn = self._connection()
+            # Taking the write lock right away makes the check and the insert atomic across processes
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                t = time.time()
+                conn.execute("DELETE FROM requests WHERE name = ? AND t <= ?", (self.name, t-timew))
+                recent = [row[0] for row in conn.execute(
+                    "SELECT t FROM requests WHERE name = ? ORDER BY t", (self.name,))]
+                if len(recent) < limit:
+                    slot = conn.execute("INSERT INTO requests (name, t) VALUES (?, ?)", (self.name, t)).lastrowid
+                    wait = 0.0
+                else:
+                    # Enough requests have to exit the window to give us a slot
+                    slot = None
+                    wait = max(recent[len(recent)-limit] + timew - t, 0.001)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return wait, slot
+
+    def release(self, slot):
+        """Moves a recorded request's time to now, when it finished"""
+
+        with self._lock:
+            self._connection().execute("UPDATE requests SET t = ? WHERE rowid = ?", (time.time(), slot))
+
+    def recent(self, timew):
+        """Returns the times of the requests made in the last `timew` seconds, oldest first"""
+
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT t FROM requests WHERE name = ? AND t > ? ORDER BY t", (self.name, time.time()-timew))
+            return [row[0] for row in rows]
+
+    def clear(self):
+        """Forgets every request made under this ledger's name"""
+
+        with self._lock:
+            self._connection().execute("DELETE FROM requests WHERE name = ?", (self.name,))
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,242 @@
+"""Cheap stat polling for large sets of works.
+
+Instead of reloading every work, the works are looked up 20 at a time with an
+`id:(... OR ...)` search, whose result banners carry hits, kudos, bookmarks,
+comments, words, chapters and the update date. A work is only fully reloaded
+when its update date or number of chapters changed.
+"""
+
+import datetime
+import json
+import os
+
+from . import threadable
+from .common import get_work_from_banner
+from .search import search
+
+# Search results are shown 20 per page
+BATCH_SIZE = 20
+STAT_FIELDS = ("hits", "kudos", "bookmarks", "comments", "words")
+UPDATE_FIELDS = ("date_updated", "nchapters")
+
+
+def _snapshot(work):
+    """Returns the polled fields of a (banner or loaded) work, as JSON-friendly values"""
+
+    snapshot = {}
+    for field in STAT_FIELDS + UPDATE_FIELDS:
+        try:
+            value = getattr(work, field)
+        except AttributeError:
+            value = None
+        if isinstance(value, datetime.datetime):
+            value = value.date()
+        if isinstance(value, datetime.date):
+            value = value.isoformat()
+        snapshot[field] = value
+    return snapshot
+
+def _diff(old, new):
+    return {field: (old.get(field), value) for field, value in new.items()
+            if value is not None and old.get(field) != value}
+
+def fetch_banners(workids, session=None):
+    """Fetches the search result banners of up to 20 works with a single request
+
+    Args:
+        workids (list): AO3 work IDs (at most 20)
+        session (AO3.Session, optional): Session used for the search. Restricted works only
+        show up for authenticated sessions. Defaults to None.
+
+    Returns:
+        dict: {workid: AO3.Work} with the works parsed from their banners (not loaded).
+        Works that weren't found (deleted, hidden, restricted...) are missing
+    """
+
+    if len(workids) == 0:
+        return {}
+    soup = search(f"id:({' OR '.join(map(str, workids))})", session=session)
+    works = {}
+    results = soup.find("ol", {"class": ("work", "index", "group")})
+    if results is None:
+        return works
+    for li in results.find_all("li", {"role": "article"}):
+        if li.h4 is None:
+            continue
+        work = get_work_from_banner(li)
+        work._session = session
+        works[work.id] = work
+    return works
+
+
+class StatMonitor:
+    """Tracks the stats of many works, using one request per 20 works.
+
+    Every poll() compares the stats shown in search results with the previous
+    snapshot. Works whose update date or number of chapters changed are fully
+    reloaded; for the rest, only the new stats are reported (and written to the
+    Work objects being tracked, if any).
+    """
+
+    def __init__(self, works=(), session=None, state_file=None, store=None, load_chapters=False):
+        """Creates a new stat monitor
+
+        Args:
+            works (iterable, optional): AO3.Work objects or work IDs to track. Defaults to ().
+            session (AO3.Session, optional): Session used for searches and reloads. Defaults to None.
+            state_file (str, optional): JSON file the snapshots are loaded from and saved to after every poll. Defaults to None.
+            store (AO3.store.WorkStore, optional): Store that receives the polled works, keeping their stat history. Defaults to None.
+            load_chapters (bool, optional): Parse the chapters of works that are reloaded. Defaults to False.
+        """
+
+        self.session = session
+        self.state_file = state_file
+        self.store = store
+        self.load_chapters = load_chapters
+        self.snapshots = {}
+        self._works = {}
+        if state_file is not None and os.path.exists(state_file):
+            with open(state_file, "r") as file:
+                self.snapshots = {int(workid): snapshot for workid, snapshot in json.load(file).items()}
+        for work in works:
+            self.add(work)
+
+    def __len__(self):
+        return len(self._works)
+
+    def __repr__(self):
+        return f"<StatMonitor [{len(self)} works]>"
+
+    def add(self, work):
+        """Starts tracking a work. If a loaded Work object is given, its current
+        stats are used as the first snapshot
+
+        Args:
+            work (AO3.Work/int): Work object or ID
+        """
+
+        from .works import Work
+
+        if isinstance(work, Work):
+            self._works[work.id] = work
+            if work.id not in self.snapshots and work.loaded:
+                self.snapshots[work.id] = _snapshot(work)
+        else:
+            self._works.setdefault(int(work), None)
+
+    def remove(self, workid):
+        """Stops tracking a work"""
+
+        self._works.pop(workid, None)
+        self.snapshots.pop(workid, None)
+
+    def save_state(self, path=None):
+        """Saves the snapshots to a JSON file
+
+        Args:
+            path (str, optional): Output file. Defaults to the monitor's state_file.
+        """
+
+        path = self.state_file if path is None else path
+        with open(path, "w") as file:
+            json.dump(self.snapshots, file)
+
+    def _reload(self, workid):
+        from .works import Work
+
+        work = self._works.get(workid)
+        try:
+            if work is None:
+                work = Work(workid, self.session, True, self.load_chapters)
+            else:
+                work.reload(self.load_chapters)
+            return workid, work, None
+        except Exception as e:
+            return workid, work, e
+
+    def _fetch(self, batch):
+        try:
+            return batch, fetch_banners(batch, self.session), None
+        except Exception as e:
+            return batch, {}, e
+
+    def poll(self, workers=1):
+        """Checks every tracked work for changes. This makes one request per 20
+        works, plus one for each work that has to be reloaded.
+
+        The first time a work is seen, its stats become the baseline and no
+        event is reported for it.
+
+        Args:
+            workers (int, optional): Maximum number of requests made at the same time. Defaults to 1.
+
+        Returns:
+            list: (event, work, changes) tuples, where changes is {field: (old, new)}. event is one of:
+            "stats": only stats changed. work is the tracked Work object, or the one parsed from the search results
+            "updated": the update date or number of chapters changed, and work was reloaded
+            "missing": the work wasn't in the search results (deleted, hidden, restricted...). work is its ID and changes is None
+            "error": the search or the reload failed. work is the Work object or ID, and changes is the exception
+        """
+
+        workids = list(self._works)
+        batches = [workids[i:i+BATCH_SIZE] for i in range(0, len(workids), BATCH_SIZE)]
+        found = {}
+        # A failed search (e.g. rate limited) only affects its own batch
+        failed = {}
+        for batch, works, error in threadable.bounded_map(self._fetch, batches, workers):
+            found.update(works)
+            if error is not None:
+                failed.update((workid, error) for workid in batch)
+
+        events = []
+        to_reload = {}
+        polled = []
+        for workid in workids:
+            if workid in failed:
+                # The snapshot is kept, so the work is compared again on the next poll
+                events.append(("error", self._works[workid] or workid, failed[workid]))
+                continue
+            banner = found.get(workid)
+            if banner is None:
+                events.append(("missing", workid, None))
+                continue
+            new = _snapshot(banner)
+            old = self.snapshots.get(workid)
+            self.snapshots[workid] = new
+            if old is None:
+                polled.append(banner)
+                continue
+            changes = _diff(old, new)
+            if len(changes) == 0:
+                continue
+            if any(field in changes for field in UPDATE_FIELDS):
+                to_reload[workid] = (old, changes)
+                continue
+            work = self._works[workid]
+            if work is not None:
+                # Refresh the cached stats, the rest of the work didn't change
+                for field in changes:
+                    setattr(work, field, getattr(banner, field))
+            else:
+                work = banner
+            polled.append(banner)
+            events.append(("stats", work, changes))
+
+        reloaded = []
+        for workid, work, error in threadable.bounded_map(self._reload, to_reload, workers):
+            old, changes = to_reload[workid]
+            if error is None:
+                self._works[workid] = work
+                reloaded.append(work)
+                events.append(("updated", work, changes))
+            else:
+                # Keep the old snapshot, so the reload is tried again on the next poll
+                self.snapshots[workid] = old
+                events.append(("error", work if work is not None else workid, error))
+
+        if self.store is not None:
+            self.store.upsert_works(polled)
+            self.store.upsert_works(reloaded)
+        if self.state_file is not None:
+            self.save_state()
+        return events
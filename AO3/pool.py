@@ -0,0 +1,162 @@
+import itertools
+import threading
+
+from . import utils
+from .requester import Requester, requester
+from .session import GuestSession
+
+
+class SessionPool:
+    """Set of sessions that share the load of making requests.
+
+    Every session in the pool gets its own cookie jar and rate limiter (Requester),
+    so the number of requests that can be made per time window grows with the number
+    of sessions. Restricted works are routed to authenticated sessions, and everything
+    else to guest sessions (or authenticated ones, if there are no guests), always
+    picking the session with the most requests left in its window.
+    """
+
+    def __init__(self, sessions=(), guests=1, rqtw=12, timew=60, transport=None):
+        """Creates a new session pool
+
+        Args:
+            sessions (iterable, optional): AO3.Session/AO3.GuestSession objects. Defaults to ().
+            guests (int, optional): Number of guest sessions to create. Defaults to 1.
+            rqtw (int, optional): Maximum requests per time window for each session (-1 -> no limit). Defaults to 12.
+            timew (int, optional): Time window (seconds). Defaults to 60.
+            transport (optional): Transport used by the sessions' requesters. Defaults to the global requester's transport.
+        """
+
+        self.rqtw = rqtw
+        self.timew = timew
+        self.transport = transport
+        self._sessions = []
+        self._last_used = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        for session in sessions:
+            self.add(session)
+        for _ in range(guests):
+            self.add(GuestSession())
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __repr__(self):
+        return f"<SessionPool [{len(self.authed)} authed, {len(self.guests)} guests]>"
+
+    def add(self, session, rqtw=None, timew=None):
+        """Adds a session to the pool, giving it its own rate limiter
+
+        Args:
+            session (AO3.Session/AO3.GuestSession): Session object
+            rqtw (int, optional): Maximum requests per time window for this session. Defaults to the pool's.
+            timew (int, optional): Time window (seconds) for this session. Defaults to the pool's.
+        """
+
+        transport = requester.transport if self.transport is None else self.transport
+        session.requester = Requester(self.rqtw if rqtw is None else rqtw,
+                                      self.timew if timew is None else timew,
+                                      transport)
+        with self._lock:
+            self._sessions.append(session)
+            self._last_used[id(session)] = -1
+
+    def remove(self, session):
+        """Removes a session from the pool. It goes back to using the shared requester"""
+
+        with self._lock:
+            self._sessions.remove(session)
+            self._last_used.pop(id(session), None)
+        session.requester = requester
+
+    @property
+    def sessions(self):
+        return list(self._sessions)
+
+    @property
+    def authed(self):
+        """Authenticated sessions in the pool"""
+        return [session for session in self._sessions if session.is_authed]
+
+    @property
+    def guests(self):
+        """Guest sessions in the pool"""
+        return [session for session in self._sessions if not session.is_authed]
+
+    def get_session(self, restricted=False):
+        """Picks the session that should make the next request
+
+        Args:
+            restricted (bool, optional): The request needs an authenticated session. Defaults to False.
+
+        Raises:
+            utils.AuthError: There are no authenticated sessions for a restricted request
+
+        Returns:
+            AO3.Session/AO3.GuestSession: Session with the most requests left in its window
+        """
+
+        with self._lock:
+            candidates = [session for session in self._sessions if session.is_authed]
+            if not restricted:
+                candidates = [session for session in self._sessions if not session.is_authed] or candidates
+            if len(candidates) == 0:
+                if restricted:
+                    raise utils.AuthError("There are no authenticated sessions in this pool")
+                raise utils.AuthError("This pool has no sessions")
+            # Most requests available first, then earliest slot, then least recently used
+            session = min(candidates, key=lambda s: (-s.requester.available(), s.requester.next_slot(),
+                                                     self._last_used[id(s)]))
+            self._last_used[id(session)] = next(self._counter)
+        return session
+
+    def get_work(self, workid, restricted=False, load=True, load_chapters=True):
+        """Creates a Work object that makes its requests through a session from the pool
+
+        Args:
+            workid (int): AO3 work ID
+            restricted (bool, optional): The work is only available to registered users. If a work turns out
+            to be restricted, it's loaded again with an authenticated session anyway. Defaults to False.
+            load (bool, optional): If true, the work is loaded. Defaults to True.
+            load_chapters (bool, optional): If false, chapter text won't be parsed. Defaults to True.
+
+        Returns:
+            AO3.Work: Work object
+        """
+
+        from .works import Work
+
+        session = self.get_session(restricted)
+        try:
+            return Work(workid, session, load, load_chapters)
+        except utils.AuthError:
+            if session.is_authed or len(self.authed) == 0:
+                raise
+        return Work(workid, self.get_session(True), load, load_chapters)
+
+    def get_series(self, seriesid, load=True):
+        """Creates a Series object that makes its requests through a session from the pool"""
+
+        from .series import Series
+        return Series(seriesid, self.get_session(), load)
+
+    def get_user(self, username, load=True):
+        """Creates a User object that makes its requests through a session from the pool"""
+
+        from .users import User
+        return User(username, self.get_session(), load)
+
+    def stats(self):
+        """Returns the state of every session's rate limiter
+
+        Returns:
+            list: dicts with 'username', 'authed', 'total' (requests made) and 'available' (requests left in the window)
+        """
+
+        return [{
+            "username": session.username,
+            "authed": session.is_authed,
+            "total": session.requester.total,
+            "available": session.requester.available(),
+        } for session in self._sessions]
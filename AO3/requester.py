@@ -1,72 +1,252 @@
+import bisect
+import contextlib
+import itertools
 import threading
 import time
 
-import requests
+from .instrumentation import RequestEvent, instrumentation
+from .transport import HTTPTransport
+
+INTERACTIVE = 0
+NORMAL = 1
+BACKGROUND = 2
+PRIORITIES = (INTERACTIVE, NORMAL, BACKGROUND)
+# Fraction of each time window that a priority class can't use, so it's
+# always available to the classes above it. NORMAL (the default) isn't limited,
+# so callers that don't use priorities get the whole window
+DEFAULT_RESERVE = {INTERACTIVE: 0.0, NORMAL: 0.0, BACKGROUND: 0.3}
+
+_local = threading.local()
+
+
+def current_priority():
+    """Returns the priority of the requests made by the current thread"""
+    return getattr(_local, "priority", NORMAL)
+
+@contextlib.contextmanager
+def priority(level):
+    """Context manager that sets the priority of the requests made by the current thread
+    (and by the threads started from it with AO3.threadable)
+
+    Args:
+        level (int): INTERACTIVE, NORMAL or BACKGROUND
+    """
+
+    if level not in PRIORITIES:
+        raise ValueError(f"Invalid priority {level}")
+    previous = current_priority()
+    _local.priority = level
+    try:
+        yield
+    finally:
+        _local.priority = previous
 
 
 class Requester:
     """Requester object"""
     
-    def __init__(self, rqtw=-1, timew=60):
+    def __init__(self, rqtw=-1, timew=60, transport=None, reserve=None, ledger=None):
         """Limits the request rate to prevent HTTP 429 (rate limiting) responses.
         12 request per minute seems to be the limit.
 
+        Requests have a priority (INTERACTIVE, NORMAL or BACKGROUND). Waiting requests
+        are sent highest priority first, and lower priorities can't use the part of each
+        time window that's reserved for the ones above them.
+
         Args:
             rqm (int, optional): Maximum requests per time window (-1 -> no limit). Defaults to -1.
             timew (int, optional): Time window (seconds). Defaults to 60.
+            transport (optional): Object that actually sends the requests (see AO3.transport). Defaults to HTTPTransport().
+            reserve (dict, optional): {priority: fraction of the window it can't use}. Defaults to DEFAULT_RESERVE.
+            ledger (AO3.ledger.SQLiteLedger, optional): Shares the limit with other processes. Defaults to None.
         """
         
         self._requests = []
         self._rqtw = rqtw
         self._timew = timew
+        self._reserve = dict(DEFAULT_RESERVE if reserve is None else reserve)
         self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._waiting = []
+        self._tickets = itertools.count()
+        self.transport = HTTPTransport() if transport is None else transport
+        self.ledger = ledger
         self.total = 0
         
     def setRQTW(self, value):
-        self._rqtw = value
+        with self._cond:
+            self._rqtw = value
+            self._cond.notify_all()
         
     def setTimeW(self, value):
-        self._timew = value
+        with self._cond:
+            self._timew = value
+            self._cond.notify_all()
+
+    def setReserve(self, priority, fraction):
+        """Sets the fraction of each time window a priority class can't use"""
+
+        with self._cond:
+            self._reserve[priority] = fraction
+            self._cond.notify_all()
+        
+    def setTransport(self, transport):
+        self.transport = HTTPTransport() if transport is None else transport
+
+    def setLedger(self, ledger):
+        with self._cond:
+            self.ledger = ledger
+            self._cond.notify_all()
+
+    def __getstate__(self):
+        d = self.__dict__.copy()
+        for attr in ("_lock", "_cond", "_waiting", "_tickets"):
+            d.pop(attr, None)
+        return d
+
+    def __setstate__(self, d):
+        self.__dict__.update(d)
+        self.__dict__.setdefault("_reserve", dict(DEFAULT_RESERVE))
+        self.__dict__.setdefault("ledger", None)
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._waiting = []
+        self._tickets = itertools.count()
+
+    def limit(self, priority=NORMAL):
+        """Returns how many requests of this priority can be made per time window"""
+
+        if self._rqtw == -1:
+            return float("inf")
+        return max(int(self._rqtw * (1 - self._reserve.get(priority, 0))), 1)
+
+    def _acquire(self, priority):
+        """Waits until a request of this priority can be made, and records it.
+        Must be called with the lock held. Returns the slot to pass to _release()"""
+
+        ticket = (priority, next(self._tickets))
+        self._waiting.append(ticket)
+        slot = None
+        try:
+            while self._rqtw != -1:
+                if min(self._waiting) == ticket:
+                    wait, slot = self._try_acquire(self.limit(priority))
+                    if wait == 0:
+                        break
+                    self._cond.wait(wait)
+                else:
+                    # Someone with a higher priority (or who came first) goes before us
+                    self._cond.wait()
+            self.total += 1
+        finally:
+            self._waiting.remove(ticket)
+            self._cond.notify_all()
+        return slot
+
+    def _try_acquire(self, limit):
+        """Records a request if there's room for it in the time window. Returns (0, slot)
+        if it was recorded, or (seconds until there's room, None)"""
+
+        if self.ledger is not None:
+            return self.ledger.acquire(limit, self._timew)
+        t = time.time()
+        # Forget about requests older than the window
+        while len(self._requests) and t-self._requests[0] >= self._timew:
+            self._requests.pop(0)
+        if len(self._requests) < limit:
+            self._requests.append(t)
+            return 0, t
+        # Wait until enough requests exit the window to give us a slot
+        return self._requests[len(self._requests)-limit] + self._timew - t, None
+
+    def _release(self, slot):
+        """Moves a request's time to when it finished. The server may have received it
+        at any point until then, so its window is counted from the end of the request"""
+
+        if slot is None:
+            return
+        if self.ledger is not None:
+            self.ledger.release(slot)
+            return
+        with self._cond:
+            try:
+                self._requests.remove(slot)
+            except ValueError:
+                pass
+            bisect.insort(self._requests, time.time())
+
+    def _recent(self):
+        """Times of the requests made in the current time window"""
+
+        if self.ledger is not None:
+            return self.ledger.recent(self._timew)
+        with self._lock:
+            t = time.time()
+            return [r for r in self._requests if t-r < self._timew]
+
+    def available(self):
+        """Returns how many requests can be made right now without waiting (inf if there's no limit)"""
+
+        if self._rqtw == -1:
+            return float("inf")
+        return max(self._rqtw - len(self._recent()), 0)
+
+    def next_slot(self):
+        """Returns how many seconds until a request can be made without waiting"""
+
+        if self._rqtw == -1:
+            return 0.0
+        recent = self._recent()
+        if len(recent) < self._rqtw:
+            return 0.0
+        return recent[len(recent)-self._rqtw] + self._timew - time.time()
 
-    def request(self, *args, **kwargs):
-        """Requests a web page once enough time has passed since the last request
+    def request(self, method, url, *args, **kwargs):
+        """Requests a web page once enough time has passed since the last request.
+        A RequestEvent is recorded in AO3.instrumentation for every request.
         
         Args:
+            method (str): HTTP method
+            url (str): URL
             session(requests.Session, optional): Session object to request with
+            priority (int, optional): INTERACTIVE, NORMAL or BACKGROUND. Defaults to the current thread's priority.
 
         Returns:
             requests.Response: Response object
         """
         
-        # We've made a bunch of requests, time to rate limit?
-        if self._rqtw != -1:
-            with self._lock:
-                if len(self._requests) >= self._rqtw:
-                    t = time.time()
-                    # Reduce list to only requests made within the current time window
-                    while len(self._requests):
-                        if t-self._requests[0] >= self._timew:
-                            self._requests.pop(0) # Older than window, forget about it
-                        else:
-                            break # Inside window, the rest of them must be too
-                    # Have we used up all available requests within our window?
-                    if len(self._requests) >= self._rqtw: # Yes
-                        # Wait until the oldest request exits the window, giving us a slot for the new one
-                        time.sleep(self._requests[0] + self._timew - t)
-                        # Now outside window, drop it
-                        self._requests.pop(0)
-                        
-                if self._rqtw != -1:
-                    self._requests.append(time.time())
-                self.total += 1
+        priority = kwargs.pop("priority", None)
+        if priority is None:
+            priority = current_priority()
+        event = RequestEvent(method, url)
+        event.priority = priority
+        wait_start = time.perf_counter()
+        with self._cond:
+            slot = self._acquire(priority)
+        event.limiter_wait = time.perf_counter() - wait_start
                            
-        if "session" in kwargs:
-            sess = kwargs["session"]
-            del kwargs["session"]
-            req = sess.request(*args, **kwargs)
-        else:
-            req = requests.request(*args, **kwargs)
-            
+        sess = kwargs.pop("session", None)
+        start = time.perf_counter()
+        try:
+            req = self.transport.request(method, url, *args, session=sess, **kwargs)
+        except Exception as e:
+            self._release(slot)
+            event.error = e
+            event.total = time.perf_counter() - start
+            instrumentation.record_request(event)
+            raise
+        self._release(slot)
+        event.total = time.perf_counter() - start
+        event.status = req.status_code
+        event.bytes = len(req.content)
+        elapsed = getattr(req, "elapsed", None)
+        if elapsed is not None:
+            # requests measures the time until the response headers arrived
+            event.ttfb = elapsed.total_seconds()
+        # Transports that know more about the connection can report it here
+        for name, value in getattr(req, "ao3_timings", {}).items():
+            setattr(event, name, value)
+        instrumentation.record_request(event)
         return req
 
 requester = Requester()
\ No newline at end of file
@@ -1,9 +1,7 @@
 from math import ceil
 
-from bs4 import BeautifulSoup
-
-from . import threadable, utils
-from .common import get_work_from_banner
+from . import instrumentation, threadable, utils
+from .common import get_blurbs, get_work_from_banner
 from .requester import requester
 from .series import Series
 from .users import User
@@ -49,7 +47,8 @@ class Search:
         characters="",
         relationships="",
         tags="",
-        session=None):
+        session=None,
+        blurbs=False):
 
         self.any_field = any_field
         self.title = title
@@ -73,6 +72,8 @@ class Search:
         self.revised_at = revised_at
         
         self.session = session
+        # Results are compact WorkBlurb records instead of Work objects
+        self.blurbs = blurbs
 
         self.results = None
         self.pages = 0
@@ -98,16 +99,19 @@ class Search:
             self.pages = 0
             return
 
-        works = []
-        for work in results.find_all("li", {"role": "article"}):
-            if work.h4 is None:
-                continue
-            
-            new = get_work_from_banner(work)
-            new._session = self.session
-            works.append(new)
+        if self.blurbs:
+            self.results = get_blurbs(results)
+        else:
+            works = []
+            for work in results.find_all("li", {"role": "article"}):
+                if work.h4 is None:
+                    continue
+                
+                new = get_work_from_banner(work)
+                new._session = self.session
+                works.append(new)
+            self.results = works
 
-        self.results = works
         maindiv = soup.find("div", {"class": "works-search region", "id": "main"})
         self.total_results = int(maindiv.find("h3", {"class": "heading"}).getText().strip().split(" ")[0])
         self.pages = ceil(self.total_results / 20)
@@ -211,5 +215,5 @@ def search(
         req = session.get(url)
     if req.status_code == 429:
         raise utils.HTTPError("We are being rate-limited. Try again in a while or reduce the number of requests")
-    soup = BeautifulSoup(req.content, features="lxml")
+    soup = instrumentation.parse(req.content, "search.search")
     return soup
@@ -0,0 +1,227 @@
+"""Compact serialization of Work, Chapter, Series and User objects.
+
+Instead of pickling whole HTML trees, only the values extracted from them are
+stored (as JSON), so snapshots are much smaller and can be loaded without
+parsing any HTML. Pickling these objects also goes through this format (see
+reduce()). The format is:
+
+    4 bytes   magic (b"AO3S")
+    1 byte    format version
+    1 byte    compression (0: none, 1: zlib, 2: zstd)
+    ...       payload (JSON, compressed)
+"""
+
+import datetime
+import json
+import zlib
+
+from . import utils
+
+MAGIC = b"AO3S"
+VERSION = 1
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+COMPRESSION_ZSTD = 2
+_COMPRESSION_NAMES = {None: COMPRESSION_NONE, "none": COMPRESSION_NONE,
+                      "zlib": COMPRESSION_ZLIB, "zstd": COMPRESSION_ZSTD}
+
+# Attributes stored for each class. They're restored as cached values,
+# so reading them doesn't need the (discarded) HTML
+FIELDS = {
+    "Work": ("title", "authors", "series", "rating", "warnings", "categories", "fandoms",
+             "relationships", "characters", "tags", "language", "summary", "start_notes",
+             "end_notes", "collections", "date_published", "date_edited", "date_updated",
+             "words", "nchapters", "expected_chapters", "complete", "restricted", "hits",
+             "kudos", "comments", "bookmarks"),
+    "Chapter": ("number", "title", "summary", "start_notes", "end_notes", "text", "words"),
+    "Series": ("name", "creators", "series_begun", "series_updated", "words", "nworks",
+               "complete", "description", "notes", "nbookmarks", "work_list"),
+    "User": ("bio", "works", "bookmarks", "_works_pages", "_bookmarks_pages"),
+}
+# Page each User field is taken from. Fields are only stored if their page was loaded
+_USER_SECTIONS = {"bio": "profile", "works": "works", "_works_pages": "works",
+                  "bookmarks": "bookmarks", "_bookmarks_pages": "bookmarks"}
+
+
+def _is_loaded(obj):
+    try:
+        return obj.loaded
+    except AttributeError:
+        return False
+
+def _fields(obj, include_text):
+    """Returns the values of the fields of obj that are cached or can be extracted"""
+
+    values = {}
+    loaded = _is_loaded(obj)
+    for field in FIELDS[type(obj).__name__]:
+        if field == "text" and not include_text:
+            continue
+        if field in obj.__dict__:
+            values[field] = obj.__dict__[field]
+        elif loaded:
+            section = _USER_SECTIONS.get(field) if type(obj).__name__ == "User" else None
+            if section is not None and obj.__dict__.get(f"_soup_{section}") is None:
+                continue
+            try:
+                values[field] = getattr(obj, field)
+            except Exception:
+                # Some fields are missing from some pages (e.g. dates on unrevised works)
+                pass
+    return values
+
+def _encode(value, include_text):
+    from .chapters import Chapter
+    from .series import Series
+    from .users import User
+    from .works import Work
+
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_encode(item, include_text) for item in value]
+    if isinstance(value, datetime.datetime):
+        return {"$dt": value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {"$d": value.isoformat()}
+    if isinstance(value, (Work, Chapter, Series, User)):
+        name = type(value).__name__
+        d = {"$": name, "f": {key: _encode(v, include_text)
+                              for key, v in _fields(value, include_text).items()}}
+        if name == "User":
+            d["id"] = value.username
+        else:
+            d["id"] = value.id
+        if name == "Work" and value.chapters:
+            d["chapters"] = [_encode(chapter, include_text) for chapter in value.chapters]
+        return d
+    raise utils.SerializationError(f"Cannot serialize object of type {type(value).__name__}")
+
+def _decode(value, session, parent=None):
+    from .chapters import Chapter
+    from .series import Series
+    from .users import User
+    from .works import Work
+
+    if isinstance(value, list):
+        return [_decode(item, session, parent) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if "$dt" in value:
+        return datetime.datetime.fromisoformat(value["$dt"])
+    if "$d" in value:
+        return datetime.date.fromisoformat(value["$d"])
+
+    name = value["$"]
+    if name == "Work":
+        obj = Work(value["id"], session, load=False)
+    elif name == "Chapter":
+        obj = Chapter(value["id"], parent, session, load=False)
+    elif name == "Series":
+        obj = Series(value["id"], session, load=False)
+    elif name == "User":
+        obj = User(value["id"], session, load=False)
+    else:
+        raise utils.SerializationError(f"Unknown object type '{name}'")
+    for key, v in value["f"].items():
+        obj.__dict__[key] = _decode(v, session, obj)
+    if name == "Work":
+        obj.chapters = [_decode(chapter, session, obj) for chapter in value.get("chapters", [])]
+    return obj
+
+def dumps(obj, compression="zlib", level=None, include_text=True):
+    """Serializes a Work, Chapter, Series or User object (or a list of them)
+
+    Works are stored with their chapters. Objects that were never loaded, such as
+    works from search results, keep the attributes that were set on them.
+
+    Args:
+        obj (object/list): Object(s) to serialize
+        compression (str, optional): "zlib", "zstd" (requires the zstandard package) or None. Defaults to "zlib".
+        level (int, optional): Compression level. Defaults to the compressor's default.
+        include_text (bool, optional): Store chapter text. Defaults to True.
+
+    Raises:
+        utils.SerializationError: Invalid object or compression
+
+    Returns:
+        bytes: Serialized object(s)
+    """
+
+    if compression not in _COMPRESSION_NAMES:
+        raise utils.SerializationError(f"Unknown compression '{compression}'")
+    method = _COMPRESSION_NAMES[compression]
+    payload = json.dumps(_encode(obj, include_text), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if method == COMPRESSION_ZLIB:
+        payload = zlib.compress(payload, -1 if level is None else level)
+    elif method == COMPRESSION_ZSTD:
+        import zstandard
+        payload = zstandard.ZstdCompressor(level=3 if level is None else level).compress(payload)
+    return MAGIC + bytes((VERSION, method)) + payload
+
+def loads(data, session=None):
+    """Restores objects serialized with dumps(). No requests are made and no HTML is parsed.
+
+    Restored objects aren't considered loaded (their HTML isn't kept), but all the
+    stored attributes can be read. Actions that need the page, such as downloading
+    or leaving kudos, require calling reload() first.
+
+    Args:
+        data (bytes): Serialized object(s)
+        session (AO3.Session, optional): Session given to the restored objects. Defaults to None.
+
+    Raises:
+        utils.SerializationError: Invalid or unsupported data
+
+    Returns:
+        object/list: Restored object(s)
+    """
+
+    if len(data) < 6 or data[:4] != MAGIC:
+        raise utils.SerializationError("Not a serialized AO3 object")
+    version, method = data[4], data[5]
+    if version > VERSION:
+        raise utils.SerializationError(f"Unsupported format version {version}")
+    payload = data[6:]
+    if method == COMPRESSION_ZLIB:
+        payload = zlib.decompress(payload)
+    elif method == COMPRESSION_ZSTD:
+        import zstandard
+        payload = zstandard.ZstdDecompressor().decompress(payload)
+    elif method != COMPRESSION_NONE:
+        raise utils.SerializationError(f"Unknown compression method {method}")
+    return _decode(json.loads(payload), session)
+
+def _chapter_of(work, index):
+    return work.chapters[index]
+
+def reduce(obj):
+    """Implements __reduce__ for Work, Chapter, Series and User, so pickle stores them
+    in this format (uncompressed) instead of their HTML. Like loads(), unpickling doesn't
+    parse any HTML, and the restored objects need reload() before actions that need the page.
+    Objects keep their session
+
+    Args:
+        obj (AO3.Work/AO3.Chapter/AO3.Series/AO3.User): Object being pickled
+
+    Returns:
+        tuple: Callable and arguments that restore the object
+    """
+
+    from .chapters import Chapter
+
+    if isinstance(obj, Chapter) and obj.work is not None:
+        # Chapters are pickled with their work, so Chapter.work is restored too
+        for index, chapter in enumerate(obj.work.chapters):
+            if chapter is obj:
+                return _chapter_of, (obj.work, index)
+    return loads, (dumps(obj, compression=None), obj._session)
+
+def dump(obj, file, **kwargs):
+    """Serializes obj (see dumps()) and writes it to a binary file object"""
+    file.write(dumps(obj, **kwargs))
+
+def load(file, session=None):
+    """Reads and restores objects written by dump()"""
+    return loads(file.read(), session)
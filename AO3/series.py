@@ -1,10 +1,8 @@
 from datetime import date
 from functools import cached_property
 
-from bs4 import BeautifulSoup
-
-from . import threadable, utils
-from .common import get_work_from_banner
+from . import instrumentation, serialization, threadable, utils
+from .common import get_work_from_banner, paginate
 from .requester import requester
 from .users import User
 from .works import Work
@@ -38,23 +36,49 @@ class Series:
         except:
             return f"<Series [{self.id}]>"
         
-    def __getstate__(self):
-        d = {}
-        for attr in self.__dict__:
-            if isinstance(self.__dict__[attr], BeautifulSoup):
-                d[attr] = (self.__dict__[attr].encode(), True)
-            else:
-                d[attr] = (self.__dict__[attr], False)
-        return d
-                
+    def __reduce__(self):
+        # Pickled in the compact format of AO3.serialization, so loading doesn't parse any HTML
+        return serialization.reduce(self)
+
     def __setstate__(self, d):
+        # Pickles made by older versions store the page HTML
         for attr in d:
             value, issoup = d[attr]
             if issoup:
-                self.__dict__[attr] = BeautifulSoup(value, "lxml")
+                self.__dict__[attr] = instrumentation.parse(value, "series.__setstate__")
             else:
                 self.__dict__[attr] = value
                 
+    @staticmethod
+    def load_many(seriesids, session=None, workers=4, ordered=True):
+        """Loads many series, making at most `workers` requests at the same time.
+        Errors are returned with the results instead of stopping the batch.
+
+        Args:
+            seriesids (iterable): AO3 series IDs
+            session (AO3.Session, optional): Session used to load the series. If None, a guest session
+            is created for the batch, so connections are reused. Defaults to None.
+            workers (int, optional): Maximum number of series loaded at the same time. Defaults to 4.
+            ordered (bool, optional): Yield the results in the same order as the IDs instead of
+            as soon as each one is loaded. Defaults to True.
+
+        Yields:
+            tuple: (seriesid, Series, None) if the series was loaded, or (seriesid, None, exception) if it wasn't
+        """
+
+        from .session import GuestSession
+
+        if session is None:
+            session = GuestSession()
+
+        def load(seriesid):
+            try:
+                return seriesid, Series(seriesid, session), None
+            except Exception as e:
+                return seriesid, None, e
+
+        yield from threadable.bounded_map(load, seriesids, workers, ordered=ordered)
+
     def set_session(self, session):
         """Sets the session used to make requests for this series
 
@@ -335,37 +359,51 @@ class Series:
                 break
         return int(book.replace(",", ""))   
     
-    @cached_property
-    def work_list(self):
-        ul = self._soup.find("ul", {"class": "series work index group"})
+    def _page_works(self, soup):
+        ul = soup.find("ul", {"class": "series work index group"})
         works = []
+        if ul is None:
+            return works
         for work in ul.find_all("li", {"role": "article"}):
             if work.h4 is None:
                 continue
-            works.append(get_work_from_banner(work))
-        #     authors = []
-        #     if work.h4 is None:
-        #         continue
-        #     for a in work.h4.find_all("a"):
-        #         if "rel" in a.attrs.keys():
-        #             if "author" in a["rel"]:
-        #                 authors.append(User(a.string, load=False))
-        #         elif a.attrs["href"].startswith("/works"):
-        #             workname = a.string
-        #             workid = utils.workid_from_url(a["href"])
-        #     new = Work(workid, load=False)
-        #     setattr(new, "title", workname)
-        #     setattr(new, "authors", authors)
-        #     works.append(new)
+            new = get_work_from_banner(work)
+            new._session = self._session
+            works.append(new)
         return works
-    
+
+    def iter_works(self, workers=4):
+        """Yields every work in this series, in order, as the listing pages arrive.
+        The first page comes from the series page itself, and the remaining ones
+        are fetched with at most `workers` requests at the same time.
+
+        Args:
+            workers (int, optional): Maximum number of pages requested at the same time. Defaults to 4.
+
+        Raises:
+            utils.UnloadedError: Series isn't loaded
+
+        Yields:
+            AO3.Work: Work parsed from its banner (not loaded)
+        """
+
+        if not self.loaded:
+            raise utils.UnloadedError("Series isn't loaded. Have you tried calling Series.reload()?")
+
+        url = f"https://archiveofourown.org/series/{self.id}?page=%d"
+        yield from paginate(lambda page: self.request(url%page), self._page_works, self._soup, workers)
+
+    @cached_property
+    def work_list(self):
+        return list(self.iter_works())
+
     def get(self, *args, **kwargs):
         """Request a web page and return a Response object"""  
         
         if self._session is None:
             req = requester.request("get", *args, **kwargs)
         else:
-            req = requester.request("get", *args, **kwargs, session=self._session.session)
+            req = self._session.get(*args, **kwargs)
         if req.status_code == 429:
             raise utils.HTTPError("We are being rate-limited. Try again in a while or reduce the number of requests")
         return req
@@ -381,5 +419,5 @@ class Series:
         """
 
         req = self.get(url)
-        soup = BeautifulSoup(req.content, "lxml")
+        soup = instrumentation.parse(req.content, "series.request")
         return soup
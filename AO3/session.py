@@ -1,12 +1,15 @@
 import datetime
+import json
+import os
 import re
+import threading
 import time
 from functools import cached_property
 
-import requests
 from bs4 import BeautifulSoup
 
-from . import threadable, utils
+from . import instrumentation, threadable, utils
+from .common import page_count, paginate
 from .requester import requester
 from .series import Series
 from .users import User
@@ -19,10 +22,14 @@ class GuestSession:
     """
 
     def __init__(self):
+        import requests
+        
         self.is_authed = False
         self.authenticity_token = None
         self.username = ""
         self.session = requests.Session()
+        # Rate limiter used for this session's requests. Shared by default, see AO3.pool
+        self.requester = requester
         
     @property
     def user(self):
@@ -81,19 +88,27 @@ class GuestSession:
             utils.UnexpectedResponseError: Couldn't refresh the token
         """
         
+        # AO3 hands out tokens for the current session as a tiny JSON document.
+        # If that doesn't work, fall back to scraping a page
+        try:
+            req = self.get("https://archiveofourown.org/token_dispenser.json")
+            token = req.json()["token"] if req.status_code == 200 else None
+        except (ValueError, KeyError, TypeError):
+            token = None
+        if token:
+            self.authenticity_token = token
+            return
+
         # For some reason, the auth token in the root path only works if you're 
         # unauthenticated. To get around that, we check if this is an authed
         # session and, if so, get the token from the profile page.
         
         if self.is_authed:
-            req = self.session.get(f"https://archiveofourown.org/users/{self.username}")
+            req = self.get(f"https://archiveofourown.org/users/{self.username}")
         else:
-            req = self.session.get("https://archiveofourown.org")
-            
-        if req.status_code == 429:
-            raise utils.HTTPError("We are being rate-limited. Try again in a while or reduce the number of requests")
+            req = self.get("https://archiveofourown.org")
             
-        soup = BeautifulSoup(req.content, "lxml")
+        soup = instrumentation.parse(req.content, "session.refresh_auth_token")
         token = soup.find("input", {"name": "authenticity_token"})
         if token is None:
             raise utils.UnexpectedResponseError("Couldn't refresh token")
@@ -103,9 +118,9 @@ class GuestSession:
         """Request a web page and return a Response object"""  
         
         if self.session is None:
-            req = requester.request("get", *args, **kwargs)
+            req = self.requester.request("get", *args, **kwargs)
         else:
-            req = requester.request("get", *args, **kwargs, session=self.session)
+            req = self.requester.request("get", *args, **kwargs, session=self.session)
         if req.status_code == 429:
             raise utils.HTTPError("We are being rate-limited. Try again in a while or reduce the number of requests")
         return req
@@ -121,21 +136,33 @@ class GuestSession:
         """
 
         req = self.get(url)
-        soup = BeautifulSoup(req.content, "lxml")
+        soup = instrumentation.parse(req.content, "session.request")
         return soup
 
     def post(self, *args, **kwargs):
-        """Make a post request with the current session
+        """Make a post request with the current session, through the session's rate limiter
 
         Returns:
             requests.Request
         """
 
-        req = self.session.post(*args, **kwargs)
+        req = self.requester.request("post", *args, **kwargs, session=self.session)
         if req.status_code == 429:
             raise utils.HTTPError("We are being rate-limited. Try again in a while or reduce the number of requests")
         return req
     
+    def __getstate__(self):
+        d = self.__dict__.copy()
+        if d.get("requester") is requester:
+            # The shared requester is restored as itself, not as a copy
+            d["requester"] = None
+        return d
+
+    def __setstate__(self, d):
+        self.__dict__.update(d)
+        if self.__dict__.get("requester") is None:
+            self.requester = requester
+
     def __del__(self):
         self.session.close()
 
@@ -144,12 +171,15 @@ class Session(GuestSession):
     AO3 session object
     """
 
-    def __init__(self, username, password):
+    def __init__(self, username, password, state_file=None):
         """Creates a new AO3 session object
 
         Args:
             username (str): AO3 username
             password (str): AO3 password
+            state_file (str, optional): File where the session's cookies and token are saved. If it
+            holds a session for this user that hasn't expired, it's reused instead of logging in
+            again. Defaults to None.
 
         Raises:
             utils.LoginError: Login was unsucessful (wrong username or password)
@@ -159,17 +189,11 @@ class Session(GuestSession):
         self.is_authed = True
         self.username = username
         self.url = "https://archiveofourown.org/users/%s"%self.username
-        
-        self.session = requests.Session()
-        
-        soup = self.request("https://archiveofourown.org/users/login")
-        self.authenticity_token = soup.find("input", {"name": 'authenticity_token'})["value"]
-        payload = {'user[login]': username,
-                   'user[password]': password,
-                   'authenticity_token': self.authenticity_token}
-        post = self.post("https://archiveofourown.org/users/login", params=payload, allow_redirects=False)
-        if not post.status_code == 302:
-            raise utils.LoginError("Invalid username or password")
+        self.state_file = state_file
+        self._password = password
+        self._login_lock = threading.Lock()
+        # Number of successful logins, so threads can tell if another one already logged in again
+        self._logins = 0
 
         self._subscriptions_url = "https://archiveofourown.org/users/{0}/subscriptions?page={1:d}"
         self._bookmarks_url = "https://archiveofourown.org/users/{0}/bookmarks?page={1:d}"
@@ -178,12 +202,177 @@ class Session(GuestSession):
         self._bookmarks = None
         self._subscriptions = None
         self._history = None
+        self._history_ids = set()
+        # Pseud name -> ID, read from the first page that has a comment or bookmark form
+        self._pseuds = None
+
+        # A saved session is only checked when it's used: if AO3 sends us to the
+        # login page, get() logs in again
+        if state_file is None or not self.load_state(state_file):
+            self.login()
+
+    def login(self):
+        """Logs in with the session's username and password, and saves the new
+        session to the state file, if there is one
+
+        Raises:
+            utils.LoginError: Login was unsucessful (wrong username or password)
+        """
+
+        if self._password is None:
+            raise utils.LoginError("Can't log in again without a password")
+        self.session.cookies.clear()
+        soup = self.request("https://archiveofourown.org/users/login")
+        self.authenticity_token = soup.find("input", {"name": 'authenticity_token'})["value"]
+        payload = {'user[login]': self.username,
+                   'user[password]': self._password,
+                   'authenticity_token': self.authenticity_token}
+        post = self.post("https://archiveofourown.org/users/login", params=payload, allow_redirects=False)
+        if not post.status_code == 302:
+            raise utils.LoginError("Invalid username or password")
+        self._logins += 1
+        if self.state_file is not None:
+            self.save_state(self.state_file)
+
+    def save_state(self, path):
+        """Saves this session's cookies and authenticity token to a file only readable by you
+
+        Args:
+            path (str): File path
+        """
+
+        state = {
+            "username": self.username,
+            "authenticity_token": self.authenticity_token,
+            "saved_at": time.time(),
+            "cookies": [{
+                "name": cookie.name,
+                "value": cookie.value,
+                "domain": cookie.domain,
+                "path": cookie.path,
+                "expires": cookie.expires,
+                "secure": cookie.secure,
+            } for cookie in self.session.cookies],
+        }
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as file:
+            json.dump(state, file)
+
+    def load_state(self, path):
+        """Restores cookies and the authenticity token saved with save_state().
+        Nothing is restored if the file doesn't exist, belongs to another user or
+        all its cookies have expired
+
+        Args:
+            path (str): File path
+
+        Returns:
+            bool: True if the state was restored
+        """
+
+        if not os.path.exists(path):
+            return False
+        with open(path, "r") as file:
+            state = json.load(file)
+        if state.get("username") != self.username:
+            return False
+        now = time.time()
+        cookies = [c for c in state["cookies"] if c["expires"] is None or c["expires"] > now]
+        if len(cookies) == 0:
+            return False
+        for c in cookies:
+            self.session.cookies.set(c["name"], c["value"], domain=c["domain"], path=c["path"],
+                                     expires=c["expires"], secure=c["secure"])
+        self.authenticity_token = state["authenticity_token"]
+        return True
+
+    @threadable.threadable
+    def refresh_auth_token(self):
+        """Refreshes the authenticity token, and saves it to the state file if there is one.
+        This function is threadable.
+
+        Raises:
+            utils.UnexpectedResponseError: Couldn't refresh the token
+        """
+
+        super().refresh_auth_token()
+        if self.state_file is not None:
+            self.save_state(self.state_file)
+
+    def get_pseud_id(self, ao3object, pseud=None):
+        """Returns the ID of one of this user's pseuds. The pseuds are read once, from
+        the page of ao3object if it's loaded (otherwise it's requested), and then reused
+        for every comment and bookmark
+
+        Args:
+            ao3object (Work/Chapter/Series): Object whose page has a comment or bookmark form
+            pseud (str, optional): Pseud name. Defaults to the default pseud.
+
+        Returns:
+            str: Pseud ID, or None if it couldn't be found
+        """
+
+        if self._pseuds is None:
+            found = None
+            soup = getattr(ao3object, "_soup", None)
+            if soup is not None:
+                found = utils.parse_pseuds(soup)
+            if found is None:
+                found = utils.parse_pseuds(self.request(ao3object.url))
+            if found is None:
+                return None
+            self._pseuds = found
+        default, ids = self._pseuds
+        if pseud and len(ids) > 0:
+            return ids.get(pseud)
+        return default
+
+    @property
+    def pseuds(self):
+        """Names of this user's pseuds, or None if they weren't read yet (see get_pseud_id()).
+        Users with a single pseud get an empty list"""
+
+        if self._pseuds is None:
+            return None
+        return list(self._pseuds[1])
+
+    @staticmethod
+    def _auth_failed(response):
+        """True if AO3 sent us to the login page or the authentication error page"""
+
+        for r in list(getattr(response, "history", [])) + [response]:
+            location = r.headers.get("Location", "") if r.status_code in (301, 302, 303) else ""
+            for url in (r.url or "", location):
+                if url.startswith(("https://archiveofourown.org/users/login", "/users/login", utils.AO3_AUTH_ERROR_URL)):
+                    return True
+        return False
+
+    def get(self, *args, **kwargs):
+        """Request a web page and return a Response object.
+        If the session has expired, logs in again and repeats the request"""
+
+        url = args[0] if len(args) > 0 else kwargs.get("url", "")
+        logins = self._logins
+        req = super().get(*args, **kwargs)
+        if url.startswith("https://archiveofourown.org/users/login") or not self._auth_failed(req):
+            return req
+        with self._login_lock:
+            # Threads whose requests failed at the same time only log in once
+            if self._logins == logins:
+                self.login()
+        return super().get(*args, **kwargs)
         
     def __getstate__(self):
         d = {}
         for attr in self.__dict__:
+            if attr in ("_password", "_login_lock"):
+                # Passwords aren't pickled, and locks can't be
+                continue
             if isinstance(self.__dict__[attr], BeautifulSoup):
                 d[attr] = (self.__dict__[attr].encode(), True)
+            elif attr == "requester" and self.__dict__[attr] is requester:
+                # The shared requester is restored as itself, not as a copy
+                d[attr] = (None, False)
             else:
                 d[attr] = (self.__dict__[attr], False)
         return d
@@ -192,9 +381,16 @@ class Session(GuestSession):
         for attr in d:
             value, issoup = d[attr]
             if issoup:
-                self.__dict__[attr] = BeautifulSoup(value, "lxml")
+                self.__dict__[attr] = instrumentation.parse(value, "session.__setstate__")
             else:
                 self.__dict__[attr] = value
+        if self.__dict__.get("requester") is None:
+            self.requester = requester
+        self.__dict__.setdefault("state_file", None)
+        self.__dict__.setdefault("_pseuds", None)
+        self.__dict__.setdefault("_logins", 0)
+        self._password = None
+        self._login_lock = threading.Lock()
         
     def clear_cache(self):
         for attr in self.__class__.__dict__:
@@ -203,20 +399,17 @@ class Session(GuestSession):
                     delattr(self, attr)
         self._bookmarks = None
         self._subscriptions = None
+        self._pseuds = None
         
     @cached_property
-    def _subscription_pages(self):
-        url = self._subscriptions_url.format(self.username, 1)
-        soup = self.request(url)
-        pages = soup.find("ol", {"title": "pagination"})
-        if pages is None:
-            return 1
-        n = 1
-        for li in pages.findAll("li"):
-            text = li.getText()
-            if text.isdigit():
-                n = int(text)
-        return n
+    def _subscriptions_first(self):
+        # The first page gives the number of pages as well as the first items
+        return self.request(self._subscriptions_url.format(self.username, 1))
+
+    def _paginate(self, url_template, parse, first=None, workers=4):
+        """Yields the items of every page of one of your listings"""
+
+        return paginate(lambda page: self.request(url_template.format(self.username, page)), parse, first, workers)
     
     def get_work_subscriptions(self, use_threading=False):
         """
@@ -263,9 +456,8 @@ class Session(GuestSession):
             if use_threading:
                 self.load_subscriptions_threaded()
             else:
-                self._subscriptions = []
-                for page in range(self._subscription_pages):
-                    self._load_subscriptions(page=page+1)
+                self._subscriptions = list(self._paginate(
+                    self._subscriptions_url, self._parse_subscriptions, self._subscriptions_first, workers=1))
         return self._subscriptions
     
     @threadable.threadable
@@ -275,18 +467,17 @@ class Session(GuestSession):
         This function is threadable.
         """ 
         
-        threads = []
-        self._subscriptions = []
-        for page in range(self._subscription_pages):
-            threads.append(self._load_subscriptions(page=page+1, threaded=True))
-        for thread in threads:
-            thread.join()
+        self._subscriptions = list(self._paginate(
+            self._subscriptions_url, self._parse_subscriptions, self._subscriptions_first))
 
-    @threadable.threadable
-    def _load_subscriptions(self, page=1):        
-        url = self._subscriptions_url.format(self.username, page)
-        soup = self.request(url)
+    @staticmethod
+    def _parse_subscriptions(soup):
+        """Returns the Work, Series and User objects of a subscriptions page"""
+
+        items = []
         subscriptions = soup.find("dl", {"class": "subscription index group"})
+        if subscriptions is None:
+            return items
         for sub in subscriptions.find_all("dt"):
             type_ = "work"
             user = None
@@ -312,28 +503,15 @@ class Session(GuestSession):
                 new = Work(workid, load=False)
                 setattr(new, "title", workname)
                 setattr(new, "authors", authors)
-                self._subscriptions.append(new)
+                items.append(new)
             elif type_ == "user":
-                self._subscriptions.append(user)
+                items.append(user)
             elif type_ == "series":
                 new = Series(series, load=False)
                 setattr(new, "name", workname)
                 setattr(new, "authors", authors)
-                self._subscriptions.append(new)
-
-    @cached_property
-    def _history_pages(self):
-        url = self._history_url.format(self.username, 1)
-        soup = self.request(url)
-        pages = soup.find("ol", {"title": "pagination"})
-        if pages is None:
-            return 1
-        n = 1
-        for li in pages.findAll("li"):
-            text = li.getText()
-            if text.isdigit():
-                n = int(text)
-        return n
+                items.append(new)
+        return items
 
     def get_history(self, hist_sleep=3, start_page=0, max_pages=None, timeout_sleep=60):
         """
@@ -353,23 +531,29 @@ class Session(GuestSession):
         
         if self._history is None:
             self._history = []
-            for page in range(start_page, self._history_pages):
+            self._history_ids = set()
+            # The number of pages is read from the first page that's loaded
+            pages = None
+            page = start_page
+            while pages is None or page < pages:
                 # If we are attempting to recover from errors then
                 # catch and loop, otherwise just call and go
                 if timeout_sleep is None:
-                    self._load_history(page=page+1)
+                    soup = self._load_history(page=page+1)
                     
                 else:
                     loaded=False
                     while loaded == False:
                         try:
-                            self._load_history(page=page+1)
+                            soup = self._load_history(page=page+1)
                             # print(f"Read history page {page+1}")
                             loaded = True
 
                         except utils.HTTPError:
                             # print(f"History being rate limited, sleeping for {timeout_sleep} seconds")
                             time.sleep(timeout_sleep)
+                if pages is None:
+                    pages = page_count(soup)
 
                 # Check for maximum history page load
                 if max_pages is not None and page >= max_pages:
@@ -379,13 +563,27 @@ class Session(GuestSession):
                 # seconds between page requests.
                 if hist_sleep is not None and hist_sleep > 0:
                     time.sleep(hist_sleep)
+                page += 1
 
         return self._history
 
     def _load_history(self, page=1):       
         url = self._history_url.format(self.username, page)
         soup = self.request(url)
+        for hist_item in self._parse_history(soup):
+            if hist_item[0].id not in self._history_ids:
+                self._history_ids.add(hist_item[0].id)
+                self._history.append(hist_item)
+        return soup
+
+    @staticmethod
+    def _parse_history(soup):
+        """Returns the [Work, number-of-visits, datetime-last-visited] items of a history page"""
+
+        items = []
         history = soup.find("ol", {"class": "reading work index group"})
+        if history is None:
+            return items
         for item in history.find_all("li", {"role": "article"}):
             # authors = []
             workname = None
@@ -414,24 +612,92 @@ class Session(GuestSession):
                 new = Work(workid, load=False)
                 setattr(new, "title", workname)
                 # setattr(new, "authors", authors)
-                hist_item = [ new, visited_num, visited_date ]
-                # print(hist_item)
-                if new not in self._history:
-                    self._history.append(hist_item)
+                items.append([ new, visited_num, visited_date ])
+        return items
+
+    def sync_history(self, checkpoint=None, max_pages=None, timeout_sleep=60):
+        """
+        Loads the history entries added since the last sync. Pages are read from the newest
+        entry until one recorded in the checkpoint is reached, so only the first page or so
+        is requested if little has changed. There are no sleeps between pages, the
+        requester's rate limiter paces the requests.
+
+        The checkpoint is a JSON file with the ID and last visited date of the newest entry
+        seen. It's created if it doesn't exist (which loads the whole history), and
+        updated after a sync that reached the checkpointed entry or read every page. If the
+        sync stops early (max_pages, or a page without entries), the checkpoint is kept, so the
+        next sync returns these entries again instead of skipping the ones it didn't read.
+        New entries are also added to the top of get_history().
+
+        Args:
+            checkpoint (str, optional): Path to the checkpoint file. If None, the whole history is loaded. Defaults to None.
+            max_pages (int, optional): Maximum number of pages to read. Defaults to None.
+            timeout_sleep (int, optional): Seconds to wait before retrying a page after being rate-limited. If None, the error is raised. Defaults to 60.
+
+        Returns:
+            list: New entries, newest first. List of lists (Work, number-of-visits, datetime-last-visited)
+        """
+
+        last_id = last_visited = None
+        if checkpoint is not None and os.path.exists(checkpoint):
+            with open(checkpoint, "r") as file:
+                state = json.load(file)
+            last_id = state["work_id"]
+            if state["last_visited"] is not None:
+                last_visited = datetime.datetime.fromisoformat(state["last_visited"])
+
+        new = []
+        seen = set()
+        pages = 1
+        page = 1
+        done = False
+        while not done and page <= pages and (max_pages is None or page <= max_pages):
+            url = self._history_url.format(self.username, page)
+            try:
+                soup = self.request(url)
+            except utils.HTTPError:
+                if timeout_sleep is None:
+                    raise
+                time.sleep(timeout_sleep)
+                continue
+            if page == 1:
+                pages = page_count(soup)
+            items = self._parse_history(soup)
+            if len(items) == 0:
+                break
+            for hist_item in items:
+                work, _, visited = hist_item
+                if last_id is not None and work.id == last_id and visited == last_visited:
+                    done = True
+                    break
+                # The history is sorted by last visit, so everything from here on is older
+                if last_visited is not None and visited is not None and visited < last_visited:
+                    done = True
+                    break
+                if work.id not in seen:
+                    seen.add(work.id)
+                    new.append(hist_item)
+            page += 1
+        # Moving the checkpoint past entries that weren't read would lose them for good
+        complete = done or page > pages
+
+        if len(new) > 0:
+            if self._history is not None:
+                self._history = new + [item for item in self._history if item[0].id not in seen]
+                self._history_ids.update(seen)
+            if checkpoint is not None and complete:
+                work, _, visited = new[0]
+                with open(checkpoint, "w") as file:
+                    json.dump({
+                        "work_id": work.id,
+                        "last_visited": visited.isoformat() if visited is not None else None
+                    }, file)
+        return new
                 
     @cached_property
-    def _bookmark_pages(self):
-        url = self._bookmarks_url.format(self.username, 1)
-        soup = self.request(url)
-        pages = soup.find("ol", {"title": "pagination"})
-        if pages is None:
-            return 1
-        n = 1
-        for li in pages.findAll("li"):
-            text = li.getText()
-            if text.isdigit():
-                n = int(text)
-        return n
+    def _bookmarks_first(self):
+        # Shared by the number of bookmarks and the first items
+        return self.request(self._bookmarks_url.format(self.username, 1))
     
     def get_bookmarks(self, use_threading=False):
         """
@@ -445,9 +711,7 @@ class Session(GuestSession):
             if use_threading:
                 self.load_bookmarks_threaded()
             else:
-                self._bookmarks = []
-                for page in range(self._bookmark_pages):
-                    self._load_bookmarks(page=page+1)
+                self._load_bookmarks(workers=1)
         return self._bookmarks
     
     @threadable.threadable
@@ -457,18 +721,24 @@ class Session(GuestSession):
         This function is threadable.
         """ 
         
-        threads = []
-        self._bookmarks = []
-        for page in range(self._bookmark_pages):
-            threads.append(self._load_bookmarks(page=page+1, threaded=True))
-        for thread in threads:
-            thread.join()
+        self._load_bookmarks()
     
-    @threadable.threadable
-    def _load_bookmarks(self, page=1):       
-        url = self._bookmarks_url.format(self.username, page)
-        soup = self.request(url)
+    def _load_bookmarks(self, workers=4):
+        bookmarks = []
+        for new in self._paginate(self._bookmarks_url, self._parse_bookmarks, self._bookmarks_first, workers):
+            if new is not None and new not in bookmarks:
+                bookmarks.append(new)
+        self._bookmarks = bookmarks
+
+    @staticmethod
+    def _parse_bookmarks(soup):
+        """Returns a Work object for every bookmark of a bookmarks page. Bookmarks of
+        anything else (series, external works, deleted works) are None"""
+
+        items = []
         bookmarks = soup.find("ol", {"class": "bookmark index group"})
+        if bookmarks is None:
+            return items
         for bookm in bookmarks.find_all("li", {"class": ["bookmark", "index", "group"]}):
             authors = []
             workid = -1
@@ -481,13 +751,182 @@ class Session(GuestSession):
                         workname = str(a.string)
                         workid = utils.workid_from_url(a["href"])
             
-                if workid != -1:
-                    new = Work(workid, load=False)
-                    setattr(new, "title", workname)
-                    setattr(new, "authors", authors)
-                    if new not in self._bookmarks:
-                        self._bookmarks.append(new)
-            
+            if workid != -1:
+                new = Work(workid, load=False)
+                setattr(new, "title", workname)
+                setattr(new, "authors", authors)
+                items.append(new)
+            else:
+                items.append(None)
+        return items
+
+    @staticmethod
+    def _sync_key(obj):
+        if isinstance(obj, Work):
+            return f"work:{obj.id}"
+        if isinstance(obj, Series):
+            return f"series:{obj.id}"
+        return f"user:{obj.username}"
+
+    @staticmethod
+    def _sync_entry(obj):
+        if isinstance(obj, Work):
+            title = obj.title
+        elif isinstance(obj, Series):
+            title = obj.name
+        else:
+            title = None
+        authors = [author.username for author in obj.__dict__.get("authors", [])]
+        return [Session._sync_key(obj), title, authors]
+
+    @staticmethod
+    def _sync_object(entry):
+        key, title, authors = entry
+        kind, id_ = key.split(":", 1)
+        if kind == "user":
+            return User(id_, load=False)
+        if kind == "work":
+            obj = Work(int(id_), load=False)
+            setattr(obj, "title", title)
+        else:
+            obj = Series(int(id_), load=False)
+            setattr(obj, "name", title)
+        setattr(obj, "authors", [User(author, load=False) for author in authors])
+        return obj
+
+    def _sync(self, url_template, parse, count, state_file, full):
+        """Reads a listing newest first until a known item is reached, and
+        returns (added, removed) compared to the state saved in state_file.
+
+        count(soup, pages, items) returns the total number of entries in the listing.
+        The new total must match the old one plus the added entries, otherwise something
+        was removed (or the listing isn't sorted by date) and every page is read."""
+
+        state = None
+        if state_file is not None and os.path.exists(state_file):
+            with open(state_file, "r") as file:
+                state = json.load(file)
+
+        def read(page):
+            return self.request(url_template.format(self.username, page))
+
+        first = read(1)
+        pages = page_count(first)
+        first_items = parse(first)
+        current = None
+        if state is not None and not full:
+            known = {entry[0] for entry in state["items"]}
+            added = []
+            added_raw = 0
+            page, items = 1, first_items
+            stop = False
+            while True:
+                for obj in items:
+                    if obj is not None and self._sync_key(obj) in known:
+                        stop = True
+                        break
+                    added_raw += 1
+                    if obj is not None:
+                        added.append(self._sync_entry(obj))
+                if stop or page >= pages:
+                    break
+                page += 1
+                items = parse(read(page))
+            total = count(first, pages, first_items, read)
+            if total == state["total"] + added_raw:
+                current = added + state["items"]
+
+        if current is None:
+            current = []
+            total = 0
+            for page in range(1, pages+1):
+                items = first_items if page == 1 else parse(read(page))
+                total += len(items)
+                current.extend(self._sync_entry(obj) for obj in items if obj is not None)
+
+        # Deduplicate, keeping the newest position of every item
+        seen = set()
+        current = [entry for entry in current if not (entry[0] in seen or seen.add(entry[0]))]
+        if state_file is not None:
+            with open(state_file, "w") as file:
+                json.dump({"total": total, "items": current}, file)
+
+        old = {} if state is None else {entry[0]: entry for entry in state["items"]}
+        added = [entry for entry in current if entry[0] not in old]
+        removed = [entry for key, entry in old.items() if key not in seen]
+        return current, added, removed
+
+    def _sync_events(self, current, added, removed):
+        objects = [self._sync_object(entry) for entry in current]
+        by_key = {self._sync_key(obj): obj for obj in objects}
+        events = [("added", by_key[entry[0]]) for entry in added]
+        events += [("removed", self._sync_object(entry)) for entry in removed]
+        return objects, events
+
+    def sync_bookmarks(self, state_file=None, full=False):
+        """
+        Updates your bookmarks from the ones saved in state_file, reading pages newest first
+        until an already known bookmark is reached. If the total number of bookmarks shows
+        that some were deleted, every page is read to find out which ones.
+        The state file is created if it doesn't exist, and get_bookmarks() returns the
+        updated list afterwards.
+
+        Args:
+            state_file (str, optional): JSON file with the bookmarks from the previous sync. Defaults to None.
+            full (bool, optional): Read every page, even if nothing seems to have been removed. Defaults to False.
+
+        Returns:
+            list: Events, newest first. List of tuples ('added'/'removed', Work)
+        """
+
+        def count(soup, pages, items, read):
+            div = soup.find("div", {"id": "inner"})
+            span = div.find("span", {"class": "current"}) if div is not None else None
+            if span is None:
+                return self._count_entries(pages, items, read, self._parse_bookmarks)
+            n = span.getText().replace("(", "").replace(")", "").split(" ")[1]
+            return int(self.str_format(n))
+
+        current, added, removed = self._sync(self._bookmarks_url, self._parse_bookmarks, count, state_file, full)
+        self._bookmarks, events = self._sync_events(current, added, removed)
+        return events
+
+    def sync_subscriptions(self, state_file=None, full=False):
+        """
+        Updates your subscriptions from the ones saved in state_file, reading pages newest
+        first until an already known subscription is reached. If the total number of
+        subscriptions shows that some were removed, every page is read to find out which ones.
+        The state file is created if it doesn't exist, and get_subscriptions() returns the
+        updated list afterwards.
+
+        Args:
+            state_file (str, optional): JSON file with the subscriptions from the previous sync. Defaults to None.
+            full (bool, optional): Read every page, even if nothing seems to have been removed. Defaults to False.
+
+        Subscriptions might not be listed newest first; a new subscription that isn't
+        at the top makes the totals disagree, so every page is read in that case. An
+        addition and a removal in the same sync can hide each other, so run a full sync
+        every now and then.
+
+        Returns:
+            list: Events. List of tuples ('added'/'removed', Work/Series/User)
+        """
+
+        def count(soup, pages, items, read):
+            return self._count_entries(pages, items, read, self._parse_subscriptions)
+
+        current, added, removed = self._sync(self._subscriptions_url, self._parse_subscriptions, count, state_file, full)
+        self._subscriptions, events = self._sync_events(current, added, removed)
+        return events
+
+    @staticmethod
+    def _count_entries(pages, items, read, parse):
+        """Counts the entries of a listing from its first page and (if there's more than one) its last page"""
+
+        if pages == 1:
+            return len(items)
+        return (pages-1) * len(items) + len(parse(read(pages)))
+
     @cached_property
     def bookmarks(self):
         """Get the number of your bookmarks.
@@ -497,9 +936,7 @@ class Session(GuestSession):
             int: Number of bookmarks
         """
 
-        url = self._bookmarks_url.format(self.username, 1)
-        soup = self.request(url)
-        div = soup.find("div", {"id": "inner"})
+        div = self._bookmarks_first.find("div", {"id": "inner"})
         span = div.find("span", {"class": "current"}).getText().replace("(", "").replace(")", "")
         n = span.split(" ")[1]
         
@@ -545,14 +982,16 @@ class Session(GuestSession):
         Returns:
             works (list): All marked for later works
         """
-        pageRaw = self.request(f"https://archiveofourown.org/users/{self.username}/readings?page=1&show=to-read").find("ol", {"class": "pagination actions"}).find_all("li")
-        maxPage = int(pageRaw[len(pageRaw)-2].text)
+        maxPage = None
         works = []
-        for page in range(maxPage):
+        page = 0
+        while maxPage is None or page < maxPage:
             grabbed = False
             while grabbed == False:
                 try:
                     workPage = self.request(f"https://archiveofourown.org/users/{self.username}/readings?page={page+1}&show=to-read")
+                    if maxPage is None:
+                        maxPage = page_count(workPage)
                     worksRaw = workPage.find_all("li", {"role": "article"})
                     for work in worksRaw:
                         try:
@@ -564,4 +1003,5 @@ class Session(GuestSession):
                 except utils.HTTPError:
                     time.sleep(timeout_sleep)
             time.sleep(sleep)
+            page += 1
         return works
\ No newline at end of file
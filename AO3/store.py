@@ -0,0 +1,468 @@
+import datetime
+import hashlib
+import sqlite3
+import threading
+import time
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS works (
+    id INTEGER PRIMARY KEY,
+    title TEXT,
+    rating TEXT,
+    language TEXT,
+    summary TEXT,
+    words INTEGER,
+    nchapters INTEGER,
+    expected_chapters INTEGER,
+    complete INTEGER,
+    restricted INTEGER,
+    date_published TEXT,
+    date_updated TEXT,
+    date_edited TEXT,
+    hits INTEGER,
+    kudos INTEGER,
+    bookmarks INTEGER,
+    comments INTEGER,
+    relations_hash TEXT,
+    first_seen REAL NOT NULL,
+    last_changed REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS authors (
+    id INTEGER PRIMARY KEY,
+    username TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS work_authors (
+    work_id INTEGER NOT NULL REFERENCES works(id),
+    author_id INTEGER NOT NULL REFERENCES authors(id),
+    position INTEGER NOT NULL,
+    PRIMARY KEY (work_id, author_id)
+);
+CREATE INDEX IF NOT EXISTS work_authors_author ON work_authors(author_id, work_id);
+CREATE TABLE IF NOT EXISTS series (
+    id INTEGER PRIMARY KEY,
+    name TEXT,
+    description TEXT,
+    words INTEGER,
+    nworks INTEGER,
+    complete INTEGER,
+    series_begun TEXT,
+    series_updated TEXT
+);
+CREATE TABLE IF NOT EXISTS work_series (
+    work_id INTEGER NOT NULL REFERENCES works(id),
+    series_id INTEGER NOT NULL REFERENCES series(id),
+    PRIMARY KEY (work_id, series_id)
+);
+CREATE INDEX IF NOT EXISTS work_series_series ON work_series(series_id, work_id);
+CREATE TABLE IF NOT EXISTS tags (
+    id INTEGER PRIMARY KEY,
+    type TEXT NOT NULL,
+    name TEXT NOT NULL,
+    UNIQUE (type, name)
+);
+CREATE INDEX IF NOT EXISTS tags_name ON tags(name);
+CREATE TABLE IF NOT EXISTS work_tags (
+    work_id INTEGER NOT NULL REFERENCES works(id),
+    tag_id INTEGER NOT NULL REFERENCES tags(id),
+    PRIMARY KEY (work_id, tag_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS work_tags_tag ON work_tags(tag_id, work_id);
+CREATE TABLE IF NOT EXISTS chapters (
+    work_id INTEGER NOT NULL REFERENCES works(id),
+    number INTEGER NOT NULL,
+    id INTEGER,
+    title TEXT,
+    words INTEGER,
+    text TEXT,
+    PRIMARY KEY (work_id, number)
+);
+CREATE TABLE IF NOT EXISTS stat_snapshots (
+    work_id INTEGER NOT NULL REFERENCES works(id),
+    taken_at REAL NOT NULL,
+    hits INTEGER,
+    kudos INTEGER,
+    bookmarks INTEGER,
+    comments INTEGER,
+    words INTEGER,
+    nchapters INTEGER,
+    PRIMARY KEY (work_id, taken_at)
+);
+"""
+
+# Attribute name -> tag type stored in the tags table
+TAG_TYPES = {
+    "fandoms": "fandom",
+    "relationships": "relationship",
+    "characters": "character",
+    "tags": "freeform",
+    "warnings": "warning",
+    "categories": "category",
+}
+
+STAT_FIELDS = ("hits", "kudos", "bookmarks", "comments", "words", "nchapters")
+_WORK_FIELDS = ("title", "rating", "language", "summary", "words", "nchapters", "expected_chapters",
+                "complete", "restricted", "date_published", "date_updated", "date_edited",
+                "hits", "kudos", "bookmarks", "comments")
+
+
+def _get(obj, attr):
+    # Properties of unloaded objects raise AttributeError when they reach for the soup
+    try:
+        return getattr(obj, attr)
+    except AttributeError:
+        return None
+
+def _to_sql(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+def _relations_hash(record):
+    """Hash of the authors, series and tags of a record, or None if it has none of them"""
+
+    if not (record["authors"] or record["series"] or record["tags"]):
+        return None
+    relations = (record["authors"], sorted(record["series"]), sorted(record["tags"]))
+    return hashlib.sha1(repr(relations).encode("utf-8")).hexdigest()
+
+def extract_work(work, include_text=False):
+    """Extracts everything the store keeps from a Work object.
+    Works parsed from banners (search results, listings) and blurbs only have some of the fields.
+
+    Args:
+        work (AO3.Work/AO3.WorkBlurb): Work object or blurb
+        include_text (bool, optional): Extract chapter text too. Defaults to False.
+
+    Returns:
+        dict: Plain values that can be written to the store
+    """
+
+    record = {"id": work.id}
+    for field in _WORK_FIELDS:
+        record[field] = _to_sql(_get(work, field))
+
+    # WorkBlurb objects keep authors as usernames and series as (id, name) tuples
+    authors = _get(work, "authors") or []
+    record["authors"] = [author if isinstance(author, str) else author.username for author in authors]
+    series = _get(work, "series") or []
+    record["series"] = [tuple(s) if isinstance(s, tuple) else (s.id, _get(s, "name")) for s in series]
+    record["tags"] = [(TAG_TYPES[attr], str(name))
+                      for attr in TAG_TYPES
+                      for name in (_get(work, attr) or []) if name is not None]
+
+    chapters = []
+    for chapter in getattr(work, "chapters", []):
+        # Chapters restored by AO3.serialization aren't loaded but have their values cached
+        if not chapter.loaded and "number" not in chapter.__dict__:
+            continue
+        chapters.append((
+            chapter.number, chapter.id, _get(chapter, "title"),
+            _get(chapter, "words"), _get(chapter, "text") if include_text else None))
+    record["chapters"] = chapters
+    return record
+
+
+class WorkStore:
+    """Normalized SQLite database of works, their authors, series, tags,
+    chapters and a history of their stats.
+
+    Works are only written when they're new, their date_updated or stats
+    changed, or they carry authors, series, tags, chapters or chapter text the
+    stored work doesn't have (e.g. a fully loaded work that was first stored
+    from a search result). Every stats change adds a row to stat_snapshots.
+    """
+
+    def __init__(self, path=":memory:"):
+        """Opens (or creates) a work store
+
+        Args:
+            path (str, optional): Database file. Defaults to ":memory:".
+        """
+
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.executescript(_SCHEMA)
+        # Stores created before relations_hash existed
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(works)")]
+        if "relations_hash" not in columns:
+            self._conn.execute("ALTER TABLE works ADD COLUMN relations_hash TEXT")
+        self._tag_ids = {}
+        self._author_ids = {}
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _ids(self, cache, keys, insert, select):
+        """Returns {key: id}, creating missing rows in one batch"""
+
+        missing = [key for key in set(keys) if key not in cache]
+        if missing:
+            self._conn.executemany(insert, missing)
+            for key in missing:
+                cache[key] = self._conn.execute(select, key).fetchone()[0]
+        return cache
+
+    def upsert_works(self, works, batch_size=500, include_text=False):
+        """Writes works to the store, skipping the ones that didn't change
+
+        Args:
+            works (iterable): AO3.Work or AO3.WorkBlurb objects
+            batch_size (int, optional): Number of works written per transaction. Defaults to 500.
+            include_text (bool, optional): Store the text of loaded chapters. Defaults to False.
+
+        Returns:
+            dict: Number of works 'inserted', 'updated', 'stats_updated' and 'unchanged'
+        """
+
+        counts = {"inserted": 0, "updated": 0, "stats_updated": 0, "unchanged": 0}
+        batch = []
+        for work in works:
+            batch.append(extract_work(work, include_text))
+            if len(batch) >= batch_size:
+                self._upsert_batch(batch, counts)
+                batch = []
+        if batch:
+            self._upsert_batch(batch, counts)
+        return counts
+
+    def upsert_work(self, work, include_text=False):
+        """Writes a single work to the store. See upsert_works()"""
+        return self.upsert_works((work,), include_text=include_text)
+
+    def _upsert_batch(self, records, counts):
+        now = time.time()
+        with self._lock:
+            try:
+                with self._conn:
+                    ids = [record["id"] for record in records]
+                    existing = {}
+                    for start in range(0, len(ids), 900):
+                        chunk = ids[start:start+900]
+                        rows = self._conn.execute(
+                            f"SELECT id, date_updated, relations_hash, {', '.join(STAT_FIELDS)} FROM works "
+                            f"WHERE id IN ({', '.join('?' * len(chunk))})", chunk)
+                        existing.update((row["id"], row) for row in rows)
+                    # work_id -> (number of stored chapters, number of them with text)
+                    stored_chapters = {}
+                    for start in range(0, len(ids), 900):
+                        chunk = ids[start:start+900]
+                        rows = self._conn.execute(
+                            "SELECT work_id, COUNT(*), COUNT(text) FROM chapters "
+                            f"WHERE work_id IN ({', '.join('?' * len(chunk))}) GROUP BY work_id", chunk)
+                        stored_chapters.update((row[0], (row[1], row[2])) for row in rows)
+
+                    full, stats_only = [], []
+                    for record in records:
+                        record["relations_hash"] = _relations_hash(record)
+                        old = existing.get(record["id"])
+                        if old is None:
+                            full.append(record)
+                            counts["inserted"] += 1
+                        elif record["date_updated"] is not None and record["date_updated"] != old["date_updated"]:
+                            full.append(record)
+                            counts["updated"] += 1
+                        elif self._adds_content(record, old, stored_chapters.get(record["id"], (0, 0))):
+                            full.append(record)
+                            counts["updated"] += 1
+                        elif any(record[f] is not None and record[f] != old[f] for f in STAT_FIELDS):
+                            stats_only.append(record)
+                            counts["stats_updated"] += 1
+                        else:
+                            counts["unchanged"] += 1
+
+                    if full:
+                        self._write_full(full, now)
+                    if stats_only:
+                        # Unknown values (None) keep what's already stored
+                        self._conn.executemany(
+                            f"UPDATE works SET {', '.join(f'{f} = COALESCE(?, {f})' for f in STAT_FIELDS)}, "
+                            "last_changed = ? WHERE id = ?",
+                            [[record[f] for f in STAT_FIELDS] + [now, record["id"]] for record in stats_only])
+                    snapshots = [record for record in full + stats_only
+                                 if any(record[f] is not None for f in STAT_FIELDS)]
+                    self._conn.executemany(
+                        f"INSERT OR REPLACE INTO stat_snapshots (work_id, taken_at, {', '.join(STAT_FIELDS)}) "
+                        f"VALUES (?, ?, {', '.join('?' * len(STAT_FIELDS))})",
+                        [[record["id"], now] + [record[f] for f in STAT_FIELDS] for record in snapshots])
+            except BaseException:
+                # Rows added by the failed transaction were rolled back, so their cached IDs are invalid
+                self._tag_ids.clear()
+                self._author_ids.clear()
+                raise
+
+    @staticmethod
+    def _adds_content(record, old, stored_chapters):
+        """Returns True if a record has relations, chapters or chapter text that aren't stored yet"""
+
+        if record["relations_hash"] is not None and record["relations_hash"] != old["relations_hash"]:
+            return True
+        nchapters, ntexts = stored_chapters
+        if record["chapters"] and len(record["chapters"]) != nchapters:
+            return True
+        texts = sum(1 for chapter in record["chapters"] if chapter[4] is not None)
+        return texts > ntexts
+
+    def _write_full(self, records, now):
+        columns = ", ".join(_WORK_FIELDS)
+        updates = ", ".join(f"{f} = COALESCE(excluded.{f}, {f})" for f in _WORK_FIELDS)
+        self._conn.executemany(
+            f"INSERT INTO works (id, {columns}, first_seen, last_changed) "
+            f"VALUES (?, {', '.join('?' * len(_WORK_FIELDS))}, ?, ?) "
+            f"ON CONFLICT(id) DO UPDATE SET {updates}, last_changed = excluded.last_changed",
+            [[record["id"]] + [record[f] for f in _WORK_FIELDS] + [now, now] for record in records])
+        self._conn.executemany(
+            "UPDATE works SET relations_hash = ? WHERE id = ?",
+            [(record["relations_hash"], record["id"]) for record in records
+             if record["relations_hash"] is not None])
+
+        author_ids = self._ids(
+            self._author_ids, [(name,) for record in records for name in record["authors"]],
+            "INSERT OR IGNORE INTO authors (username) VALUES (?)",
+            "SELECT id FROM authors WHERE username = ?")
+        tag_ids = self._ids(
+            self._tag_ids, [tag for record in records for tag in record["tags"]],
+            "INSERT OR IGNORE INTO tags (type, name) VALUES (?, ?)",
+            "SELECT id FROM tags WHERE type = ? AND name = ?")
+        self._conn.executemany(
+            "INSERT INTO series (id, name) VALUES (?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET name = COALESCE(excluded.name, name)",
+            [s for record in records for s in record["series"]])
+
+        # Relations are only replaced when the record actually carries them,
+        # so a partial (banner) work doesn't erase what a full load stored
+        for table, field in (("work_authors", "authors"), ("work_tags", "tags"), ("work_series", "series")):
+            self._conn.executemany(f"DELETE FROM {table} WHERE work_id = ?",
+                                   [(record["id"],) for record in records if record[field]])
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO work_authors (work_id, author_id, position) VALUES (?, ?, ?)",
+            [(record["id"], author_ids[(name,)], position)
+             for record in records for position, name in enumerate(record["authors"])])
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO work_tags (work_id, tag_id) VALUES (?, ?)",
+            [(record["id"], tag_ids[tag]) for record in records for tag in record["tags"]])
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO work_series (work_id, series_id) VALUES (?, ?)",
+            [(record["id"], series_id) for record in records for series_id, _ in record["series"]])
+        self._conn.executemany(
+            "INSERT INTO chapters (work_id, number, id, title, words, text) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(work_id, number) DO UPDATE SET id = excluded.id, title = excluded.title, "
+            "words = excluded.words, text = COALESCE(excluded.text, text)",
+            [(record["id"],) + chapter for record in records for chapter in record["chapters"]])
+
+    def upsert_series(self, series_list):
+        """Writes series metadata to the store. Series objects need to be loaded
+
+        Args:
+            series_list (iterable): AO3.Series objects
+
+        Returns:
+            int: Number of series written
+        """
+
+        fields = ("name", "description", "words", "nworks", "complete", "series_begun", "series_updated")
+        rows = [[s.id] + [_to_sql(_get(s, f)) for f in fields] for s in series_list]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT INTO series (id, {', '.join(fields)}) VALUES (?, {', '.join('?' * len(fields))}) "
+                f"ON CONFLICT(id) DO UPDATE SET {', '.join(f'{f} = COALESCE(excluded.{f}, {f})' for f in fields)}",
+                rows)
+        return len(rows)
+
+    def query(self, sql, params=()):
+        """Runs an arbitrary SQL query against the store
+
+        Returns:
+            list: List of sqlite3.Row objects
+        """
+
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def get_work(self, workid):
+        """Returns a stored work with its authors, series and tags, or None if it isn't stored
+
+        Returns:
+            dict: Work metadata
+        """
+
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM works WHERE id = ?", (workid,)).fetchone()
+            if row is None:
+                return None
+            work = dict(row)
+            work["authors"] = [r[0] for r in self._conn.execute(
+                "SELECT a.username FROM work_authors wa JOIN authors a ON a.id = wa.author_id "
+                "WHERE wa.work_id = ? ORDER BY wa.position", (workid,))]
+            work["series"] = [(r[0], r[1]) for r in self._conn.execute(
+                "SELECT s.id, s.name FROM work_series ws JOIN series s ON s.id = ws.series_id "
+                "WHERE ws.work_id = ?", (workid,))]
+            for attr, type_ in TAG_TYPES.items():
+                work[attr] = []
+            for type_, name in self._conn.execute(
+                    "SELECT t.type, t.name FROM work_tags wt JOIN tags t ON t.id = wt.tag_id "
+                    "WHERE wt.work_id = ? ORDER BY t.id", (workid,)):
+                work[{v: k for k, v in TAG_TYPES.items()}[type_]].append(name)
+            return work
+
+    def works_by_tag(self, name, tag_type=None):
+        """Returns the IDs of the works with a tag
+
+        Args:
+            name (str): Tag name
+            tag_type (str, optional): 'fandom', 'relationship', 'character', 'freeform', 'warning' or 'category'.
+            Any type if None. Defaults to None.
+
+        Returns:
+            list: Work IDs
+        """
+
+        sql = "SELECT wt.work_id FROM tags t JOIN work_tags wt ON wt.tag_id = t.id WHERE t.name = ?"
+        params = [name]
+        if tag_type is not None:
+            sql += " AND t.type = ?"
+            params.append(tag_type)
+        return [row[0] for row in self.query(sql + " ORDER BY wt.work_id", params)]
+
+    def works_by_fandom(self, fandom):
+        """Returns the IDs of the works in a fandom"""
+        return self.works_by_tag(fandom, "fandom")
+
+    def works_by_author(self, username):
+        """Returns the IDs of the works by an author"""
+
+        return [row[0] for row in self.query(
+            "SELECT wa.work_id FROM authors a JOIN work_authors wa ON wa.author_id = a.id "
+            "WHERE a.username = ? ORDER BY wa.work_id", (username,))]
+
+    def works_in_series(self, seriesid):
+        """Returns the IDs of the stored works in a series"""
+
+        return [row[0] for row in self.query(
+            "SELECT work_id FROM work_series WHERE series_id = ? ORDER BY work_id", (seriesid,))]
+
+    def stat_history(self, workid):
+        """Returns every stats snapshot of a work, oldest first
+
+        Returns:
+            list: dicts with 'taken_at' and the stats fields
+        """
+
+        return [dict(row) for row in self.query(
+            f"SELECT taken_at, {', '.join(STAT_FIELDS)} FROM stat_snapshots "
+            "WHERE work_id = ? ORDER BY taken_at", (workid,))]
+
+    def __len__(self):
+        return self.query("SELECT COUNT(*) FROM works")[0][0]
@@ -0,0 +1,121 @@
+"""Dictionary of the tags seen while parsing.
+
+Tags, fandoms, characters, relationships, ratings, warnings and categories
+repeat across thousands of works. Every name parsed by Work properties and
+work banners goes through the dictionary, so all works share one plain str
+object per name (instead of a new string, or a NavigableString that keeps
+the whole page alive). Names can also be given small integer IDs, so sets of
+tags can be stored and compared as integers.
+"""
+
+import threading
+
+
+class TagDictionary:
+    """Interned tag names and their integer IDs.
+
+    IDs are only assigned to names passed to get_id() or get_ids(), in the order
+    they're first seen, and never change while the dictionary exists. Pickling a
+    dictionary keeps its IDs.
+    """
+
+    def __init__(self):
+        self._names = {}
+        self._ids = {}
+        self._by_id = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, name):
+        return name in self._names
+
+    def __repr__(self):
+        return f"<TagDictionary [{len(self)} names, {len(self._by_id)} IDs]>"
+
+    def __getstate__(self):
+        return {"names": list(self._names), "by_id": list(self._by_id)}
+
+    def __setstate__(self, d):
+        self._names = {name: name for name in d["names"]}
+        self._by_id = [self._names.setdefault(name, name) for name in d["by_id"]]
+        self._ids = {name: i for i, name in enumerate(self._by_id)}
+        self._lock = threading.Lock()
+
+    def intern(self, name):
+        """Returns the dictionary's copy of a name, adding it if it's new
+
+        Args:
+            name (str): Name (a bs4 NavigableString is turned into a plain str)
+
+        Returns:
+            str: Shared str object with the same value, or None if name is None
+        """
+
+        if name is None:
+            return None
+        name = str(name)
+        # setdefault is atomic, so threads parsing at the same time agree on one copy
+        return self._names.setdefault(name, name)
+
+    def intern_all(self, names):
+        """Returns a list with the dictionary's copy of every name"""
+
+        return [self.intern(name) for name in names]
+
+    def get_id(self, name, add=True):
+        """Returns the integer ID of a name
+
+        Args:
+            name (str): Name
+            add (bool, optional): Assign an ID to names that don't have one yet. Defaults to True.
+
+        Returns:
+            int: ID, or None if the name has no ID and add is False
+        """
+
+        i = self._ids.get(name)
+        if i is None and add:
+            name = self.intern(name)
+            with self._lock:
+                i = self._ids.get(name)
+                if i is None:
+                    i = len(self._by_id)
+                    self._by_id.append(name)
+                    self._ids[name] = i
+        return i
+
+    def get_ids(self, names, add=True):
+        """Returns the IDs of several names, as a frozenset. Names without an ID are
+        left out if add is False"""
+
+        ids = (self.get_id(name, add) for name in names)
+        return frozenset(i for i in ids if i is not None)
+
+    def get_name(self, i):
+        """Returns the name with an ID
+
+        Raises:
+            IndexError: No name has this ID
+        """
+
+        return self._by_id[i]
+
+    def get_names(self, ids):
+        """Returns the names with the given IDs, in the same order"""
+
+        return [self._by_id[i] for i in ids]
+
+
+# Shared by every parser in the package
+dictionary = TagDictionary()
+
+
+def intern(name):
+    """Returns the shared dictionary's copy of a name. See TagDictionary.intern()"""
+    return dictionary.intern(name)
+
+def intern_all(names):
+    """Returns the shared dictionary's copy of every name. See TagDictionary.intern_all()"""
+    return dictionary.intern_all(names)
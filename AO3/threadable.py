@@ -1,4 +1,7 @@
 import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .requester import current_priority, priority
 
 
 def threadable(func):
@@ -6,7 +9,7 @@ def threadable(func):
     
     def new(*args, threaded=False, **kwargs):
         if threaded:
-            thread = threading.Thread(target=func, args=args, kwargs=kwargs)
+            thread = threading.Thread(target=_with_priority(func, current_priority()), args=args, kwargs=kwargs)
             thread.start()
             return thread
         else:
@@ -16,6 +19,14 @@ def threadable(func):
     new.__name__ = func.__name__
     new._threadable = True
     return new
+
+def _with_priority(func, level):
+    """Wraps func so that it makes its requests with the given priority in any thread"""
+
+    def run(*args, **kwargs):
+        with priority(level):
+            return func(*args, **kwargs)
+    return run
             
 class ThreadPool:
     def __init__(self, maximum=None):
@@ -32,3 +43,54 @@ class ThreadPool:
             self._threads[:] = filter(lambda thread: thread.is_alive(), self._threads)
             for _ in range(min(self.maximum-len(self._threads), len(self._tasks))):
                 self._threads.append(self._tasks.pop(0)(threaded=True))
+
+
+def bounded_map(func, items, workers=4, return_exceptions=False, ordered=True):
+    """Calls func(item) for every item using at most `workers` threads, and yields
+    the results as soon as they're available.
+    Items are consumed lazily, so `items` can be an endless iterator.
+
+    Args:
+        func (callable): Function to call
+        items (iterable): Arguments
+        workers (int, optional): Maximum number of concurrent calls. Defaults to 4.
+        return_exceptions (bool, optional): Yield exceptions raised by func instead of raising them. Defaults to False.
+        ordered (bool, optional): Yield the results in the same order as the items, instead of
+        in the order they finish. Defaults to True.
+
+    Yields:
+        object: func(item)
+    """
+
+    items = iter(items)
+    func = _with_priority(func, current_priority())
+    pending = []
+    done = object()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        def submit_next():
+            item = next(items, done)
+            if item is not done:
+                pending.append(executor.submit(func, item))
+
+        try:
+            for _ in range(workers):
+                submit_next()
+            while len(pending) > 0:
+                if ordered:
+                    future = pending.pop(0)
+                else:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    future = next(f for f in pending if f in finished)
+                    pending.remove(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    if not return_exceptions:
+                        raise
+                    result = e
+                # Keep the pool busy while the caller handles the result
+                submit_next()
+                yield result
+        finally:
+            for future in pending:
+                future.cancel()
@@ -0,0 +1,372 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+AO3_ORIGIN = "https://archiveofourown.org"
+
+
+def _prepare(method, url, params=None, data=None):
+    """Returns the final URL and body that would be sent for a request"""
+
+    import requests
+
+    prepared = requests.Request(method.upper(), url, params=params, data=data).prepare()
+    body = prepared.body
+    if isinstance(body, str):
+        body = body.encode()
+    return prepared.url, body or b""
+
+def _build_response(method, url, status_code, headers, content):
+    import requests
+    from requests.structures import CaseInsensitiveDict
+
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers = CaseInsensitiveDict(headers)
+    response._content = content
+    response.url = url
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    response.request = requests.Request(method.upper(), url).prepare()
+    return response
+
+
+class HTTPTransport:
+    """Sends requests over the network. This is the default transport"""
+
+    def request(self, method, url, session=None, **kwargs):
+        """Sends a request
+
+        Args:
+            method (str): HTTP method
+            url (str): URL
+            session (requests.Session, optional): Session object to request with
+
+        Returns:
+            requests.Response: Response object
+        """
+
+        if session is not None:
+            return session.request(method, url, **kwargs)
+        import requests
+        return requests.request(method, url, **kwargs)
+
+
+class CassetteStore:
+    """Directory of recorded responses.
+
+    Every response is stored as a JSON file with its metadata and a separate
+    file with the raw body, named after a hash of the request's method, final
+    URL and body.
+    """
+
+    def __init__(self, path):
+        """Creates a new cassette store
+
+        Args:
+            path (str): Directory where the cassettes are kept. Created if it doesn't exist.
+        """
+
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    @staticmethod
+    def key(method, url, body=b""):
+        """Returns the key a request is stored under
+
+        Args:
+            method (str): HTTP method
+            url (str): Final URL, including the query string
+            body (bytes, optional): Request body. Defaults to b"".
+
+        Returns:
+            str: Cassette key
+        """
+
+        digest = hashlib.sha1()
+        digest.update(method.upper().encode())
+        digest.update(b"\0")
+        digest.update(url.encode())
+        digest.update(b"\0")
+        digest.update(body)
+        return digest.hexdigest()
+
+    def _paths(self, key):
+        return os.path.join(self.path, f"{key}.json"), os.path.join(self.path, f"{key}.body")
+
+    def get(self, method, url, body=b""):
+        """Returns the recorded response for a request, or None if there isn't one
+
+        Returns:
+            dict: Cassette with the keys 'method', 'url', 'status_code', 'headers' and 'content'
+        """
+
+        meta_path, body_path = self._paths(self.key(method, url, body))
+        try:
+            with open(meta_path, "r") as file:
+                cassette = json.load(file)
+            with open(body_path, "rb") as file:
+                cassette["content"] = file.read()
+        except FileNotFoundError:
+            return None
+        return cassette
+
+    def put(self, method, url, status_code, headers, content, body=b""):
+        """Records a response, replacing any previous recording of the same request"""
+
+        key = self.key(method, url, body)
+        meta_path, body_path = self._paths(key)
+        cassette = {
+            "method": method.upper(),
+            "url": url,
+            "status_code": status_code,
+            "headers": dict(headers),
+            "recorded_at": time.time(),
+        }
+        with self._lock:
+            with open(body_path, "wb") as file:
+                file.write(content)
+            with open(meta_path, "w") as file:
+                json.dump(cassette, file)
+        return key
+
+    def __len__(self):
+        return sum(1 for name in os.listdir(self.path) if name.endswith(".json"))
+
+
+class RecordingTransport:
+    """Sends requests through another transport and records every response,
+    except for HTTP 429 (rate limiting) responses"""
+
+    def __init__(self, store, transport=None):
+        """
+        Args:
+            store (CassetteStore): Where to record the responses
+            transport (optional): Transport used to send the requests. Defaults to HTTPTransport().
+        """
+
+        self.store = store
+        self.transport = HTTPTransport() if transport is None else transport
+
+    def request(self, method, url, session=None, **kwargs):
+        response = self.transport.request(method, url, session=session, **kwargs)
+        if response.status_code == 429:
+            return response
+        final_url, body = _prepare(method, url, kwargs.get("params"), kwargs.get("data"))
+        self.store.put(method, final_url, response.status_code, response.headers, response.content, body)
+        return response
+
+
+class ReplayTransport:
+    """Serves recorded responses without using the network"""
+
+    def __init__(self, store, fallback=None):
+        """
+        Args:
+            store (CassetteStore): Recorded responses
+            fallback (optional): Transport used for requests that weren't recorded.
+            If None, utils.ReplayError is raised instead. Defaults to None.
+        """
+
+        self.store = store
+        self.fallback = fallback
+
+    def request(self, method, url, session=None, **kwargs):
+        final_url, body = _prepare(method, url, kwargs.get("params"), kwargs.get("data"))
+        cassette = self.store.get(method, final_url, body)
+        if cassette is None:
+            if self.fallback is not None:
+                return self.fallback.request(method, url, session=session, **kwargs)
+            from . import utils
+            raise utils.ReplayError(f"No recorded response for {method.upper()} {final_url}")
+        return _build_response(method, final_url, cassette["status_code"], cassette["headers"], cassette["content"])
+
+
+class RewriteTransport:
+    """Sends requests meant for AO3 to another server, such as a local CassetteServer"""
+
+    def __init__(self, target, transport=None, origin=AO3_ORIGIN):
+        """
+        Args:
+            target (str): Origin to send requests to (e.g. "http://127.0.0.1:8000")
+            transport (optional): Transport used to send the requests. Defaults to HTTPTransport().
+            origin (str, optional): Origin to replace. Defaults to "https://archiveofourown.org".
+        """
+
+        self.target = target.rstrip("/")
+        self.origin = origin.rstrip("/")
+        self.transport = HTTPTransport() if transport is None else transport
+
+    def request(self, method, url, session=None, **kwargs):
+        if url.startswith(self.origin):
+            url = self.target + url[len(self.origin):]
+        return self.transport.request(method, url, session=session, **kwargs)
+
+
+class CassetteServer:
+    """Local HTTP server that stands in for AO3 by serving recorded responses.
+
+    It can add latency to every response and answer with synthetic HTTP 429
+    responses, either at random or whenever a request rate is exceeded, to
+    test rate limiting and concurrency without touching AO3.
+    """
+
+    def __init__(self, store, host="127.0.0.1", port=0, latency=0.0, jitter=0.0,
+                 error_rate=0.0, rate_limit=None, origin=AO3_ORIGIN, seed=None):
+        """
+        Args:
+            store (CassetteStore): Recorded responses
+            host (str, optional): Address to listen on. Defaults to "127.0.0.1".
+            port (int, optional): Port to listen on (0 -> any free port). Defaults to 0.
+            latency (float, optional): Seconds to wait before every response. Defaults to 0.0.
+            jitter (float, optional): Random extra latency of up to this many seconds. Defaults to 0.0.
+            error_rate (float, optional): Probability of answering with a 429. Defaults to 0.0.
+            rate_limit (tuple, optional): (requests, seconds). Answer with a 429 when more than
+            this many requests arrive within the time window. Defaults to None.
+            origin (str, optional): Origin the cassettes were recorded from. Defaults to "https://archiveofourown.org".
+            seed (int, optional): Seed for latency jitter and random errors. Defaults to None.
+        """
+
+        self.store = store
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.origin = origin.rstrip("/")
+        self.served = 0
+        self.rate_limited = 0
+        self.missing = 0
+        self._random = random.Random(seed)
+        self._hits = []
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        """Origin this server can be reached at"""
+        return f"http://{self.host}:{self.port}"
+
+    def _should_limit(self):
+        with self._lock:
+            if self.error_rate > 0 and self._random.random() < self.error_rate:
+                return True
+            if self.rate_limit is not None:
+                n, window = self.rate_limit
+                t = time.time()
+                while len(self._hits) and t - self._hits[0] >= window:
+                    self._hits.pop(0)
+                if len(self._hits) >= n:
+                    return True
+                self._hits.append(t)
+            return False
+
+    def _delay(self):
+        with self._lock:
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter > 0 else 0)
+        if delay > 0:
+            time.sleep(delay)
+
+    def _handle(self, handler):
+        length = int(handler.headers.get("Content-Length") or 0)
+        body = handler.rfile.read(length) if length > 0 else b""
+        self._delay()
+        if self._should_limit():
+            with self._lock:
+                self.rate_limited += 1
+            status, headers, content = 429, {"Retry-After": "60", "Content-Type": "text/html"}, b"Retry later"
+        else:
+            cassette = self.store.get(handler.command, self.origin + handler.path, body)
+            if cassette is None:
+                with self._lock:
+                    self.missing += 1
+                status, headers, content = 404, {"Content-Type": "text/html"}, b"<h2 class=\"heading\">Error 404</h2>"
+            else:
+                with self._lock:
+                    self.served += 1
+                status, headers, content = cassette["status_code"], cassette["headers"], cassette["content"]
+        handler.send_response(status)
+        for name, value in headers.items():
+            # The body is stored decoded, so these no longer apply
+            if name.lower() in ("content-length", "content-encoding", "transfer-encoding", "connection"):
+                continue
+            handler.send_header(name, value)
+        handler.send_header("Content-Length", str(len(content)))
+        handler.end_headers()
+        handler.wfile.write(content)
+
+    def start(self):
+        """Starts serving in a background thread"""
+
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                server._handle(self)
+
+            do_POST = do_GET
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops the server"""
+
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m AO3.transport", description="Serve recorded AO3 responses locally")
+    parser.add_argument("cassettes", help="Cassette directory")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random extra latency (seconds)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of a synthetic 429")
+    parser.add_argument("--rate-limit", help="Answer with 429 above this rate, e.g. 12/60 (requests/seconds)")
+    args = parser.parse_args(argv)
+
+    rate_limit = None
+    if args.rate_limit is not None:
+        n, window = args.rate_limit.split("/")
+        rate_limit = (int(n), float(window))
+    server = CassetteServer(CassetteStore(args.cassettes), args.host, args.port, args.latency,
+                            args.jitter, args.error_rate, rate_limit)
+    server.start()
+    print(f"Serving {len(server.store)} cassettes on {server.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,8 @@
 import datetime
 from functools import cached_property
 
-import requests
-from bs4 import BeautifulSoup
-
-from . import threadable, utils
-from .common import get_work_from_banner
+from . import instrumentation, serialization, threadable, utils
+from .common import get_work_from_banner, page_count, paginate
 from .requester import requester
 
 
@@ -14,13 +11,22 @@ class User:
     AO3 user object
     """
 
-    def __init__(self, username, session=None, load=True):
+    # Pages with information about a user. Each one is requested the first time it's needed
+    SECTIONS = {
+        "works": "https://archiveofourown.org/users/{0}/works",
+        "profile": "https://archiveofourown.org/users/{0}/profile",
+        "bookmarks": "https://archiveofourown.org/users/{0}/bookmarks",
+    }
+
+    def __init__(self, username, session=None, load=True, prefetch=("profile",)):
         """Creates a new AO3 user object
 
         Args:
             username (str): AO3 username
             session (AO3.Session, optional): Used to access additional info
             load (bool, optional): If true, the user is loaded on initialization. Defaults to True.
+            prefetch (iterable, optional): Sections ("works", "profile", "bookmarks") to load right away when
+            the user is loaded. The others are loaded when they're first needed. Defaults to ("profile",).
         """
 
         self.username = username
@@ -31,7 +37,7 @@ class User:
         self._works = None
         self._bookmarks = None
         if load:
-            self.reload()
+            self.reload(prefetch)
             
     def __repr__(self):
         return f"<User [{self.username}]>"
@@ -39,20 +45,16 @@ class User:
     def __eq__(self, other):
         return isinstance(other, __class__) and other.username == self.username
     
-    def __getstate__(self):
-        d = {}
-        for attr in self.__dict__:
-            if isinstance(self.__dict__[attr], BeautifulSoup):
-                d[attr] = (self.__dict__[attr].encode(), True)
-            else:
-                d[attr] = (self.__dict__[attr], False)
-        return d
-                
+    def __reduce__(self):
+        # Pickled in the compact format of AO3.serialization, so loading doesn't parse any HTML
+        return serialization.reduce(self)
+
     def __setstate__(self, d):
+        # Pickles made by older versions store the page HTML
         for attr in d:
             value, issoup = d[attr]
             if issoup:
-                self.__dict__[attr] = BeautifulSoup(value, "lxml")
+                self.__dict__[attr] = instrumentation.parse(value, "users.__setstate__")
             else:
                 self.__dict__[attr] = value
         
@@ -66,10 +68,14 @@ class User:
         self._session = session 
         
     @threadable.threadable
-    def reload(self):
+    def reload(self, prefetch=("profile",)):
         """
         Loads information about this user.
         This function is threadable.
+
+        Args:
+            prefetch (iterable, optional): Sections ("works", "profile", "bookmarks") to load right away.
+            The others are loaded when they're first needed. Defaults to ("profile",).
         """
         
         for attr in self.__class__.__dict__:
@@ -77,32 +83,70 @@ class User:
                 if attr in self.__dict__:
                     delattr(self, attr)
         
-        @threadable.threadable
-        def req_works(username):
-            self._soup_works = self.request(f"https://archiveofourown.org/users/{username}/works")
-            token = self._soup_works.find("meta", {"name": "csrf-token"})
-            setattr(self, "authenticity_token", token["content"])
-           
-        @threadable.threadable
-        def req_profile(username): 
-            self._soup_profile = self.request(f"https://archiveofourown.org/users/{username}/profile")
-            token = self._soup_profile.find("meta", {"name": "csrf-token"})
-            setattr(self, "authenticity_token", token["content"])
-
-        @threadable.threadable
-        def req_bookmarks(username): 
-            self._soup_bookmarks = self.request(f"https://archiveofourown.org/users/{username}/bookmarks")
-            token = self._soup_bookmarks.find("meta", {"name": "csrf-token"})
-            setattr(self, "authenticity_token", token["content"])
-            
-        rs = [req_works(self.username, threaded=True),
-              req_profile(self.username, threaded=True),
-              req_bookmarks(self.username, threaded=True)]
-        for r in rs:
-            r.join()
-
+        for name in self.SECTIONS:
+            setattr(self, f"_soup_{name}", None)
         self._works = None
         self._bookmarks = None
+
+        prefetch = tuple(prefetch)
+        if len(prefetch) == 1:
+            self._section(prefetch[0])
+        elif len(prefetch) > 1:
+            rs = [self._load_section(name, threaded=True) for name in prefetch]
+            for r in rs:
+                r.join()
+
+    @staticmethod
+    def load_many(usernames, session=None, workers=4, prefetch=("profile",), ordered=True):
+        """Loads many users, making at most `workers` requests at the same time.
+        Errors are returned with the results instead of stopping the batch.
+
+        Args:
+            usernames (iterable): AO3 usernames
+            session (AO3.Session, optional): Session used to load the users. If None, a guest session
+            is created for the batch, so connections are reused. Defaults to None.
+            workers (int, optional): Maximum number of users loaded at the same time. Defaults to 4.
+            prefetch (iterable, optional): Sections to load for every user. Defaults to ("profile",).
+            ordered (bool, optional): Yield the results in the same order as the usernames instead of
+            as soon as each one is loaded. Defaults to True.
+
+        Yields:
+            tuple: (username, User, None) if the user was loaded, or (username, None, exception) if it wasn't
+        """
+
+        from .session import GuestSession
+
+        if session is None:
+            session = GuestSession()
+
+        def load(username):
+            try:
+                return username, User(username, session, True, prefetch), None
+            except Exception as e:
+                return username, None, e
+
+        yield from threadable.bounded_map(load, usernames, workers, ordered=ordered)
+
+    @threadable.threadable
+    def _load_section(self, name):
+        soup = self.request(self.SECTIONS[name].format(self.username))
+        setattr(self, f"_soup_{name}", soup)
+        return soup
+
+    def _section(self, name):
+        """Returns the soup of one of this user's pages, requesting it if it wasn't yet
+
+        Args:
+            name (str): "works", "profile" or "bookmarks"
+
+        Returns:
+            bs4.BeautifulSoup: Page soup
+        """
+
+        soup = getattr(self, f"_soup_{name}")
+        if soup is None:
+            soup = self._load_section(name)
+        return soup
         
     def get_avatar(self):
         """Returns a tuple containing the name of the file and its data
@@ -111,7 +155,7 @@ class User:
             tuple: (name: str, img: bytes)
         """
         
-        icon = self._soup_profile.find("p", {"class": "icon"})
+        icon = self._section("profile").find("p", {"class": "icon"})
         src = icon.img.attrs["src"]
         name = src.split("/")[-1].split("?")[0]
         img = self.get(src).content
@@ -149,7 +193,7 @@ class User:
         
     @property
     def id(self):
-        id_ = self._soup_profile.find("input", {"id": "subscription_subscribable_id"})
+        id_ = self._section("profile").find("input", {"id": "subscription_subscribable_id"})
         return int(id_["value"]) if id_ is not None else None
         
     @cached_property
@@ -159,31 +203,35 @@ class User:
         if self._session is None or not self._session.is_authed:
             raise utils.AuthError("You can only get a user ID using an authenticated session")
         
-        header = self._soup_profile.find("div", {"class": "primary header module"})
+        header = self._section("profile").find("div", {"class": "primary header module"})
         input_ = header.find("input", {"name": "commit", "value": "Unsubscribe"})
         return input_ is not None
     
     @property
     def loaded(self):
-        """Returns True if this user has been loaded"""
-        return self._soup_profile is not None
+        """Returns True if any of this user's pages (see prefetch) has been loaded"""
+        return any(getattr(self, f"_soup_{name}") is not None for name in self.SECTIONS)
     
-    # @cached_property
-    # def authenticity_token(self):
-    #     """Token used to take actions that involve this user"""
-        
-    #     if not self.loaded:
-    #         return None
+    @cached_property
+    def authenticity_token(self):
+        """Token used to take actions that involve this user.
+        Taken from any page that was already loaded, so it doesn't need a request of its own"""
         
-    #     token = self._soup_profile.find("meta", {"name": "csrf-token"})
-    #     return token["content"]
+        for name in self.SECTIONS:
+            soup = getattr(self, f"_soup_{name}")
+            if soup is not None:
+                break
+        else:
+            soup = self._section("profile")
+        token = soup.find("meta", {"name": "csrf-token"})
+        return token["content"] if token is not None else None
     
     @cached_property
     def user_id(self):
         if self._session is None or not self._session.is_authed:
             raise utils.AuthError("You can only get a user ID using an authenticated session")
         
-        header = self._soup_profile.find("div", {"class": "primary header module"})
+        header = self._section("profile").find("div", {"class": "primary header module"})
         input_ = header.find("input", {"name": "subscription[subscribable_id]"})
         if input_ is None:
             raise utils.UnexpectedResponseError("Couldn't fetch user ID")
@@ -196,7 +244,7 @@ class User:
         if not self.is_subscribed:
             raise Exception("You are not subscribed to this user")
         
-        header = self._soup_profile.find("div", {"class": "primary header module"})
+        header = self._section("profile").find("div", {"class": "primary header module"})
         id_ = header.form.attrs["action"].split("/")[-1]
         return int(id_)
 
@@ -208,22 +256,14 @@ class User:
             int: Number of works
         """
 
-        div = self._soup_works.find("div", {"id": "inner"})
+        div = self._section("works").find("div", {"id": "inner"})
         span = div.find("span", {"class": "current"}).getText().replace("(", "").replace(")", "")
         n = span.split(" ")[1]
         return int(self.str_format(n))   
 
     @cached_property
     def _works_pages(self):
-        pages = self._soup_works.find("ol", {"title": "pagination"})
-        if pages is None:
-            return 1
-        n = 1
-        for li in pages.findAll("li"):
-            text = li.getText()
-            if text.isdigit():
-                n = int(text)
-        return n
+        return page_count(self._section("works"))
     
     def get_works(self, use_threading=False):
         """
@@ -237,9 +277,7 @@ class User:
             if use_threading:
                 self.load_works_threaded()
             else:
-                self._works = []
-                for page in range(self._works_pages):
-                    self._load_works(page=page+1)
+                self._works = list(self._paginate("works", self._parse_works, workers=1))
         return self._works
     
     @threadable.threadable
@@ -249,24 +287,26 @@ class User:
         This function is threadable.
         """ 
         
-        threads = []
-        self._works = []
-        for page in range(self._works_pages):
-            threads.append(self._load_works(page=page+1, threaded=True))
-        for thread in threads:
-            thread.join()
+        self._works = list(self._paginate("works", self._parse_works))
 
-    @threadable.threadable
-    def _load_works(self, page=1):
-        from .works import Work
-        self._soup_works = self.request(f"https://archiveofourown.org/users/{self.username}/works?page={page}")
-            
-        ol = self._soup_works.find("ol", {"class": "work index group"})
+    def _paginate(self, name, parse, workers=4):
+        """Yields the items of every page of one of this user's listings. The
+        first page is the section that was already loaded (or is loaded now)"""
+
+        url = self.SECTIONS[name].format(self.username) + "?page={0}"
+        return paginate(lambda page: self.request(url.format(page)), parse, self._section(name), workers)
 
+    @staticmethod
+    def _parse_works(soup):
+        works = []
+        ol = soup.find("ol", {"class": "work index group"})
+        if ol is None:
+            return works
         for work in ol.find_all("li", {"role": "article"}):
             if work.h4 is None:
                 continue
-            self._works.append(get_work_from_banner(work))
+            works.append(get_work_from_banner(work))
+        return works
 
     @cached_property
     def bookmarks(self):
@@ -276,22 +316,14 @@ class User:
             int: Number of bookmarks 
         """
 
-        div = self._soup_bookmarks.find("div", {"id": "inner"})
+        div = self._section("bookmarks").find("div", {"id": "inner"})
         span = div.find("span", {"class": "current"}).getText().replace("(", "").replace(")", "")
         n = span.split(" ")[1]
         return int(self.str_format(n))   
 
     @cached_property
     def _bookmarks_pages(self):
-        pages = self._soup_bookmarks.find("ol", {"title": "pagination"})
-        if pages is None:
-            return 1
-        n = 1
-        for li in pages.findAll("li"):
-            text = li.getText()
-            if text.isdigit():
-                n = int(text)
-        return n
+        return page_count(self._section("bookmarks"))
 
     def get_bookmarks(self, use_threading=False):
         """
@@ -305,9 +337,7 @@ class User:
             if use_threading:
                 self.load_bookmarks_threaded()
             else:
-                self._bookmarks = []
-                for page in range(self._bookmarks_pages):
-                    self._load_bookmarks(page=page+1)
+                self._bookmarks = list(self._paginate("bookmarks", self._parse_bookmarks, workers=1))
         return self._bookmarks
     
     @threadable.threadable
@@ -317,25 +347,19 @@ class User:
         This function is threadable.
         """ 
         
-        threads = []
-        self._bookmarks = []
-        for page in range(self._bookmarks_pages):
-            threads.append(self._load_bookmarks(page=page+1, threaded=True))
-        for thread in threads:
-            thread.join()
-
-    @threadable.threadable
-    def _load_bookmarks(self, page=1):
-        from .works import Work
-        self._soup_bookmarks = self.request(f"https://archiveofourown.org/users/{self.username}/bookmarks?page={page}")
-            
-        ol = self._soup_bookmarks.find("ol", {"class": "bookmark index group"})
+        self._bookmarks = list(self._paginate("bookmarks", self._parse_bookmarks))
 
+    @staticmethod
+    def _parse_bookmarks(soup):
+        works = []
+        ol = soup.find("ol", {"class": "bookmark index group"})
+        if ol is None:
+            return works
         for work in ol.find_all("li", {"role": "article"}):
-            authors = []
             if work.h4 is None:
                 continue
-            self._bookmarks.append(get_work_from_banner(work))
+            works.append(get_work_from_banner(work))
+        return works
     
     @cached_property
     def bio(self):
@@ -345,7 +369,7 @@ class User:
             str: User's bio
         """
 
-        div = self._soup_profile.find("div", {"class": "bio module"})
+        div = self._section("profile").find("div", {"class": "bio module"})
         if div is None:
             return ""
         blockquote = div.find("blockquote", {"class": "userstuff"})
@@ -367,7 +391,7 @@ class User:
         if self._session is None:
             req = requester.request("get", *args, **kwargs)
         else:
-            req = requester.request("get", *args, **kwargs, session=self._session.session)
+            req = self._session.get(*args, **kwargs)
         if req.status_code == 429:
             raise utils.HTTPError("We are being rate-limited. Try again in a while or reduce the number of requests")
         return req
@@ -383,7 +407,7 @@ class User:
         """
 
         req = self.get(url)
-        soup = BeautifulSoup(req.content, "lxml")
+        soup = instrumentation.parse(req.content, "users.request")
         return soup
 
     @staticmethod
@@ -2,13 +2,14 @@ import os
 import pickle
 import re
 
-from bs4 import BeautifulSoup
-
+from . import instrumentation
 from .requester import requester
 from .common import url_join
 
 _FANDOMS = None
 _LANGUAGES = None
+# Words are separated by spaces, newlines and tabs
+_WORD = re.compile(r"[^ \n\t]+")
 
 AO3_AUTH_ERROR_URL = "https://archiveofourown.org/auth_error"
 
@@ -68,6 +69,16 @@ class CollectError(Exception):
         super().__init__(message)
         self.errors = errors
 
+class ReplayError(Exception):
+    def __init__(self, message, errors=[]):
+        super().__init__(message)
+        self.errors = errors
+
+class SerializationError(Exception):
+    def __init__(self, message, errors=[]):
+        super().__init__(message)
+        self.errors = errors
+
 class Query:
     def __init__(self):
         self.fields = []
@@ -116,7 +127,8 @@ class Constraint:
         return self.string
     
 def word_count(text):
-    return len(tuple(filter(lambda w: w != "", re.split(" |\n|\t", text))))
+    """Counts the words (runs of characters other than spaces, newlines and tabs) in a text"""
+    return sum(1 for _ in _WORD.finditer(text))
     
 def set_rqtw(value):
     """Sets the requests per time window parameter for the AO3 requester"""
@@ -126,6 +138,25 @@ def set_timew(value):
     """Sets the time window parameter for the AO3 requester"""
     requester.setTimeW(value)
         
+def set_transport(transport):
+    """Sets the transport used by the AO3 requester (None -> send requests over the network).
+    See AO3.transport for recording and replaying responses"""
+    requester.setTransport(transport)
+        
+def set_ledger(path, name="ao3"):
+    """Shares the AO3 requester's rate limit with every process that uses the same
+    ledger file (None -> only limit this process). See AO3.ledger"""
+    if path is None:
+        requester.setLedger(None)
+    else:
+        from .ledger import SQLiteLedger
+        requester.setLedger(SQLiteLedger(path, name))
+        
+def set_reserve(priority, fraction):
+    """Sets the fraction of each time window that requests of a priority class
+    (AO3.requester.NORMAL or BACKGROUND) can't use, keeping it for higher priorities"""
+    requester.setReserve(priority, fraction)
+        
 def limit_requests(limit=True):
     """Toggles request limiting"""
     if limit:
@@ -336,7 +367,7 @@ def delete_comment(comment, session):
     if req.status_code == 429:
         raise HTTPError("We are being rate-limited. Try again in a while or reduce the number of requests")
     else:
-        soup = BeautifulSoup(req.content, "lxml")
+        soup = instrumentation.parse(req.content, "utils.delete_comment")
         if "auth error" in soup.title.getText().lower():
             raise AuthError("Invalid authentication token. Try calling session.refresh_auth_token()")
         else:
@@ -369,7 +400,7 @@ def kudos(work, session):
         "kudo[commentable_type]": "Work"
     }
     headers = {
-        "x-csrf-token": work.authenticity_token,
+        "x-csrf-token": at,
         "x-requested-with": "XMLHttpRequest",
         "referer": f"https://archiveofourown.org/work/{work.id}"
     }
@@ -430,7 +461,7 @@ def subscribe(subscribable, worktype, session, unsubscribe=False, subid=None):
             raise InvalidIdError("When unsubscribing, subid cannot be None")
         url += f"/{subid}"
         data["_method"] = "delete"
-    req = session.session.post(url, data=data, allow_redirects=False)
+    req = session.post(url, data=data, allow_redirects=False)
     if unsubscribe:
         return req
     if req.status_code == 302:
@@ -482,7 +513,7 @@ def bookmark(bookmarkable, session=None, notes="", tags=None, collections=None,
     if notes != "": data["bookmark[bookmarker_notes]"] = notes
     
     url = url_join(bookmarkable.url, "bookmarks")
-    req = session.session.post(url, data=data, allow_redirects=False)
+    req = session.post(url, data=data, allow_redirects=False)
     handle_bookmark_errors(req)
     
 def delete_bookmark(bookmarkid, session, auth_token=None):
@@ -502,7 +533,7 @@ def delete_bookmark(bookmarkid, session, auth_token=None):
     }
     
     url = f"https://archiveofourown.org/bookmarks/{bookmarkid}"
-    req = session.session.post(url, data=data, allow_redirects=False)
+    req = session.post(url, data=data, allow_redirects=False)
     handle_bookmark_errors(req)
     
 def handle_bookmark_errors(request):
@@ -511,7 +542,7 @@ def handle_bookmark_errors(request):
             raise AuthError("Invalid authentication token. Try calling session.refresh_auth_token()")
     else:
         if request.status_code == 200:
-            soup = BeautifulSoup(request.content, "lxml")
+            soup = instrumentation.parse(request.content, "utils.handle_bookmark_errors")
             error_div = soup.find("div", {"id": "error", "class": "error"})
             if error_div is None:
                 raise UnexpectedResponseError("An unknown error occurred")
@@ -519,36 +550,56 @@ def handle_bookmark_errors(request):
             errors = [item.getText() for item in error_div.findAll("li")]
             if len(errors) == 0:
                 raise BookmarkError("An unknown error occurred")
-            raise BookmarkError("Error(s) creating bookmark:" + " ".join(errors))
+            raise BookmarkError("Error(s) creating bookmark:" + " ".join(errors), errors)
 
         raise UnexpectedResponseError(f"Unexpected HTTP status code received ({request.status_code})")
 
 def get_pseud_id(ao3object, session=None, specified_pseud=None):
+    """Returns the ID of one of the session user's pseuds. The pseuds are only
+    read once per session, see Session.get_pseud_id()
+
+    Args:
+        ao3object (Work/Chapter/Series): Object whose page has a comment or bookmark form
+        session (AO3.Session, optional): Session object. Defaults to the object's session.
+        specified_pseud (str, optional): Pseud name. Defaults to the default pseud.
+
+    Raises:
+        AuthError: Invalid session
+
+    Returns:
+        str: Pseud ID, or None if it couldn't be found
+    """
+
     if session is None:
         session = ao3object.session
     if session is None or not session.is_authed:
         raise AuthError("Invalid session")
-    
-    soup = session.request(ao3object.url)   
+    return session.get_pseud_id(ao3object, specified_pseud)
+
+def parse_pseuds(soup):
+    """Reads the pseud field of a comment or bookmark form
+
+    Args:
+        soup (bs4.BeautifulSoup): Page (or part of a page) with the form
+
+    Returns:
+        tuple: (default pseud ID, {pseud name: pseud ID}), or None if there's no pseud field.
+        Users with a single pseud get a hidden field, so the dict is empty
+    """
+
     pseud = soup.find("input", {"name": re.compile(".+\\[pseud_id\\]")})
+    if pseud is not None:
+        return pseud.attrs["value"], {}
+    pseud = soup.find("select", {"name": re.compile(".+\\[pseud_id\\]")})
     if pseud is None:
-        pseud = soup.find("select", {"name": re.compile(".+\\[pseud_id\\]")})
-        if pseud is None:
-            return None
-        pseud_id = None
-        if specified_pseud:
-            for option in pseud.findAll("option"):
-                if option.string == specified_pseud:
-                    pseud_id = option.attrs["value"]
-                    break
-        else:
-            for option in pseud.findAll("option"):
-                if "selected" in option.attrs and option.attrs["selected"] == "selected":
-                    pseud_id = option.attrs["value"]
-                    break
-    else:
-        pseud_id = pseud.attrs["value"]
-    return pseud_id
+        return None
+    default = None
+    ids = {}
+    for option in pseud.findAll("option"):
+        ids[option.string] = option.attrs["value"]
+        if "selected" in option.attrs and option.attrs["selected"] == "selected":
+            default = option.attrs["value"]
+    return default, ids
 
 def collect(collectable, session, collections):
     """Invites a work to a collection. Be careful, you can collect a work multiple times
@@ -577,13 +628,13 @@ def collect(collectable, session, collections):
     }
     
     url = url_join(collectable.url, "collection_items")
-    req = session.session.post(url, data=data, allow_redirects=True)
+    req = session.post(url, data=data, allow_redirects=True)
       
     if req.status_code == 302:
         if req.headers["Location"] == AO3_AUTH_ERROR_URL:
             raise AuthError("Invalid authentication token. Try calling session.refresh_auth_token()")
     elif req.status_code == 200:
-        soup = BeautifulSoup(req.content, "lxml")
+        soup = instrumentation.parse(req.content, "utils.collect")
         notice_div = soup.find("div", {"class": "notice"})
         
         error_div = soup.find("div", {"class": "error"})
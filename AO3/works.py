@@ -1,13 +1,16 @@
+import itertools
 import warnings
 from datetime import datetime
 from functools import cached_property
 
 from bs4 import BeautifulSoup
 
-from . import threadable, utils
+from . import instrumentation, serialization, threadable, utils
 from .chapters import Chapter
 from .comments import Comment
+from .common import comment_page_count, paginate
 from .requester import requester
+from .tagdict import intern
 from .users import User
 
 
@@ -27,6 +30,7 @@ class Work:
 
         Raises:
             utils.InvalidIdError: Raised if the work wasn't found
+            utils.AuthError: Raised if the work is only available to registered users and session isn't authenticated
         """
 
         self._session = session
@@ -45,20 +49,16 @@ class Work:
     def __eq__(self, other):
         return isinstance(other, __class__) and other.id == self.id
     
-    def __getstate__(self):
-        d = {}
-        for attr in self.__dict__:
-            if isinstance(self.__dict__[attr], BeautifulSoup):
-                d[attr] = (self.__dict__[attr].encode(), True)
-            else:
-                d[attr] = (self.__dict__[attr], False)
-        return d
-                
+    def __reduce__(self):
+        # Pickled in the compact format of AO3.serialization, so loading doesn't parse any HTML
+        return serialization.reduce(self)
+
     def __setstate__(self, d):
+        # Pickles made by older versions store the page HTML
         for attr in d:
             value, issoup = d[attr]
             if issoup:
-                self.__dict__[attr] = BeautifulSoup(value, "lxml")
+                self.__dict__[attr] = instrumentation.parse(value, "works.__setstate__")
             else:
                 self.__dict__[attr] = value
         
@@ -83,6 +83,39 @@ class Work:
         if load_chapters:
             self.load_chapters()
         
+    @staticmethod
+    def load_many(workids, session=None, workers=4, load_chapters=False, ordered=True):
+        """Loads many works, making at most `workers` requests at the same time.
+        Errors are returned with the results instead of stopping the batch.
+
+        Args:
+            workids (iterable): AO3 work IDs
+            session (AO3.Session, optional): Session used to load the works. If None, a guest session
+            is created for the batch, so connections are reused. Defaults to None.
+            workers (int, optional): Maximum number of works loaded at the same time. Defaults to 4.
+            load_chapters (bool, optional): Parse the chapters of every work. Defaults to False.
+            ordered (bool, optional): Yield the results in the same order as the IDs instead of
+            as soon as each one is loaded. Defaults to True.
+
+        Yields:
+            tuple: (workid, Work, None) if the work was loaded, or (workid, None, exception) if it wasn't.
+            Common exceptions are utils.InvalidIdError, utils.AuthError (restricted work) and
+            utils.HTTPError (rate limited)
+        """
+
+        from .session import GuestSession
+
+        if session is None:
+            session = GuestSession()
+
+        def load(workid):
+            try:
+                return workid, Work(workid, session, True, load_chapters), None
+            except Exception as e:
+                return workid, None, e
+
+        yield from threadable.bounded_map(load, workids, workers, ordered=ordered)
+
     def set_session(self, session):
         """Sets the session used to make requests for this work
 
@@ -269,45 +302,36 @@ class Work:
             raise utils.UnloadedError("Work isn't loaded. Have you tried calling Work.reload()?")
             
         url = f"https://archiveofourown.org/works/{self.id}?page=%d&show_comments=true&view_adult=true&view_full_work=true"
-        soup = self.request(url%1)
-        
-        pages = 0
-        div = soup.find("div", {"id": "comments_placeholder"})
-        ol = div.find("ol", {"class": "pagination actions"})
-        if ol is None:
-            pages = 1
-        else:
-            for li in ol.findAll("li"):
-                if li.getText().isdigit():
-                    pages = int(li.getText())   
-        
+        # With a maximum, pages are requested one at a time so none are requested for nothing
+        workers = 4 if maximum is None else 1
+        comments = paginate(lambda page: self.request(url%page), self._parse_comments, None, workers, comment_page_count)
+        return list(itertools.islice(comments, maximum))
+
+    def _parse_comments(self, soup):
+        """Returns the comment threads of a page"""
+
         comments = []
-        for page in range(pages):
-            if page != 0:
-                soup = self.request(url%(page+1))
-            ol = soup.find("ol", {"class": "thread"})
-            for li in ol.findAll("li", {"role": "article"}, recursive=False):
-                if maximum is not None and len(comments) >= maximum:
-                    return comments
-                id_ = int(li.attrs["id"][8:])
-                
-                header = li.find("h4", {"class": ("heading", "byline")})
-                if header is None or header.a is None:
-                    author = None
-                else:
-                    author = User(str(header.a.text), self._session, False)
-                    
-                if li.blockquote is not None:
-                    text = li.blockquote.getText()
-                else:
-                    text = ""                  
+        ol = soup.find("ol", {"class": "thread"})
+        for li in ol.findAll("li", {"role": "article"}, recursive=False):
+            id_ = int(li.attrs["id"][8:])
+            
+            header = li.find("h4", {"class": ("heading", "byline")})
+            if header is None or header.a is None:
+                author = None
+            else:
+                author = User(str(header.a.text), self._session, False)
                 
-                comment = Comment(id_, self, session=self._session, load=False)           
-                setattr(comment, "authenticity_token", self.authenticity_token)
-                setattr(comment, "author", author)
-                setattr(comment, "text", text)
-                comment._thread = None
-                comments.append(comment)
+            if li.blockquote is not None:
+                text = li.blockquote.getText()
+            else:
+                text = ""                  
+            
+            comment = Comment(id_, self, session=self._session, load=False)           
+            setattr(comment, "authenticity_token", self.authenticity_token)
+            setattr(comment, "author", author)
+            setattr(comment, "text", text)
+            comment._thread = None
+            comments.append(comment)
         return comments
     
     @threadable.threadable
@@ -344,11 +368,7 @@ class Work:
     def text(self):
         """This work's text"""
         
-        text = ""
-        for chapter in self.chapters:
-            text += chapter.text
-            text += "\n"
-        return text
+        return "".join(chapter.text + "\n" for chapter in self.chapters)
         
     @cached_property
     def authenticity_token(self):
@@ -747,7 +767,7 @@ class Work:
         tags = []
         if html is not None:
             for tag in html.find_all("li"):
-                tags.append(tag.a.string)
+                tags.append(intern(tag.a.string))
         return tags
 
     @cached_property
@@ -762,7 +782,7 @@ class Work:
         characters = []
         if html is not None:
             for character in html.find_all("li"):
-                characters.append(character.a.string)
+                characters.append(intern(character.a.string))
         return characters
 
     @cached_property
@@ -777,7 +797,7 @@ class Work:
         relationships = []
         if html is not None:
             for relationship in html.find_all("li"):
-                relationships.append(relationship.a.string)
+                relationships.append(intern(relationship.a.string))
         return relationships
 
     @cached_property
@@ -792,7 +812,7 @@ class Work:
         fandoms = []
         if html is not None:
             for fandom in html.find_all("li"):
-                fandoms.append(fandom.a.string)
+                fandoms.append(intern(fandom.a.string))
         return fandoms
 
     @cached_property
@@ -807,7 +827,7 @@ class Work:
         categories = []
         if html is not None:
             for category in html.find_all("li"):
-                categories.append(category.a.string)
+                categories.append(intern(category.a.string))
         return categories
 
     @cached_property
@@ -822,7 +842,7 @@ class Work:
         warnings = []
         if html is not None:
             for warning in html.find_all("li"):
-                warnings.append(warning.a.string)
+                warnings.append(intern(warning.a.string))
         return warnings
 
     @cached_property
@@ -835,7 +855,7 @@ class Work:
 
         html = self._soup.find("dd", {"class": "rating tags"})
         if html is not None:
-            rating = html.a.string
+            rating = intern(html.a.string)
             return rating
         return None
 
@@ -920,7 +940,7 @@ class Work:
         if self._session is None:
             req = requester.request("get", *args, **kwargs)
         else:
-            req = requester.request("get", *args, **kwargs, session=self._session.session)
+            req = self._session.get(*args, **kwargs)
         if req.status_code == 429:
             raise utils.HTTPError("We are being rate-limited. Try again in a while or reduce the number of requests")
         return req
@@ -936,9 +956,12 @@ class Work:
         """
 
         req = self.get(url)
+        # Restricted works send guests to the login page
+        if "/users/login" in (getattr(req, "url", None) or ""):
+            raise utils.AuthError("This work is only available to registered users of the Archive")
         if len(req.content) > 650000:
             warnings.warn("This work is very big and might take a very long time to load")
-        soup = BeautifulSoup(req.content, "lxml")
+        soup = instrumentation.parse(req.content, "works.request")
         return soup
 
     @staticmethod
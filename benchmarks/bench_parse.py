@@ -0,0 +1,256 @@
+"""Offline parsing benchmarks.
+
+Runs the main parsing entry points of the package against the pages from
+`fixtures.py` (or a recorded corpus) without touching the network, and
+reports wall time, traced allocations and peak RSS for each case as JSON.
+Every case runs in its own interpreter so RSS numbers don't leak between
+cases.
+
+    python benchmarks/bench_parse.py --output results.json
+    python benchmarks/bench_parse.py --baseline results.json --tolerance 1.3
+    python benchmarks/bench_parse.py --case work_300_reload --repeat 10
+"""
+
+import argparse
+import gc
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+import warnings
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fixtures
+
+
+class FixtureResponse:
+    """Minimal stand-in for requests.Response"""
+
+    def __init__(self, url, content, status_code=200):
+        self.url = url
+        self.content = content
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self.headers = {"Content-Type": "text/html; charset=utf-8"}
+
+
+def install_corpus(corpus):
+    """Serves `corpus` through AO3's requester instead of the network"""
+
+    from AO3.requester import requester
+
+    pages = {urlsplit(url).path: html.encode("utf-8") for url, _, html in corpus.values()}
+
+    def request(method, url, *args, **kwargs):
+        path = urlsplit(url).path
+        if path not in pages:
+            return FixtureResponse(url, b"<html><h2 class='heading'>Error 404</h2></html>", 404)
+        return FixtureResponse(url, pages[path])
+
+    requester.request = request
+
+
+def _loaded_work(corpus, name, load_chapters=False):
+    from AO3 import Work
+
+    work = Work(corpus[name][1]["id"], load=False)
+    work.reload(load_chapters=load_chapters)
+    return work
+
+def _listing_items(corpus, name, list_class):
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(corpus[name][2], "lxml")
+    return [li for li in soup.find("ol", {"class": list_class}).find_all("li", {"role": "article"})
+            if li.h4 is not None]
+
+
+# Each case is a function taking the corpus and returning (setup, run):
+# setup() builds fresh state outside the timed region, run(state) is timed.
+
+def case_work_single_reload(corpus):
+    from AO3 import Work
+    return (lambda: Work(corpus["work_single"][1]["id"], load=False),
+            lambda work: work.reload(load_chapters=False))
+
+def case_work_300_reload(corpus):
+    from AO3 import Work
+    return (lambda: Work(corpus["work_300"][1]["id"], load=False),
+            lambda work: work.reload(load_chapters=False))
+
+def case_work_300_load_chapters(corpus):
+    return (lambda: _loaded_work(corpus, "work_300"),
+            lambda work: work.load_chapters())
+
+def case_work_single_metadata(corpus):
+    return (lambda: _loaded_work(corpus, "work_single", load_chapters=True),
+            lambda work: work.metadata)
+
+def case_work_300_metadata(corpus):
+    return (lambda: _loaded_work(corpus, "work_300", load_chapters=True),
+            lambda work: work.metadata)
+
+def case_work_300_chapter_text(corpus):
+    def run(work):
+        for chapter in work.chapters:
+            chapter.text
+    return (lambda: _loaded_work(corpus, "work_300", load_chapters=True), run)
+
+def case_work_long_chapter_text(corpus):
+    return (lambda: _loaded_work(corpus, "work_long", load_chapters=True),
+            lambda work: work.chapters[0].text)
+
+def case_work_long_text(corpus):
+    def setup():
+        work = _loaded_work(corpus, "work_long", load_chapters=True)
+        # Only time putting the chapters together
+        work.chapters[0].text
+        return work
+    return (setup, lambda work: work.text)
+
+def case_work_long_word_count(corpus):
+    from AO3 import utils
+    return (lambda: _loaded_work(corpus, "work_long", load_chapters=True).chapters[0].text,
+            lambda text: utils.word_count(text))
+
+def case_banner_search(corpus):
+    from AO3.common import get_work_from_banner
+    return (lambda: _listing_items(corpus, "search", "work index group"),
+            lambda items: [get_work_from_banner(li) for li in items])
+
+def case_banner_user_works(corpus):
+    from AO3.common import get_work_from_banner
+    return (lambda: _listing_items(corpus, "user_works", "work index group"),
+            lambda items: [get_work_from_banner(li) for li in items])
+
+def case_banner_bookmarks(corpus):
+    from AO3.common import get_work_from_banner
+    return (lambda: _listing_items(corpus, "bookmarks", "bookmark index group"),
+            lambda items: [get_work_from_banner(li) for li in items])
+
+def case_search_update(corpus):
+    from AO3 import Search
+    return (lambda: Search(any_field="benchmark"),
+            lambda search: search.update())
+
+def case_comment_get_thread(corpus):
+    from AO3 import Comment
+    return (lambda: Comment(corpus["comment_thread"][1]["id"], load=False),
+            lambda comment: comment.get_thread())
+
+CASES = {name[len("case_"):]: func for name, func in sorted(globals().items()) if name.startswith("case_")}
+
+
+def run_case(name, repeat, corpus_dir):
+    """Runs a single case in the current interpreter and returns its results"""
+
+    # Big fixture works trigger Work.request's size warning on every load
+    warnings.simplefilter("ignore")
+    corpus = fixtures.load_corpus(corpus_dir)
+    install_corpus(corpus)
+    setup, run = CASES[name](corpus)
+    rss_start = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Warm up imports and lazily compiled code paths
+    run(setup())
+
+    times = []
+    for _ in range(repeat):
+        state = setup()
+        gc.collect()
+        start = time.perf_counter()
+        run(state)
+        times.append(time.perf_counter() - start)
+        del state
+
+    state = setup()
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    result = run(state)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result, state
+
+    return {
+        "repeat": repeat,
+        "min_s": min(times),
+        "median_s": statistics.median(times),
+        "max_s": max(times),
+        "alloc_peak_bytes": peak - before,
+        "alloc_retained_bytes": current - before,
+        # ru_maxrss is in KiB on Linux and bytes on macOS
+        "rss_peak_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // (1024 if sys.platform == "darwin" else 1),
+        "rss_start_kb": rss_start // (1024 if sys.platform == "darwin" else 1),
+    }
+
+def run_isolated(name, repeat, corpus_dir):
+    cmd = [sys.executable, os.path.abspath(__file__), "--worker", name, "--repeat", str(repeat)]
+    if corpus_dir is not None:
+        cmd += ["--corpus", corpus_dir]
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit code {proc.returncode}"}
+    return json.loads(proc.stdout)
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, result in results.items():
+        old = baseline.get(name)
+        if old is None or "error" in old or "error" in result:
+            continue
+        if result["min_s"] > old["min_s"] * tolerance:
+            regressions.append(f"{name}: min {old['min_s']*1000:.2f}ms -> {result['min_s']*1000:.2f}ms")
+        if result["alloc_peak_bytes"] > old["alloc_peak_bytes"] * tolerance:
+            regressions.append(f"{name}: peak allocations {old['alloc_peak_bytes']} -> {result['alloc_peak_bytes']} bytes")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--case", action="append", choices=sorted(CASES), help="Only run this case (can be repeated)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed repetitions per case")
+    parser.add_argument("--corpus", help="Directory with a recorded corpus (see fixtures.py)")
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    parser.add_argument("--baseline", help="Previous JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=1.3, help="Allowed slowdown factor against the baseline")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker is not None:
+        print(json.dumps(run_case(args.worker, args.repeat, args.corpus)))
+        return 0
+
+    results = {}
+    for name in args.case or sorted(CASES):
+        results[name] = run_isolated(name, args.repeat, args.corpus)
+        print(f"{name}: {json.dumps(results[name])}", file=sys.stderr)
+
+    report = {"python": sys.version.split()[0], "results": results}
+    text = json.dumps(report, indent=2)
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            file.write(text)
+    else:
+        print(text)
+
+    failed = [name for name, result in results.items() if "error" in result]
+    if failed:
+        print(f"Failed cases: {', '.join(failed)}", file=sys.stderr)
+    if args.baseline is not None:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file)["results"], args.tolerance)
+        if regressions:
+            print("Regressions:\n  " + "\n  ".join(regressions), file=sys.stderr)
+            return 1
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
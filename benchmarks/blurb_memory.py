@@ -0,0 +1,83 @@
+"""Memory held by listing results as Work objects and as WorkBlurb records.
+
+Parses `--results` search results (20 per page) from `fixtures.py` pages,
+keeps either the Work objects made by `get_work_from_banner()` or the
+WorkBlurb records made by `get_blurbs()`, drops the pages and reports the
+memory still allocated (traced with tracemalloc) per result as JSON.
+
+    python benchmarks/blurb_memory.py --results 5000
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fixtures
+
+PER_PAGE = 20
+
+
+def works(soup):
+    from AO3.common import get_work_from_banner
+
+    results = soup.find("ol", {"class": ("work", "index", "group")})
+    return [get_work_from_banner(li) for li in results.find_all("li", {"role": "article"}) if li.h4 is not None]
+
+def blurbs(soup):
+    from AO3.common import get_blurbs
+
+    return get_blurbs(soup.find("ol", {"class": ("work", "index", "group")}))
+
+def measure(pages, parse):
+    from AO3 import instrumentation
+
+    # Modules imported on first use aren't part of what the results keep
+    parse(instrumentation.parse(pages[0], "benchmark"))
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    kept = []
+    for html in pages:
+        kept.extend(parse(instrumentation.parse(html, "benchmark")))
+    seconds = time.perf_counter() - start
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "results": len(kept),
+        "bytes": current,
+        "bytes_per_result": round(current / len(kept)),
+        "peak_bytes": peak,
+        "seconds": round(seconds, 3),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--results", type=int, default=1000, help="Number of search results to keep")
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    args = parser.parse_args(argv)
+
+    # Pages are generated up front, so they don't count towards either side
+    npages = max((args.results + PER_PAGE - 1) // PER_PAGE, 1)
+    pages = [fixtures.search_page(1000+n*PER_PAGE, PER_PAGE, seed=n).encode("utf-8") for n in range(npages)]
+
+    results = {"work": measure(pages, works), "blurb": measure(pages, blurbs)}
+    results["ratio"] = round(results["work"]["bytes"] / results["blurb"]["bytes"], 2)
+
+    text = json.dumps(results, indent=2)
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            file.write(text)
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+"""AO3-shaped HTML pages used by the offline benchmarks.
+
+The pages are generated deterministically so the suite runs without network
+access. They follow the markup the parsers in AO3/ look for (work meta
+groups, listing blurbs, pagination, comment threads), which makes parse
+times representative of real pages of the same size.
+
+A directory with recorded pages can be used instead: it must contain a
+`corpus.json` manifest in the format written by `write_corpus()`. Running
+this module writes the synthetic corpus to a directory so it can be
+inspected or replaced page by page:
+
+    python benchmarks/fixtures.py fixtures/
+"""
+
+import json
+import os
+import random
+import sys
+from html import escape
+
+BASE_URL = "https://archiveofourown.org"
+
+_WORDS = (
+    "the of and to in was he she that it his her with as had for on at but "
+    "they you not be said from all were when one would there their what out "
+    "so up into could them about like then him time been now over back down "
+    "light window quiet morning letter station river winter garden shadow"
+).split()
+
+FANDOMS = ["Fandom %d" % i for i in range(40)]
+CHARACTERS = ["Character %d" % i for i in range(200)]
+FREEFORMS = ["Freeform Tag %d" % i for i in range(500)]
+WARNINGS = ["No Archive Warnings Apply", "Creator Chose Not To Use Archive Warnings", "Graphic Depictions Of Violence"]
+RATINGS = ["General Audiences", "Teen And Up Audiences", "Mature", "Explicit", "Not Rated"]
+CATEGORIES = ["F/F", "F/M", "Gen", "M/M", "Multi", "Other"]
+
+
+def _sentence(rng, words):
+    return " ".join(rng.choice(_WORDS) for _ in range(words)).capitalize() + "."
+
+def _paragraphs(rng, count, words):
+    return "\n".join(f"<p>{_sentence(rng, words)}</p>" for _ in range(count))
+
+def _page(title, body, token="benchmarktoken"):
+    return (
+        "<!DOCTYPE html>\n<html lang=\"en\"><head>"
+        f"<meta name=\"csrf-token\" content=\"{token}\"/>"
+        f"<title>{escape(title)} | Archive of Our Own</title></head>"
+        f"<body><div id=\"outer\"><div id=\"inner\" class=\"wrapper\">{body}</div></div></body></html>"
+    )
+
+def _tags(rng):
+    return {
+        "rating": rng.choice(RATINGS),
+        "warnings": rng.sample(WARNINGS, 1),
+        "categories": rng.sample(CATEGORIES, rng.randint(1, 2)),
+        "fandoms": rng.sample(FANDOMS, rng.randint(1, 2)),
+        "relationships": [f"{a}/{b}" for a, b in zip(*[iter(rng.sample(CHARACTERS, 4))] * 2)],
+        "characters": rng.sample(CHARACTERS, rng.randint(2, 6)),
+        "freeforms": rng.sample(FREEFORMS, rng.randint(3, 12)),
+    }
+
+def _pagination(base, current, pages):
+    if pages <= 1:
+        return ""
+    items = "".join(
+        f"<li><a href=\"{base}?page={n}\">{n}</a></li>" if n != current else f"<li><span class=\"current\">{n}</span></li>"
+        for n in range(1, pages+1))
+    return (f"<ol class=\"pagination actions\" role=\"navigation\" title=\"pagination\">"
+            f"<li class=\"previous\"><span class=\"disabled\">&#8592; Previous</span></li>{items}"
+            f"<li class=\"next\"><a rel=\"next\" href=\"{base}?page={current+1}\">Next &#8594;</a></li></ol>")
+
+def work_page(workid, nchapters=1, paragraphs=40, words=25, seed=None):
+    """Full-work page (`view_full_work=true`) with `nchapters` chapters"""
+
+    rng = random.Random(workid if seed is None else seed)
+    tags = _tags(rng)
+    author = f"author{workid % 97}"
+
+    def dd_tags(cls, names):
+        lis = "".join(f"<li><a class=\"tag\" href=\"/tags/{escape(n)}/works\">{escape(n)}</a></li>" for n in names)
+        return f"<dt class=\"{cls}\">{cls.split()[0].capitalize()}:</dt><dd class=\"{cls}\"><ul class=\"commas\">{lis}</ul></dd>"
+
+    meta = (
+        "<dl class=\"work meta group\">"
+        + dd_tags("rating tags", [tags["rating"]])
+        + dd_tags("warning tags", tags["warnings"])
+        + dd_tags("category tags", tags["categories"])
+        + dd_tags("fandom tags", tags["fandoms"])
+        + dd_tags("relationship tags", tags["relationships"])
+        + dd_tags("character tags", tags["characters"])
+        + dd_tags("freeform tags", tags["freeforms"])
+        + "<dt class=\"language\">Language:</dt><dd class=\"language\">English</dd>"
+        + f"<dt class=\"series\">Series:</dt><dd class=\"series\"><span class=\"series\"><span class=\"position\">Part 2 of <a href=\"/series/{workid+5}\">Series {workid}</a></span></span></dd>"
+        + "<dt class=\"collections\">Collections:</dt><dd class=\"collections\"><a href=\"/collections/bench\">Benchmark Collection</a></dd>"
+        + "<dt class=\"stats\">Stats:</dt><dd class=\"stats\"><dl class=\"stats\">"
+        + "<dt class=\"published\">Published:</dt><dd class=\"published\">2019-03-14</dd>"
+        + "<dt class=\"status\">Updated:</dt><dd class=\"status\">2021-08-02</dd>"
+        + f"<dt class=\"words\">Words:</dt><dd class=\"words\">{nchapters*paragraphs*words:,}</dd>"
+        + f"<dt class=\"chapters\">Chapters:</dt><dd class=\"chapters\">{nchapters}/{nchapters}</dd>"
+        + f"<dt class=\"comments\">Comments:</dt><dd class=\"comments\">{rng.randint(0, 5000):,}</dd>"
+        + f"<dt class=\"kudos\">Kudos:</dt><dd class=\"kudos\">{rng.randint(0, 50000):,}</dd>"
+        + f"<dt class=\"bookmarks\">Bookmarks:</dt><dd class=\"bookmarks\"><a href=\"/works/{workid}/bookmarks\">{rng.randint(0, 9000):,}</a></dd>"
+        + f"<dt class=\"hits\">Hits:</dt><dd class=\"hits\">{rng.randint(0, 900000):,}</dd>"
+        + "</dl></dd></dl>"
+    )
+    actions = (
+        "<ul class=\"work navigation actions\">"
+        "<li class=\"download\"><a href=\"#\">Download</a><ul class=\"expandable secondary\">"
+        + "".join(f"<li><a href=\"/downloads/{workid}/work.{ext.lower()}?updated_at=1627900000\">{ext}</a></li>"
+                  for ext in ("AZW3", "EPUB", "MOBI", "PDF", "HTML"))
+        + "</ul></li></ul>"
+    )
+    preface = (
+        "<div class=\"preface group\">"
+        f"<h2 class=\"title heading\">Benchmark Work {workid}</h2>"
+        f"<h3 class=\"byline heading\"><a rel=\"author\" href=\"/users/{author}/pseuds/{author}\">{author}</a></h3>"
+        f"<div class=\"summary module\"><h3 class=\"heading\">Summary:</h3><blockquote class=\"userstuff\">{_paragraphs(rng, 2, 20)}</blockquote></div>"
+        f"<div class=\"notes module\"><h3 class=\"heading\">Notes:</h3><blockquote class=\"userstuff\">{_paragraphs(rng, 1, 15)}</blockquote></div>"
+        "</div>"
+    )
+    if nchapters == 1:
+        chapters = f"<div id=\"chapters\" role=\"article\"><h3 class=\"landmark heading\" id=\"work\">Work Text:</h3><div class=\"userstuff\">{_paragraphs(rng, paragraphs, words)}</div></div>"
+    else:
+        parts = []
+        for n in range(1, nchapters+1):
+            chapterid = workid * 1000 + n
+            parts.append(
+                f"<div class=\"chapter\" id=\"chapter-{n}\">"
+                f"<div class=\"chapter preface group\" role=\"complementary\"><h3 class=\"title\"><a href=\"/works/{workid}/chapters/{chapterid}\">Chapter {n}</a>: Title {n}</h3></div>"
+                f"<div class=\"userstuff module\" role=\"article\"><h3 class=\"landmark heading\" id=\"work\">Chapter Text</h3>{_paragraphs(rng, paragraphs, words)}</div>"
+                f"<div class=\"chapter preface group\" id=\"chapter_{n}_endnotes\"><div class=\"end notes module\"><blockquote class=\"userstuff\">{_paragraphs(rng, 1, 10)}</blockquote></div></div>"
+                "</div>")
+        chapters = f"<div id=\"chapters\" role=\"article\">{''.join(parts)}</div>"
+    body = (
+        f"<div id=\"main\" class=\"works-show region\" role=\"main\">{actions}"
+        f"<div class=\"wrapper\">{meta}</div><div id=\"workskin\">{preface}{chapters}</div></div>"
+    )
+    return _page(f"Benchmark Work {workid}", body)
+
+def work_blurb(workid, rng):
+    """A single `li` blurb as found in search results and listings"""
+
+    tags = _tags(rng)
+    author = f"author{workid % 97}"
+    nchapters = rng.randint(1, 60)
+
+    def li_tags(cls, names):
+        return "".join(f"<li class=\"{cls}\"><strong><a class=\"tag\" href=\"/tags/{escape(n)}/works\">{escape(n)}</a></strong></li>" for n in names)
+
+    return (
+        f"<li id=\"work_{workid}\" class=\"work blurb group work-{workid}\" role=\"article\">"
+        "<div class=\"header module\">"
+        f"<h4 class=\"heading\"><a href=\"/works/{workid}\">Benchmark Work {workid}</a> by "
+        f"<a rel=\"author\" href=\"/users/{author}/pseuds/{author}\">{author}</a></h4>"
+        "<h5 class=\"fandoms heading\"><span class=\"landmark\">Fandoms:</span> "
+        + ", ".join(f"<a class=\"tag\" href=\"/tags/{escape(f)}/works\">{escape(f)}</a>" for f in tags["fandoms"])
+        + "</h5><ul class=\"required-tags\">"
+        f"<li><a class=\"help symbol question modal\" title=\"Symbols key\"><span class=\"rating-general-audience rating\" title=\"{tags['rating']}\"><span class=\"text\">{tags['rating']}</span></span></a></li>"
+        f"<li><a class=\"help symbol question modal\" title=\"Symbols key\"><span class=\"warning-no warnings\" title=\"{tags['warnings'][0]}\"><span class=\"text\">{tags['warnings'][0]}</span></span></a></li>"
+        f"<li><a class=\"help symbol question modal\" title=\"Symbols key\"><span class=\"category-femslash category\" title=\"{', '.join(tags['categories'])}\"><span class=\"text\">{', '.join(tags['categories'])}</span></span></a></li>"
+        "</ul><p class=\"datetime\">02 Aug 2021</p></div>"
+        "<h6 class=\"landmark heading\">Tags</h6><ul class=\"tags commas\">"
+        + li_tags("warnings", tags["warnings"])
+        + li_tags("relationships", tags["relationships"])
+        + li_tags("characters", tags["characters"])
+        + li_tags("freeforms", tags["freeforms"])
+        + "</ul><h6 class=\"landmark heading\">Summary</h6>"
+        f"<blockquote class=\"userstuff summary\">{_paragraphs(rng, 2, 20)}</blockquote>"
+        f"<h6 class=\"landmark heading\">Series</h6><ul class=\"series\"><li>Part <strong>1</strong> of <a href=\"/series/{workid+5}\">Series {workid}</a></li></ul>"
+        "<dl class=\"stats\">"
+        "<dt class=\"language\">Language:</dt><dd class=\"language\">English</dd>"
+        f"<dt class=\"words\">Words:</dt><dd class=\"words\">{rng.randint(100, 300000):,}</dd>"
+        f"<dt class=\"chapters\">Chapters:</dt><dd class=\"chapters\"><a href=\"/works/{workid}/chapters/1\">{nchapters}</a>/{rng.choice([str(nchapters), '?'])}</dd>"
+        f"<dt class=\"comments\">Comments:</dt><dd class=\"comments\"><a href=\"/works/{workid}?show_comments=true\">{rng.randint(0, 5000):,}</a></dd>"
+        f"<dt class=\"kudos\">Kudos:</dt><dd class=\"kudos\"><a href=\"/works/{workid}#kudos\">{rng.randint(0, 50000):,}</a></dd>"
+        f"<dt class=\"bookmarks\">Bookmarks:</dt><dd class=\"bookmarks\"><a href=\"/works/{workid}/bookmarks\">{rng.randint(0, 9000):,}</a></dd>"
+        f"<dt class=\"hits\">Hits:</dt><dd class=\"hits\">{rng.randint(0, 900000):,}</dd>"
+        "</dl></li>"
+    )
+
+def search_page(first_workid=1000, count=20, total=2000, seed=1):
+    """Search results page"""
+
+    rng = random.Random(seed)
+    blurbs = "".join(work_blurb(first_workid+i, rng) for i in range(count))
+    body = (
+        "<div id=\"main\" class=\"works-search region\" role=\"main\">"
+        f"<h3 class=\"heading\">{total} Found<a class=\"help symbol question modal\" title=\"Search Help\">?</a></h3>"
+        f"<ol class=\"work index group\">{blurbs}</ol>"
+        + _pagination("/works/search", 1, (total+count-1)//count)
+        + "</div>"
+    )
+    return _page("Search Works", body)
+
+def _dashboard(username, works, bookmarks):
+    return (
+        "<div id=\"dashboard\" class=\"own dashboard region\" role=\"navigation\"><ul class=\"navigation actions\">"
+        f"<li><a href=\"/users/{username}/works\"><span class=\"current\">Works ({works})</span></a></li>"
+        f"<li><a href=\"/users/{username}/bookmarks\">Bookmarks ({bookmarks})</a></li>"
+        "</ul></div>"
+    )
+
+def user_works_page(username="benchuser", count=20, total=120, page=1, seed=2):
+    """First page of a user's works"""
+
+    rng = random.Random(seed)
+    blurbs = "".join(work_blurb(5000+page*count+i, rng) for i in range(count))
+    body = (
+        _dashboard(username, total, 0)
+        + "<div id=\"main\" class=\"works-index dashboard filtered region\" role=\"main\">"
+        f"<h2 class=\"heading\">1 - {count} of {total} Works by {username}</h2>"
+        f"<ol class=\"work index group\">{blurbs}</ol>"
+        + _pagination(f"/users/{username}/works", page, (total+count-1)//count)
+        + "</div>"
+    )
+    return _page(f"{username} - Works", body)
+
+def bookmarks_page(username="benchuser", count=20, total=400, page=1, seed=3):
+    """First page of a user's bookmarks"""
+
+    rng = random.Random(seed)
+    blurbs = "".join(
+        work_blurb(9000+page*count+i, rng).replace("work blurb group", "bookmark blurb group", 1)
+        for i in range(count))
+    body = (
+        _dashboard(username, 0, total).replace("<span class=\"current\">Works (0)</span>", "Works (0)")
+                                      .replace(f"Bookmarks ({total})", f"<span class=\"current\">Bookmarks ({total})</span>")
+        + "<div id=\"main\" class=\"bookmarks-index dashboard region\" role=\"main\">"
+        f"<h2 class=\"heading\">1 - {count} of {total} Bookmarks by {username}</h2>"
+        f"<ol class=\"bookmark index group\">{blurbs}</ol>"
+        + _pagination(f"/users/{username}/bookmarks", page, (total+count-1)//count)
+        + "</div>"
+    )
+    return _page(f"{username} - Bookmarks", body)
+
+def profile_page(username="benchuser", seed=4):
+    """User profile page"""
+
+    rng = random.Random(seed)
+    body = (
+        "<div id=\"main\" class=\"users-profile region\" role=\"main\">"
+        f"<div class=\"primary header module\"><h2 class=\"heading\">{username}</h2>"
+        f"<p class=\"icon\"><img alt=\"\" src=\"/images/skins/iconsets/default/icon_user.png\"/></p></div>"
+        f"<div class=\"bio module\"><h3 class=\"heading\">Bio</h3><blockquote class=\"userstuff\">{_paragraphs(rng, 3, 20)}</blockquote></div>"
+        "</div>"
+    )
+    return _page(f"{username} - Profile", body)
+
+def comment_thread_page(commentid=700000, depth=60, breadth=3, chapterid=123456, seed=5):
+    """Comment page with a deep reply thread.
+
+    Every comment has `breadth` replies, and the first reply keeps nesting
+    until `depth` levels are reached.
+    """
+
+    rng = random.Random(seed)
+    counter = [commentid]
+
+    def comment_li(cid):
+        return (
+            f"<li class=\"comment group\" id=\"comment_{cid}\" role=\"article\">"
+            f"<h4 class=\"heading byline\"><a href=\"/users/reader{cid % 50}\">reader{cid % 50}</a></h4>"
+            f"<blockquote class=\"userstuff\">{_paragraphs(rng, 2, 15)}</blockquote>"
+            f"<ul class=\"actions\" id=\"navigation_for_comment_{cid}\">"
+            f"<li id=\"add_comment_reply_link_{cid}\"><a href=\"/comments/add_comment_reply?chapter_id={chapterid}&amp;id={cid}\">Reply</a></li>"
+            f"<li><a href=\"/comments/{cid}\">Thread</a></li></ul></li>"
+        )
+
+    def thread(level):
+        parts = []
+        for i in range(breadth if level > 0 else 1):
+            counter[0] += 1
+            cid = counter[0]
+            parts.append(comment_li(cid))
+            if level < depth and i == 0:
+                parts.append(f"<li><ol class=\"thread\">{thread(level+1)}</ol></li>")
+        return "".join(parts)
+
+    root = comment_li(commentid)
+    body = (
+        "<div id=\"main\" class=\"comments-show region\" role=\"main\">"
+        f"<div id=\"comments_placeholder\"><ol class=\"thread\">{root}<li><ol class=\"thread\">{thread(1)}</ol></li></ol></div>"
+        "</div>"
+    )
+    return _page("Comment Thread", body)
+
+def synthetic_corpus():
+    """Returns the synthetic corpus as {name: (url, metadata, html)}"""
+
+    return {
+        "work_single": (f"{BASE_URL}/works/1001", {"id": 1001}, work_page(1001, 1, paragraphs=120)),
+        "work_300": (f"{BASE_URL}/works/1300", {"id": 1300}, work_page(1300, 300, paragraphs=40)),
+        # One 200k-word chapter
+        "work_long": (f"{BASE_URL}/works/1200", {"id": 1200}, work_page(1200, 1, paragraphs=2000, words=100)),
+        "search": (f"{BASE_URL}/works/search", {}, search_page()),
+        "user_works": (f"{BASE_URL}/users/benchuser/works", {"username": "benchuser"}, user_works_page()),
+        "user_profile": (f"{BASE_URL}/users/benchuser/profile", {"username": "benchuser"}, profile_page()),
+        "bookmarks": (f"{BASE_URL}/users/benchuser/bookmarks", {"username": "benchuser"}, bookmarks_page()),
+        "comment_thread": (f"{BASE_URL}/comments/700000", {"id": 700000}, comment_thread_page()),
+    }
+
+def write_corpus(directory, corpus=None):
+    """Writes a corpus to `directory`, one HTML file per page plus a manifest"""
+
+    if corpus is None:
+        corpus = synthetic_corpus()
+    os.makedirs(directory, exist_ok=True)
+    manifest = {}
+    for name, (url, metadata, html) in corpus.items():
+        filename = f"{name}.html"
+        with open(os.path.join(directory, filename), "w", encoding="utf-8") as file:
+            file.write(html)
+        manifest[name] = {"url": url, "file": filename, **metadata}
+    with open(os.path.join(directory, "corpus.json"), "w") as file:
+        json.dump(manifest, file, indent=2)
+
+def load_corpus(directory=None):
+    """Loads the corpus from `directory`, or generates it if `directory` is None
+
+    Returns:
+        dict: {name: (url, metadata, html)}
+    """
+
+    if directory is None:
+        return synthetic_corpus()
+    with open(os.path.join(directory, "corpus.json")) as file:
+        manifest = json.load(file)
+    corpus = {}
+    for name, entry in manifest.items():
+        entry = dict(entry)
+        url = entry.pop("url")
+        with open(os.path.join(directory, entry.pop("file")), encoding="utf-8") as file:
+            corpus[name] = (url, entry, file.read())
+    return corpus
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit(f"usage: {sys.argv[0]} DIRECTORY")
+    write_corpus(sys.argv[1])
@@ -0,0 +1,103 @@
+"""Measures how long it takes to import AO3 using `python -X importtime`.
+
+Each statement is run in a fresh interpreter several times and the best
+cumulative time of every tracked module is reported as JSON. Pass a previous
+result with --baseline to fail when an import becomes noticeably slower.
+
+    python benchmarks/import_time.py --output import_time.json
+    python benchmarks/import_time.py --baseline import_time.json --tolerance 1.25
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STATEMENTS = {
+    "import AO3": "import AO3",
+    "import AO3.utils": "import AO3.utils",
+    "AO3.Work": "import AO3; AO3.Work",
+    "AO3.Session": "import AO3; AO3.Session",
+}
+
+# Heavy third-party dependencies that should only be loaded on demand
+HEAVY_MODULES = ("requests", "bs4", "lxml")
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def import_times(statement):
+    """Runs `statement` in a new interpreter.
+
+    Returns:
+        tuple: ({module: cumulative_us}, set of top-level modules)
+    """
+    
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=ROOT, capture_output=True, text=True, check=True)
+    times = {}
+    toplevel = set()
+    for line in proc.stderr.splitlines():
+        match = _LINE.match(line)
+        if match is not None:
+            times[match.group(4)] = int(match.group(2))
+            if len(match.group(3)) == 1:
+                toplevel.add(match.group(4))
+    return times, toplevel
+
+def measure(statement, repeat):
+    best = None
+    for _ in range(repeat):
+        times, toplevel = import_times(statement)
+        # Top-level AO3 entries already include everything they imported
+        total = sum(times[module] for module in toplevel if module == "AO3" or module.startswith("AO3."))
+        if best is None or total < best["total_us"]:
+            best = {
+                "total_us": total,
+                "AO3_us": times.get("AO3", 0),
+                "heavy_modules": sorted(m for m in HEAVY_MODULES if m in times),
+                "modules": len(times),
+            }
+    return best
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="Interpreter launches per statement (best is kept)")
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    parser.add_argument("--baseline", help="Previous JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=1.25, help="Allowed slowdown factor against the baseline")
+    args = parser.parse_args(argv)
+
+    results = {name: measure(statement, args.repeat) for name, statement in STATEMENTS.items()}
+    report = {"python": sys.version.split()[0], "results": results}
+    text = json.dumps(report, indent=2)
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            file.write(text)
+    print(text)
+    
+    if args.baseline is not None:
+        with open(args.baseline) as file:
+            baseline = json.load(file)["results"]
+        regressions = []
+        for name, result in results.items():
+            if name not in baseline:
+                continue
+            old = baseline[name]
+            if result["total_us"] > old["total_us"] * args.tolerance:
+                regressions.append(f"{name}: {old['total_us']}us -> {result['total_us']}us")
+            new_heavy = set(result["heavy_modules"]) - set(old["heavy_modules"])
+            if new_heavy:
+                regressions.append(f"{name}: now imports {', '.join(sorted(new_heavy))}")
+        if regressions:
+            print("Import time regressions:\n  " + "\n  ".join(regressions), file=sys.stderr)
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""Tag and range queries over a WorkIndex of synthetic works.
+
+Builds `--works` WorkBlurb records with tags drawn from skewed pools (a few
+tags are on a large share of the works, most are rare), indexes them with
+`AO3.index.WorkIndex`, and times a set of queries against the same filter
+written as a loop over the works. `cold_ms` is the first query (which builds
+the bitmaps it needs), `warm_ms` the following ones, and `ids_ms` the time to
+turn the resulting bitmap into work IDs. Results are printed as JSON.
+
+    python benchmarks/index_query.py --works 1000000
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+FIELDS = {"fandoms": (2000, 1), "characters": (20000, 4), "relationships": (20000, 2), "tags": (50000, 8)}
+
+
+def make_works(count, seed):
+    from AO3.common import WorkBlurb
+
+    rng = random.Random(seed)
+    pools = {field: [f"{field[:-1].title()} {i}" for i in range(size)] for field, (size, _) in FIELDS.items()}
+    ratings = ["General Audiences", "Teen And Up Audiences", "Mature", "Explicit", "Not Rated"]
+    works = []
+    for workid in range(1, count+1):
+        fields = {field: [pools[field][int(len(pools[field]) * rng.random()**3)] for _ in range(n)]
+                  for field, (_, n) in FIELDS.items()}
+        works.append(WorkBlurb(
+            id=workid, rating=rng.choice(ratings), words=int(rng.lognormvariate(8.5, 1.3)),
+            kudos=int(rng.paretovariate(1.2) * 10), hits=int(rng.paretovariate(1.1) * 200), **fields))
+    return works
+
+def timed(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return result, times
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--works", type=int, default=200000, help="Number of works to index")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed repetitions per query")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    args = parser.parse_args(argv)
+
+    from AO3.index import WorkIndex
+
+    works = make_works(args.works, args.seed)
+    start = time.perf_counter()
+    index = WorkIndex()
+    index.add_many(works)
+    build = time.perf_counter() - start
+
+    queries = {
+        "one_tag": ({"tags": ["Tag 1"]},
+                    lambda w: "Tag 1" in w.tags),
+        "and_not": ({"tags": ["Fandom 1", "Character 1"], "exclude": ["Tag 2"]},
+                    lambda w: "Fandom 1" in w.fandoms and "Character 1" in w.characters and "Tag 2" not in w.tags),
+        "or_range": ({"any_of": ["Relationship 1", "Relationship 2"], "words": (10000, None)},
+                     lambda w: ("Relationship 1" in w.relationships or "Relationship 2" in w.relationships)
+                     and w.words >= 10000),
+        "range_only": ({"kudos": (100, 1000), "hits": (None, 5000)},
+                       lambda w: 100 <= w.kudos <= 1000 and w.hits <= 5000),
+    }
+    results = {"works": args.works, "build_seconds": round(build, 3), "queries": {}}
+    for name, (query, check) in queries.items():
+        # The first run builds the bitmaps of the tags and fields it uses
+        _, cold = timed(lambda: index.query(**query), 1)
+        bitmap, warm = timed(lambda: index.match(**query), args.repeat)
+        found, ids = timed(lambda: index.ids(bitmap), 1)
+        expected, loop = timed(lambda: [w.id for w in works if check(w)], 1)
+        if found != expected:
+            raise AssertionError(f"Query {name} returned {len(found)} works instead of {len(expected)}")
+        results["queries"][name] = {
+            "matches": len(found),
+            "cold_ms": round(cold[0] * 1000, 2),
+            "warm_ms": round(statistics.median(warm) * 1000, 2),
+            "ids_ms": round(ids[0] * 1000, 2),
+            "loop_ms": round(loop[0] * 1000, 2),
+        }
+
+    text = json.dumps(results, indent=2)
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            file.write(text)
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
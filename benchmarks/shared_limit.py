@@ -0,0 +1,100 @@
+"""Checks that worker processes sharing a ledger stay under the rate limit together.
+
+Starts a local CassetteServer that answers with HTTP 429 above `--rqtw`
+requests per `--timew` seconds, and spawns several processes that each make
+`--requests` requests with that same limit configured. Without a ledger every
+process only counts its own requests, so the server rate limits them; with
+`AO3.utils.set_ledger()` they share one budget and no request is rejected.
+Results are printed as JSON, and the exit status is non-zero if requests made
+with the shared ledger were rate limited.
+
+    python benchmarks/shared_limit.py --processes 4 --requests 5 --rqtw 8 --timew 2
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fixtures
+
+URL = "https://archiveofourown.org/works/1001"
+
+
+def worker(server_url, requests, rqtw, timew, ledger, results):
+    from AO3 import utils
+    from AO3.transport import RewriteTransport
+
+    utils.set_transport(RewriteTransport(server_url))
+    utils.set_rqtw(rqtw)
+    utils.set_timew(timew)
+    if ledger is not None:
+        utils.set_ledger(ledger)
+
+    from AO3.requester import requester
+
+    statuses = []
+    for _ in range(requests):
+        statuses.append(requester.request("get", URL).status_code)
+    results.put(statuses)
+
+def run(server, processes, requests, rqtw, timew, ledger):
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    procs = [context.Process(target=worker, args=(server.url, requests, rqtw, timew, ledger, results))
+             for _ in range(processes)]
+    # Start from an empty window
+    time.sleep(timew)
+    limited_before = server.rate_limited
+    start = time.perf_counter()
+    for proc in procs:
+        proc.start()
+    statuses = [status for _ in procs for status in results.get()]
+    for proc in procs:
+        proc.join()
+    return {
+        "requests": len(statuses),
+        "rate_limited": statuses.count(429),
+        "server_rate_limited": server.rate_limited - limited_before,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=4, help="Number of worker processes")
+    parser.add_argument("--requests", type=int, default=5, help="Requests made by every process")
+    parser.add_argument("--rqtw", type=int, default=8, help="Requests allowed per time window")
+    parser.add_argument("--timew", type=float, default=2.0, help="Time window (seconds)")
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    args = parser.parse_args(argv)
+
+    from AO3.transport import CassetteServer, CassetteStore
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = CassetteStore(os.path.join(directory, "cassettes"))
+        store.put("GET", URL, 200, {"Content-Type": "text/html; charset=utf-8"},
+                  fixtures.work_page(1001).encode("utf-8"))
+        ledger = os.path.join(directory, "ledger.sqlite")
+        with CassetteServer(store, rate_limit=(args.rqtw, args.timew)) as server:
+            results = {
+                "separate": run(server, args.processes, args.requests, args.rqtw, args.timew, None),
+                "shared": run(server, args.processes, args.requests, args.rqtw, args.timew, ledger),
+            }
+
+    text = json.dumps(results, indent=2)
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            file.write(text)
+    else:
+        print(text)
+    return 1 if results["shared"]["rate_limited"] > 0 else 0
+
+if __name__ == "__main__":
+    sys.exit(main())